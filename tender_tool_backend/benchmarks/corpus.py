@@ -0,0 +1,140 @@
+"""Synthetic tender corpora shaped like what the extractors produce."""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+PORTALS = ["service.bund.de", "myorder.rib.de", "evergabe.nrw.de"]
+
+SUBJECTS = [
+    "Unterhaltsreinigung",
+    "Glasreinigung",
+    "Rohbauarbeiten",
+    "Dachsanierung",
+    "Fensterbau",
+    "Straßenbeleuchtung",
+    "Wartung Aufzugsanlagen",
+    "Heizungsinstallation",
+    "Elektroinstallation",
+    "Winterdienst",
+    "Grünpflege",
+    "IT-Dienstleistungen",
+    "Softwareentwicklung",
+    "Rahmenvertrag Büromaterial",
+    "Brandschutzertüchtigung",
+    "Abbrucharbeiten",
+    "Trockenbauarbeiten",
+    "Sicherheitsdienst",
+]
+OBJECTS = [
+    "Grundschule",
+    "Kindertagesstätte",
+    "Rathaus",
+    "Dienstgebäude",
+    "Feuerwache",
+    "Sporthalle",
+    "Klinikum",
+    "Bauhof",
+    "Verwaltungsgebäude",
+    "Stadtbibliothek",
+]
+CITIES = [
+    "München",
+    "Bonn",
+    "Münster",
+    "Köln",
+    "Leipzig",
+    "Hamburg",
+    "Koblenz",
+    "Dresden",
+    "Freiburg",
+    "Kassel",
+]
+FILLER = (
+    "Die Leistung umfasst sämtliche Arbeiten gemäß Leistungsverzeichnis "
+    "einschließlich Baustelleneinrichtung, Dokumentation und Abnahme. "
+    "Angebote sind ausschließlich elektronisch einzureichen."
+)
+CPV_CODES = [
+    "90910000-9",
+    "90911200-8",
+    "45210000-2",
+    "45262300-4",
+    "45421000-4",
+    "45310000-3",
+    "45331000-6",
+    "50750000-7",
+    "77310000-6",
+    "72000000-5",
+    "79710000-4",
+    "30192000-1",
+]
+
+
+def publications(count: int, seed: int = 0, prefix: str = "SYN"):
+    """Yield `count` PublicationInput-shaped dicts."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        city = rng.choice(CITIES)
+        published = start + timedelta(hours=i % 8760)
+        deadline = published + timedelta(days=rng.randint(10, 60), hours=10)
+        yield {
+            "tender_number": f"{prefix}-{seed}-{i}",
+            "title": f"{subject} {rng.choice(OBJECTS)} {city}",
+            "description": f"{subject} in {city}. {FILLER}",
+            "tender_procedure": rng.choice(
+                [
+                    "Offenes Verfahren",
+                    "Öffentliche Ausschreibung",
+                    "Verhandlungsverfahren",
+                ]
+            ),
+            "execution_place": city,
+            "subdivision_into_lots": rng.random() < 0.3,
+            "side_offers_allowed": rng.random() < 0.2,
+            "several_main_offers_allowed": False,
+            "dates": {
+                "period_start": (deadline + timedelta(days=30)).date(),
+                "period_end": (deadline + timedelta(days=400)).date(),
+                "application_deadline": deadline,
+                "bidders_requests_deadline": deadline - timedelta(days=7),
+                "expiration_time": deadline + timedelta(days=30),
+                "award_period": (deadline + timedelta(days=30)).date(),
+            },
+            "contracting_authority": {
+                "name": f"Stadt {city} {rng.randint(1, 40)}",
+                "address": f"Rathausplatz 1, {city}",
+                "contact_email": None,
+            },
+            "cpv_codes": [
+                {"code": code, "description": None}
+                for code in rng.sample(CPV_CODES, rng.randint(1, 3))
+            ],
+            "publication_url": f"https://{rng.choice(PORTALS)}/tender/{seed}/{i}",
+            "portal_name": rng.choice(PORTALS),
+        }
+
+
+def documents(
+    publication_count: int, per_publication: int = 3, seed: int = 0, prefix: str = "SYN"
+):
+    """Yield DocumentInput-shaped dicts for the publications above."""
+    for i in range(publication_count):
+        for n in range(per_publication):
+            yield {
+                "filename": f"Leistungsverzeichnis_{i}_{n}.pdf",
+                "download_link": f"https://example.org/docs/{seed}/{i}/{n}.pdf",
+                "publication_tender_number": f"{prefix}-{seed}-{i}",
+            }
+
+
+def batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,62 @@
+"""Pages-per-second benchmark for the deterministic portal extractors.
+
+python -m benchmarks.extractors [--seconds 3]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from crawler.extractors import extract_detail, extract_listing
+
+FIXTURES = (
+    Path(__file__).resolve().parent.parent / "crawler" / "extractors" / "fixtures"
+)
+
+# (fixture, url it was saved from, extractor function)
+CORPUS = [
+    (
+        "service_bund_listing.html",
+        "https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/Formular.html",
+        extract_listing,
+    ),
+    (
+        "service_bund_detail.html",
+        "https://www.service.bund.de/IMPORTE/Ausschreibungen/eVergabe/2025/03/4821377.html",
+        extract_detail,
+    ),
+    ("itwo_listing.html", "https://www.myorder.rib.de/tender/index", extract_listing),
+    (
+        "itwo_detail.html",
+        "https://www.myorder.rib.de/tender/view/118452",
+        extract_detail,
+    ),
+]
+
+
+def run(seconds: float):
+    results = []
+    for fixture, url, extract in CORPUS:
+        html = (FIXTURES / fixture).read_text(encoding="utf-8")
+        pages = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            extract(url, html)
+            pages += 1
+        elapsed = time.perf_counter() - started
+        results.append((fixture, pages / elapsed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3.0, help="time per fixture")
+    args = parser.parse_args()
+
+    for fixture, rate in run(args.seconds):
+        print(f"{fixture:<28} {rate:>10.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
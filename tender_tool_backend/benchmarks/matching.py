@@ -0,0 +1,100 @@
+"""Profile matching throughput: featurize, build the matrix, score, top-N.
+
+    python -m benchmarks.matching [--rows 1000000] [--profiles 50]
+                                  [--sample 20000] [--chunk-size 50000]
+
+Runs in memory, without a database: `--sample` synthetic publications are
+featurized (timed), then repeated up to `--rows` matrix rows, which are
+scored chunk by chunk against `--profiles` random profiles the way
+core.matching.rank() does.
+"""
+
+import argparse
+import random
+import resource
+import time
+
+from .common import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--sample", type=int, default=20_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup_django()
+    import numpy as np
+
+    from core.matching import (
+        TopN,
+        feature_matrix,
+        profile_weights,
+        publication_features,
+        weight_matrix,
+    )
+    from core.models import MatchProfile
+
+    from .corpus import CITIES, CPV_CODES, SUBJECTS, publications
+
+    items = list(publications(args.sample))
+    started = time.perf_counter()
+    sample = [
+        publication_features(
+            item["title"],
+            item["description"],
+            [cpv["code"] for cpv in item["cpv_codes"]],
+            item["execution_place"],
+        )
+        for item in items
+    ]
+    featurize = time.perf_counter() - started
+
+    rng = random.Random(0)
+    profiles = [
+        MatchProfile(
+            name=f"profile {i}",
+            cpv_prefixes=[
+                code[: rng.choice([2, 3, 4])] for code in rng.sample(CPV_CODES, 2)
+            ],
+            regions=rng.sample(CITIES, 3),
+            keywords=rng.sample(SUBJECTS, 2),
+            top_n=200,
+        )
+        for i in range(args.profiles)
+    ]
+    weights = weight_matrix([profile_weights(profile) for profile in profiles])
+
+    build = score = 0.0
+    # One excluded contracting authority per profile, out of 5000.
+    top = TopN(
+        [profile.top_n for profile in profiles],
+        [[rng.randrange(5000)] for _ in profiles],
+    )
+    for start in range(0, args.rows, args.chunk_size):
+        size = min(args.chunk_size, args.rows - start)
+        rows = [sample[(start + i) % len(sample)] for i in range(size)]
+        started = time.perf_counter()
+        matrix = feature_matrix(rows)
+        build += time.perf_counter() - started
+        started = time.perf_counter()
+        ids = np.arange(start, start + size, dtype=np.int64)
+        top.add(ids, (matrix @ weights).toarray(), ids % 5000)
+        score += time.perf_counter() - started
+    print(
+        f"featurize  {args.sample:>9} rows {featurize:8.2f}s "
+        f"({args.sample / featurize:,.0f} rows/s)"
+    )
+    print(f"matrix     {args.rows:>9} rows {build:8.2f}s")
+    print(
+        f"score+top  {args.rows:>9} rows {score:8.2f}s "
+        f"({args.rows / score:,.0f} rows/s x {args.profiles} profiles)"
+    )
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak RSS {peak / 1024:.0f} MiB (chunks of {args.chunk_size} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Publication API payload size and render time per 1,000 rows.
+
+    python -m benchmarks.payload [--rows 1000] [--repeat 5]
+
+Loads `--rows` synthetic publications with three documents each and turns
+all of them into a response body the way the list endpoint does, comparing
+the previous path (PublicationSerializer and DRF's JSON renderer, full
+prefetching) with the compiled representation and orjson, a six-field
+sparse fieldset and, when msgpack is installed, MessagePack. For each it
+prints the median milliseconds per 1,000 rows to load, serialize and
+render, and the body size raw, gzipped and (with brotli) Brotli-compressed.
+"""
+
+import argparse
+import gzip
+import importlib.util
+import time
+
+from .common import benchmark_database, setup_django
+
+SPARSE = {
+    "fields": ("id", "tender_number", "title", "portal", "execution_place"),
+    "expand": ("dates",),
+}
+
+
+def load(rows: int):
+    from core.ingestion import ingest_documents, ingest_publications
+
+    from .corpus import batched, documents, publications
+
+    for batch in batched(publications(rows), 1000):
+        ingest_publications(batch)
+    for batch in batched(documents(rows), 3000):
+        ingest_documents(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+
+    from core.models import Publication
+    from core.renderers import JSONRenderer, MessagePackRenderer
+    from core.representation import representation
+    from core.serializers import PublicationSerializer
+
+    def serializer_path():
+        queryset = Publication.objects.select_related(
+            "dates", "contracting_authority"
+        ).prefetch_related("cpv_codes", "tender_documents")
+        return (
+            queryset,
+            lambda rows: PublicationSerializer(rows, many=True).data,
+            DRFJSONRenderer(),
+        )
+
+    def representation_path(renderer, **fieldset):
+        shape = representation(PublicationSerializer, **fieldset)
+        return shape.queryset(Publication.objects.all()), shape.many, renderer
+
+    paths = [
+        ("serializer + DRF JSON", serializer_path()),
+        ("representation + orjson", representation_path(JSONRenderer())),
+        ("6 fields + orjson", representation_path(JSONRenderer(), **SPARSE)),
+    ]
+    if importlib.util.find_spec("msgpack"):
+        paths.append(
+            ("6 fields + msgpack", representation_path(MessagePackRenderer(), **SPARSE))
+        )
+    brotli = (
+        importlib.import_module("brotli")
+        if importlib.util.find_spec("brotli")
+        else None
+    )
+
+    with benchmark_database():
+        load(args.rows)
+        per_1k = 1000 / args.rows
+        print(
+            f"{'path':<26} {'load':>8} {'serialize':>10} {'render':>8} "
+            f"{'bytes':>10} {'gzip':>9} {'brotli':>9}"
+        )
+        for name, (queryset, serialize, renderer) in paths:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                rows = list(queryset.order_by("-id"))
+                loaded = time.perf_counter()
+                data = serialize(rows)
+                serialized = time.perf_counter()
+                content = renderer.render(data)
+                timings.append(
+                    (
+                        loaded - started,
+                        serialized - loaded,
+                        time.perf_counter() - serialized,
+                    )
+                )
+            load_s, serialize_s, render_s = (
+                sorted(phase)[len(phase) // 2] for phase in zip(*timings)
+            )
+            sizes = [len(content), len(gzip.compress(content, compresslevel=6))]
+            if brotli is not None:
+                sizes.append(len(brotli.compress(content, quality=5)))
+            print(
+                f"{name:<26} {load_s * 1000 * per_1k:6.1f}ms "
+                f"{serialize_s * 1000 * per_1k:8.1f}ms "
+                f"{render_s * 1000 * per_1k:6.1f}ms "
+                + " ".join(
+                    f"{size * per_1k:>{width}.0f}"
+                    for size, width in zip(sizes, (10, 9, 9))
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Full-text search vs. `icontains` on a synthetic corpus.
+
+    python -m benchmarks.search [--rows 500000] [--keepdb]
+
+Loads the corpus into the test database through the ingestion service, then
+times both approaches for the first page of results.
+"""
+
+import argparse
+import time
+
+from .common import benchmark_database, median_ms, setup_django
+
+QUERIES = ["Reinigung", "Dachsanierung Grundschule", "Aufzugsanlagen München"]
+
+
+def load(rows: int):
+    from core.ingestion import ingest_publications
+
+    from .corpus import batched, publications
+
+    started = time.perf_counter()
+    for batch in batched(publications(rows), 5000):
+        ingest_publications(batch)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keepdb", action="store_true", help="reuse a loaded corpus")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Q
+
+    from core.models import Publication
+
+    with benchmark_database(keepdb=args.keepdb) as connection:
+        if Publication.objects.count() < args.rows:
+            print(f"loading {args.rows} publications ...")
+            print(f"loaded in {load(args.rows):.1f}s")
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        print(f"{'query':<30} {'icontains':>12} {'search':>12}")
+        for terms in QUERIES:
+
+            def scan():
+                condition = Q()
+                for word in terms.split():
+                    condition &= Q(title__icontains=word) | Q(
+                        description__icontains=word
+                    )
+                list(Publication.objects.filter(condition).order_by("-id")[:20])
+
+            def search():
+                list(Publication.objects.search(terms)[:20])
+
+            print(
+                f"{terms:<30} {median_ms(scan, args.repeat):>10.1f}ms "
+                f"{median_ms(search, args.repeat):>10.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
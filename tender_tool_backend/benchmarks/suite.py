@@ -0,0 +1,295 @@
+"""Ingestion, serializer and query benchmarks, checked against a baseline.
+
+    python -m benchmarks.suite [--scale 1k|10k|100k] [--repeat 5]
+                               [--baseline benchmarks/baseline.json]
+                               [--save-baseline] [--tolerance 0.5]
+
+Loads a synthetic corpus into a throwaway test database and records, per
+benchmark, the median wall time, the number of SQL queries and the peak
+Python memory (tracemalloc). Compared with the stored baseline for the same
+scale, any extra query, or time/memory beyond the tolerance, is reported as
+a regression and the command exits non-zero. Query counts are exact and
+portable; timings depend on the machine, so record the baseline on the
+machine that runs the comparison (`--save-baseline`).
+
+Postgres only: the schema relies on generated tsvector columns, GIN indexes
+and the `german` text search configuration, none of which exist in SQLite.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from .common import benchmark_database, setup_django
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+BATCH_SIZE = 1000
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+# Timing differences below this are noise, whatever the relative change.
+MIN_MS_DELTA = 5.0
+
+
+@dataclass
+class Result:
+    name: str
+    ms: float
+    queries: int
+    peak_kb: int
+    # Rows per second, for the ingestion benchmarks.
+    rate: float = 0.0
+
+
+def measure(name, func, repeat: int = 1, rows: int = 0, traced=None) -> Result:
+    """Time `func` `repeat` times (median) and count the queries of the last
+    run. Peak memory comes from one extra run of `traced` (default `func`)
+    under tracemalloc, which would otherwise distort the timings."""
+    from core.crawl_runs import count_queries
+
+    timings = []
+    for _ in range(repeat):
+        # Not CaptureQueriesContext: test client requests reset its log.
+        with count_queries() as queries:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    seconds = timings[len(timings) // 2]
+
+    tracemalloc.start()
+    (traced or func)()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(
+        name=name,
+        ms=seconds * 1000,
+        queries=queries[0],
+        peak_kb=peak // 1024,
+        rate=rows / seconds if rows and seconds else 0.0,
+    )
+
+
+def ingestion_benchmarks(rows: int):
+    from core.ingestion import ingest_documents, ingest_publications
+
+    from .corpus import batched, documents, publications
+
+    publication_batches = list(batched(publications(rows), BATCH_SIZE))
+    document_batches = list(batched(documents(rows), BATCH_SIZE))
+    # Ingestion works batch by batch, so the memory of one extra batch is the
+    # peak of the whole load.
+    extra_publications = list(publications(BATCH_SIZE, seed=1, prefix="MEM"))
+    extra_documents = list(documents(BATCH_SIZE // 3, seed=1, prefix="MEM"))
+
+    def create_publications():
+        for batch in publication_batches:
+            ingest_publications(batch)
+
+    def create_documents():
+        for batch in document_batches:
+            ingest_documents(batch)
+
+    # A second run of the same corpus only skips, so each runs once.
+    yield measure(
+        "create_publications",
+        create_publications,
+        rows=rows,
+        traced=lambda: ingest_publications(extra_publications),
+    )
+    yield measure(
+        "create_documents",
+        create_documents,
+        rows=rows * 3,
+        traced=lambda: ingest_documents(extra_documents),
+    )
+    yield measure(
+        "create_publications (unchanged)",
+        create_publications,
+        rows=rows,
+        traced=lambda: ingest_publications(publication_batches[0]),
+    )
+
+
+def read_benchmarks(repeat: int):
+    from django.test import Client, override_settings
+
+    from core.models import Contractor, Publication
+    from core.representation import representation
+    from core.serializers import PublicationSerializer
+    from core.statistics import computed
+
+    page = list(representation().queryset(Publication.objects.order_by("-id"))[:50])
+    authority = Contractor.objects.order_by("pk").first()
+    client = Client(HTTP_HOST="localhost")
+
+    def get(path, status=200, **params):
+        response = client.get(path, params)
+        assert response.status_code == status, response.content[:200]
+        return response
+
+    def uncached(func):
+        return override_settings(RESPONSE_CACHE="off")(func)
+
+    # Warm the response cache for the cached cases.
+    with override_settings(RESPONSE_CACHE="local"):
+        etag = get("/api/publications/", page_size=50)["ETag"]
+
+    def serialize():
+        return PublicationSerializer(page, many=True).data
+
+    cases = [
+        ("serialize 50 publications", serialize),
+        ("serialize 50 publications (fast)", lambda: representation().many(page)),
+        (
+            "api list page 50",
+            uncached(lambda: get("/api/publications/", page_size=50)),
+        ),
+        (
+            "api list page 50 (6 fields)",
+            uncached(
+                lambda: get(
+                    "/api/publications/",
+                    page_size=50,
+                    fields="id,tender_number,title,portal,execution_place",
+                    expand="dates",
+                )
+            ),
+        ),
+        (
+            "api search",
+            uncached(lambda: get("/api/publications/search/", q="Dachsanierung")),
+        ),
+        (
+            "api list page 50 (cached)",
+            override_settings(RESPONSE_CACHE="local")(
+                lambda: get("/api/publications/", page_size=50)
+            ),
+        ),
+        (
+            "api list page 50 (304)",
+            override_settings(RESPONSE_CACHE="local")(
+                lambda: client.get(
+                    "/api/publications/", {"page_size": 50}, HTTP_IF_NONE_MATCH=etag
+                )
+            ),
+        ),
+        ("api stats", lambda: get("/api/stats/")),
+        ("stats recomputation", computed),
+        (
+            "query in_cpv division",
+            lambda: list(Publication.objects.in_cpv("45").order_by("-id")[:50]),
+        ),
+        (
+            "query closing_between",
+            lambda: list(
+                Publication.objects.closing_between(
+                    "2025-03-01T00:00:00Z", "2025-03-08T00:00:00Z"
+                ).order_by("-id")[:50]
+            ),
+        ),
+        (
+            "query contracting_authority",
+            lambda: list(
+                Publication.objects.filter(contracting_authority=authority).order_by(
+                    "-id"
+                )[:50]
+            ),
+        ),
+        (
+            "query search",
+            lambda: list(Publication.objects.search("Dachsanierung Grundschule")[:20]),
+        ),
+    ]
+    for name, func in cases:
+        yield measure(name, func, repeat=repeat)
+
+
+def compare(results, baseline: dict, tolerance: float):
+    """Return a list of regression messages."""
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if expected is None:
+            continue
+        if result.queries > expected["queries"]:
+            regressions.append(
+                f"{result.name}: {result.queries} queries "
+                f"(baseline {expected['queries']})"
+            )
+        for field, unit, floor in (("ms", "ms", MIN_MS_DELTA), ("peak_kb", "KiB", 0)):
+            limit = max(expected[field] * (1 + tolerance), expected[field] + floor)
+            if getattr(result, field) > limit:
+                regressions.append(
+                    f"{result.name}: {getattr(result, field):.0f}{unit} "
+                    f"(baseline {expected[field]:.0f}{unit}, limit {limit:.0f}{unit})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed relative slowdown / memory growth (default 0.5 = 50%%)",
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    if connection.vendor != "postgresql":
+        sys.exit("benchmarks need Postgres (generated tsvector columns, GIN)")
+
+    rows = SCALES[args.scale]
+    with benchmark_database() as connection:
+        results = list(ingestion_benchmarks(rows))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        results += list(read_benchmarks(args.repeat))
+
+    print(f"{'benchmark':<34} {'ms':>10} {'queries':>8} {'peak KiB':>9} {'rows/s':>9}")
+    for result in results:
+        rate = f"{result.rate:>9.0f}" if result.rate else ""
+        print(
+            f"{result.name:<34} {result.ms:>10.1f} {result.queries:>8} "
+            f"{result.peak_kb:>9} {rate}"
+        )
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[args.scale] = {
+            result.name: {
+                "ms": round(result.ms, 1),
+                "queries": result.queries,
+                "peak_kb": result.peak_kb,
+            }
+            for result in results
+        }
+        args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"baseline for {args.scale} saved to {args.baseline}")
+        return
+
+    if args.scale not in baselines:
+        print(f"no {args.scale} baseline in {args.baseline}; run with --save-baseline")
+        return
+    regressions = compare(results, baselines[args.scale], args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"  ❌ {regression}")
+        sys.exit(1)
+    print(f"\n✅ no regressions against the {args.scale} baseline")
+
+
+if __name__ == "__main__":
+    main()
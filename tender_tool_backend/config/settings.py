@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -40,11 +41,15 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
+    "rest_framework",
     "core",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Before anything that reads or changes response bodies.
+    "core.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -124,7 +129,45 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Downloaded tender documents, stored by SHA-256 (see core.downloads)
+DOCUMENT_STORE_ROOT = Path(
+    os.getenv("DOCUMENT_STORE_ROOT", BASE_DIR / "document_store")
+)
+
+# Crawler and background-job reports (core.*, crawler.*) go to stderr;
+# management commands write their summaries to stdout themselves.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"plain": {"format": "%(levelname)s %(name)s: %(message)s"}},
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        name: {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")}
+        for name in ("core", "crawler")
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.PublicationCursorPagination",
+    "PAGE_SIZE": 50,
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        # Offered only when msgpack is installed.
+        *(["core.renderers.MessagePackRenderer"] if find_spec("msgpack") else []),
+    ],
+}
+
+# Rendered publication API responses (see core.response_cache): "local"
+# (per process), "redis" (shared, at RESPONSE_CACHE_URL) or "off".
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "local")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
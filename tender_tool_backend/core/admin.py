@@ -4,7 +4,20 @@ from .models import (
     PublicationDates,
     PublicationDocument,
     Contractor,
+    ContractorAlias,
     CPVCode,
+    CrawlState,
+    CrawledPage,
+    CrawlJob,
+    CacheGeneration,
+    PublicationStat,
+    ArchivedPublication,
+    DocumentTextChunk,
+    ExtractionCacheEntry,
+    CrawlRun,
+    CrawlStep,
+    MatchProfile,
+    ProfileMatch,
 )
 
 # Register your models here.
@@ -12,4 +25,17 @@ admin.site.register(Publication)
 admin.site.register(PublicationDates)
 admin.site.register(PublicationDocument)
 admin.site.register(Contractor)
+admin.site.register(ContractorAlias)
 admin.site.register(CPVCode)
+admin.site.register(CrawlState)
+admin.site.register(CrawledPage)
+admin.site.register(CrawlJob)
+admin.site.register(CacheGeneration)
+admin.site.register(PublicationStat)
+admin.site.register(ArchivedPublication)
+admin.site.register(DocumentTextChunk)
+admin.site.register(ExtractionCacheEntry)
+admin.site.register(CrawlRun)
+admin.site.register(CrawlStep)
+admin.site.register(MatchProfile)
+admin.site.register(ProfileMatch)
@@ -0,0 +1,117 @@
+"""Moving expired tenders out of the hot tables.
+
+Publication and the tables hanging off it (dates, CPV links, documents and
+their text, signatures, matches) keep only open tenders and those that
+expired recently, so their indexes grow with the open market rather than
+with all history. archive_expired() moves the rest to ArchivedPublication:
+one row per tender holding its API representation (dates, authority, CPV
+codes, documents) under its original id. Once archived, a tender no longer
+appears in lists, search, exports, matching or the statistics; the detail
+endpoint serves it with `?history=1` and /api/archive/ lists the archive.
+
+Tenders move in small batches, each in its own transaction that locks only
+the rows it moves and skips rows another transaction holds, so ingestion is
+never blocked for longer than one batch. Downloaded files stay in the
+document store (the archive keeps their sha256).
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedPublication, Publication, PublicationDates
+from .response_cache import invalidate
+from .serializers import PublicationSerializer
+from .statistics import record, snapshot
+
+# Expired tenders stay hot this long, for late amendments and awards.
+ARCHIVE_AFTER_DAYS = 30
+BATCH_SIZE = 500
+
+
+@dataclass
+class ArchiveResult:
+    archived: int = 0
+    documents: int = 0
+    batches: int = 0
+
+    def __str__(self):
+        return (
+            f"Archived {self.archived} publications with {self.documents} "
+            f"documents in {self.batches} batches"
+        )
+
+
+def archive_expired(
+    older_than_days: float = ARCHIVE_AFTER_DAYS,
+    batch_size: int = BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    pause: float = 0.0,
+) -> ArchiveResult:
+    """Archive the tenders that expired more than `older_than_days` ago,
+    sleeping `pause` seconds between batches."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    result = ArchiveResult()
+    while max_batches is None or result.batches < max_batches:
+        archived, documents = archive_batch(cutoff, batch_size)
+        if not archived:
+            break
+        result.archived += archived
+        result.documents += documents
+        result.batches += 1
+        if pause:
+            time.sleep(pause)
+    return result
+
+
+def archive_batch(cutoff, batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """Archive up to `batch_size` tenders that expired before `cutoff`;
+    returns how many tenders and documents were moved."""
+    with transaction.atomic():
+        ids = list(
+            Publication.objects.expired(cutoff)
+            .order_by("pk")
+            .select_for_update(skip_locked=True, of=("self",))
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+        publications = list(
+            Publication.objects.filter(pk__in=ids)
+            .select_related("dates", "contracting_authority")
+            .prefetch_related("cpv_codes", "tender_documents")
+        )
+        # A tender that was archived before and then crawled again.
+        ArchivedPublication.objects.filter(
+            tender_number__in=[
+                publication.tender_number for publication in publications
+            ]
+        ).delete()
+        ArchivedPublication.objects.bulk_create(
+            [
+                ArchivedPublication(
+                    id=publication.pk,
+                    tender_number=publication.tender_number,
+                    portal=publication.portal,
+                    expired_at=publication.dates.expiration_time
+                    or publication.dates.application_deadline,
+                    data=PublicationSerializer(publication).data,
+                )
+                for publication in publications
+            ]
+        )
+
+        record(snapshot(ids), {})
+        invalidate(ids, {publication.portal for publication in publications})
+        documents = sum(
+            len(publication.tender_documents.all()) for publication in publications
+        )
+        Publication.objects.filter(pk__in=ids).delete()
+        PublicationDates.objects.filter(
+            pk__in=[publication.dates_id for publication in publications]
+        ).delete()
+    return len(publications), documents
@@ -0,0 +1,158 @@
+"""Merging of duplicate contracting authorities.
+
+Ingestion already reuses a contractor whose normalized name matches
+exactly. This batch step catches the rest: spelling variants found by
+trigram similarity (see core.names.similar_pairs) are clustered and every
+cluster is folded into its oldest contractor. The normalized names of the
+merged contractors are kept as ContractorAlias rows, so that ingestion
+resolves those spellings to the surviving contractor from then on.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contractor, ContractorAlias, MatchProfile, Publication
+from .names import postal_code, similar_pairs
+from .response_cache import invalidate
+from .statistics import record, snapshot
+
+MATCH_THRESHOLD = 0.7
+
+
+@dataclass
+class MergeResult:
+    clusters: List[List[int]] = field(default_factory=list)
+    merged: int = 0
+    publications: int = 0
+
+    def __str__(self):
+        return (
+            f"✅ contractors: {len(self.clusters)} duplicate groups, "
+            f"merged {self.merged} contractors, repointed "
+            f"{self.publications} publications"
+        )
+
+
+def find_duplicates(
+    contractors: Dict[int, tuple], threshold: float = MATCH_THRESHOLD
+) -> List[List[int]]:
+    """Group contractor ids into clusters of duplicates.
+
+    `contractors` maps id -> (normalized name, address). Equal or similar
+    keys are merged unless that would put two different postal codes into
+    one cluster.
+    """
+    parent = {pk: pk for pk in contractors}
+    # Postal code of each cluster, so that chains of similar names cannot
+    # join two authorities in different places.
+    codes = {pk: postal_code(address) for pk, (_, address) in contractors.items()}
+
+    def root(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    def union(a, b):
+        a, b = root(a), root(b)
+        if a == b or (codes[a] and codes[b] and codes[a] != codes[b]):
+            return
+        a, b = min(a, b), max(a, b)
+        parent[b] = a
+        codes[a] = codes[a] or codes[b]
+
+    by_key = {}
+    for pk, (key, _) in sorted(contractors.items()):
+        by_key.setdefault(key, []).append(pk)
+    for pks in by_key.values():
+        for pk in pks[1:]:
+            union(pks[0], pk)
+
+    keys = {pks[0]: key for key, pks in by_key.items()}
+    for a, b, _ in similar_pairs(keys, threshold):
+        union(a, b)
+
+    clusters = {}
+    for pk in sorted(contractors):
+        clusters.setdefault(root(pk), []).append(pk)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def merge_duplicates(
+    threshold: float = MATCH_THRESHOLD, dry_run: bool = False
+) -> MergeResult:
+    result = MergeResult()
+
+    contractors = {
+        pk: (key, address)
+        for pk, key, address in Contractor.objects.exclude(
+            normalized_name=""
+        ).values_list("pk", "normalized_name", "address")
+    }
+    result.clusters = find_duplicates(contractors, threshold)
+    if dry_run:
+        return result
+
+    for cluster in result.clusters:
+        with transaction.atomic():
+            # Locked, so that publications ingested meanwhile wait for the
+            # merge instead of pointing at (and cascading with) a duplicate.
+            rows = list(
+                Contractor.objects.select_for_update()
+                .filter(pk__in=cluster)
+                .order_by("pk")
+            )
+            if len(rows) < 2:
+                continue
+            canonical, *duplicates = rows
+            for duplicate in duplicates:
+                canonical.address = canonical.address or duplicate.address
+                canonical.contact_email = (
+                    canonical.contact_email or duplicate.contact_email
+                )
+            canonical.save()
+            duplicate_ids = [duplicate.pk for duplicate in duplicates]
+            publication_ids = list(
+                Publication.objects.filter(
+                    contracting_authority_id__in=duplicate_ids
+                ).values_list("pk", flat=True)
+            )
+            stats_before = snapshot(publication_ids)
+            result.publications += Publication.objects.filter(
+                contracting_authority_id__in=duplicate_ids
+            ).update(contracting_authority=canonical, updated_at=timezone.now())
+            record(stats_before, snapshot(publication_ids))
+            ContractorAlias.objects.filter(contractor_id__in=duplicate_ids).update(
+                contractor=canonical
+            )
+            ContractorAlias.objects.bulk_create(
+                [
+                    ContractorAlias(
+                        normalized_name=duplicate.normalized_name,
+                        contractor=canonical,
+                    )
+                    for duplicate in duplicates
+                    if duplicate.normalized_name != canonical.normalized_name
+                ],
+                update_conflicts=True,
+                unique_fields=["normalized_name"],
+                update_fields=["contractor"],
+            )
+            # Profiles that excluded a duplicate exclude the canonical one.
+            exclusions = MatchProfile.excluded_authorities.through
+            exclusions.objects.bulk_create(
+                [
+                    exclusions(matchprofile_id=profile_id, contractor=canonical)
+                    for profile_id in exclusions.objects.filter(
+                        contractor_id__in=duplicate_ids
+                    ).values_list("matchprofile_id", flat=True)
+                ],
+                ignore_conflicts=True,
+            )
+            Contractor.objects.filter(pk__in=duplicate_ids).delete()
+            invalidate(everything=True)
+            result.merged += len(duplicate_ids)
+    return result
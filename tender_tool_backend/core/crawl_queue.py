@@ -0,0 +1,244 @@
+"""Crawl work shared by any number of workers through the database.
+
+Listing pages, detail pages and document downloads are CrawlJob rows. A
+worker leases due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so workers
+never get the same job and never wait for a job another one is taking. A
+lease lasts LEASE_SECONDS and is extended by the worker's heartbeats; the jobs of a
+worker that stops heartbeating are queued again once their lease expires.
+Failed jobs are retried with exponential backoff until `max_attempts`.
+
+Per-portal concurrency caps hold across all workers: leasing from a portal
+locks its CrawlState row for the few milliseconds a lease takes and counts
+the portal's live leases before taking more. A worker finding a portal
+locked by another one tries the other portals first.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CrawlJob, CrawlState, Publication, PublicationDocument
+
+LEASE_SECONDS = 300
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+# How often a worker looks for expired leases.
+REQUEUE_EVERY = timedelta(seconds=30)
+# Listing pages feed everything else.
+LISTING_PRIORITY = 100
+# Deadlines closer than this raise a job's priority, one step per day.
+PRIORITY_DAYS = 30
+# Pseudo-portal that document downloads are capped under.
+DOCUMENTS = "documents"
+
+
+def deadline_priority(deadline, now=None) -> int:
+    """PRIORITY_DAYS for a deadline due now, falling to 0 for deadlines
+    PRIORITY_DAYS away, past or unknown."""
+    if deadline is None:
+        return 0
+    days = (deadline - (now or timezone.now())) / timedelta(days=1)
+    if days < 0:
+        return 0
+    return max(0, PRIORITY_DAYS - int(days))
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retrying a job that failed `attempts` times: doubling
+    from BACKOFF_SECONDS, jittered so failed jobs do not retry in lockstep."""
+    seconds = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=seconds * random.uniform(0.5, 1.0))
+
+
+def enqueue(jobs: Iterable[CrawlJob]):
+    """Queue jobs; a page or document already queued or leased is not queued
+    twice."""
+    CrawlJob.objects.bulk_create(list(jobs), ignore_conflicts=True)
+
+
+def enqueue_listings(portals: Dict[str, str]):
+    """Portal -> listing URL."""
+    enqueue(
+        CrawlJob(
+            kind=CrawlJob.LISTING, portal=portal, url=url, priority=LISTING_PRIORITY
+        )
+        for portal, url in portals.items()
+    )
+
+
+def enqueue_details(portal: str, urls: List[str]):
+    """Detail pages, pages of tenders closing soon first."""
+    deadlines = dict(
+        Publication.objects.filter(publication_url__in=urls).values_list(
+            "publication_url", "dates__application_deadline"
+        )
+    )
+    now = timezone.now()
+    enqueue(
+        CrawlJob(
+            kind=CrawlJob.DETAIL,
+            portal=portal,
+            url=url,
+            priority=deadline_priority(deadlines.get(url), now),
+        )
+        for url in urls
+    )
+
+
+def enqueue_documents(document_ids: List[int]):
+    """Downloads of the documents not stored yet, for tenders closing soon
+    first."""
+    documents = PublicationDocument.objects.filter(
+        pk__in=document_ids, sha256__isnull=True
+    ).values_list("pk", "download_link", "tender__dates__application_deadline")
+    now = timezone.now()
+    enqueue(
+        CrawlJob(
+            kind=CrawlJob.DOCUMENT,
+            portal=DOCUMENTS,
+            url=url,
+            document_id=pk,
+            priority=deadline_priority(deadline, now),
+        )
+        for pk, url, deadline in documents
+    )
+
+
+class CrawlQueue:
+    def __init__(
+        self,
+        worker: str,
+        caps: Dict[str, int],
+        lease_seconds: float = LEASE_SECONDS,
+    ):
+        # Portal -> maximum jobs leased at once, by all workers together.
+        # Only jobs of these portals are leased.
+        self.worker = worker
+        self.caps = caps
+        self.lease_duration = timedelta(seconds=lease_seconds)
+        self._requeued_at = None
+        CrawlState.objects.bulk_create(
+            [CrawlState(portal=portal) for portal in caps], ignore_conflicts=True
+        )
+
+    def add_details(self, portal: str, urls: List[str]):
+        enqueue_details(portal, urls)
+
+    def lease(self, limit: int = 1) -> List[CrawlJob]:
+        """Up to `limit` due jobs within the caps, highest priority first
+        within a portal. Portals are tried in random order, those another
+        worker is leasing from at the moment last."""
+        now = timezone.now()
+        if self._requeued_at is None or now - self._requeued_at >= REQUEUE_EVERY:
+            self.requeue_expired(now)
+            self._requeued_at = now
+        portals = list(self.caps)
+        random.shuffle(portals)
+        jobs, busy = [], []
+        for portal in portals:
+            if len(jobs) == limit:
+                break
+            leased = self._lease_from(portal, limit - len(jobs), now, wait=False)
+            if leased is None:
+                busy.append(portal)
+            else:
+                jobs += leased
+        for portal in busy:
+            if len(jobs) == limit:
+                break
+            jobs += self._lease_from(portal, limit - len(jobs), now, wait=True)
+        return jobs
+
+    def _lease_from(
+        self, portal: str, limit: int, now: datetime, wait: bool
+    ) -> Optional[List[CrawlJob]]:
+        """None if another worker holds the portal and `wait` is off."""
+        with transaction.atomic():
+            if not CrawlState.objects.select_for_update(skip_locked=not wait).filter(
+                portal=portal
+            ):
+                return None
+            jobs = list(
+                CrawlJob.objects.select_for_update(skip_locked=True)
+                .filter(status=CrawlJob.QUEUED, portal=portal, available_at__lte=now)
+                .order_by("-priority", "available_at")[:limit]
+            )
+            if not jobs:
+                return []
+            active = CrawlJob.objects.filter(
+                status=CrawlJob.LEASED, portal=portal
+            ).count()
+            jobs = jobs[: max(0, self.caps[portal] - active)]
+            CrawlJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=CrawlJob.LEASED,
+                leased_by=self.worker,
+                lease_expires_at=now + self.lease_duration,
+                attempts=F("attempts") + 1,
+            )
+        for job in jobs:
+            job.status = CrawlJob.LEASED
+            job.leased_by = self.worker
+            job.lease_expires_at = now + self.lease_duration
+            job.attempts += 1
+        return jobs
+
+    def heartbeat(self, job_ids: Iterable[int]) -> Set[int]:
+        """Extend the leases of these jobs; returns the ones still held (a
+        lease that expired may have gone to another worker)."""
+        held = self._held(job_ids)
+        held_ids = set(held.values_list("pk", flat=True))
+        held.filter(pk__in=held_ids).update(
+            lease_expires_at=timezone.now() + self.lease_duration
+        )
+        return held_ids
+
+    def complete(self, job: CrawlJob) -> bool:
+        return bool(
+            self._held([job.pk]).update(
+                status=CrawlJob.DONE,
+                lease_expires_at=None,
+                finished_at=timezone.now(),
+            )
+        )
+
+    def fail(self, job: CrawlJob, error: str) -> bool:
+        """Queue the job again after a backoff, or give up on it."""
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            changes = {"status": CrawlJob.FAILED, "finished_at": now}
+        else:
+            changes = {
+                "status": CrawlJob.QUEUED,
+                "available_at": now + backoff(job.attempts),
+            }
+        return bool(
+            self._held([job.pk]).update(
+                leased_by=None, lease_expires_at=None, last_error=error, **changes
+            )
+        )
+
+    def requeue_expired(self, now: Optional[datetime] = None) -> int:
+        """Release the leases of workers that stopped heartbeating."""
+        now = now or timezone.now()
+        expired = CrawlJob.objects.filter(
+            status=CrawlJob.LEASED, lease_expires_at__lt=now
+        )
+        gave_up = expired.filter(attempts__gte=F("max_attempts")).update(
+            status=CrawlJob.FAILED,
+            leased_by=None,
+            lease_expires_at=None,
+            last_error="lease expired",
+            finished_at=now,
+        )
+        return gave_up + expired.update(
+            status=CrawlJob.QUEUED, leased_by=None, lease_expires_at=None
+        )
+
+    def _held(self, job_ids: Iterable[int]):
+        return CrawlJob.objects.filter(
+            pk__in=list(job_ids), status=CrawlJob.LEASED, leased_by=self.worker
+        )
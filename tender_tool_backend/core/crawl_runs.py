@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from crawler.instrumentation import LLM, RunRecord
+from .models import CrawlRun, CrawlStep
+
+
+@contextmanager
+def count_queries():
+    """Count the queries this thread's connection runs inside the block."""
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def save_run(run: RunRecord) -> CrawlRun:
+    """Instrumentation sink persisting a finished run with its steps."""
+    with transaction.atomic():
+        crawl_run = CrawlRun.objects.create(
+            portal=run.portal,
+            task=run.task,
+            status=run.status,
+            error=run.error,
+            started_at=run.started_at,
+            duration=run.duration,
+            llm_calls=sum(1 for step in run.steps if step.kind == LLM),
+            prompt_tokens=run.total("prompt_tokens"),
+            completion_tokens=run.total("completion_tokens"),
+            db_queries=run.total("db_queries"),
+        )
+        CrawlStep.objects.bulk_create(
+            CrawlStep(
+                run=crawl_run,
+                position=position,
+                kind=step.kind,
+                name=step.name[:200],
+                started_at=step.started_at,
+                duration=step.duration,
+                prompt_tokens=step.prompt_tokens,
+                completion_tokens=step.completion_tokens,
+                db_queries=step.db_queries,
+                error=step.error,
+            )
+            for position, step in enumerate(run.steps)
+        )
+    return crawl_run
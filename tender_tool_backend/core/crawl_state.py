@@ -0,0 +1,73 @@
+from datetime import timedelta
+from typing import List
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CrawledPage, CrawlState, Publication
+
+# Known tenders published up to this long before the portal's high-water
+# mark are fetched again, like older ones that are still open: amendments
+# come while a tender runs.
+RECHECK_DAYS = 14
+
+
+class CrawlTracker:
+    """Decides which listing entries and pages actually need crawling.
+
+    A listing entry is skipped before its detail page is opened when the
+    page is already known, the entry is more than RECHECK_DAYS older than
+    the portal's high-water mark and its tender has closed. A fetched page
+    is skipped before it reaches a parser or the LLM when its content hash
+    matches the last processed version.
+    """
+
+    def select(self, portal: str, entries: List) -> List:
+        state = CrawlState.objects.filter(portal=portal).first()
+        if state is None or state.high_water_mark is None:
+            return list(entries)
+        cutoff = state.high_water_mark - timedelta(days=RECHECK_DAYS)
+        known = set(
+            CrawledPage.objects.filter(
+                url__in=[entry.url for entry in entries]
+            ).values_list("url", flat=True)
+        )
+        old = {
+            entry.url
+            for entry in entries
+            if entry.url in known
+            and entry.published_at is not None
+            and entry.published_at < cutoff
+        }
+        now = timezone.now()
+        still_open = set(
+            Publication.objects.filter(publication_url__in=old)
+            .filter(
+                Q(dates__application_deadline__gte=now)
+                | Q(
+                    dates__application_deadline__isnull=True,
+                    dates__expiration_time__gte=now,
+                )
+            )
+            .values_list("publication_url", flat=True)
+        )
+        return [entry for entry in entries if entry.url not in old - still_open]
+
+    def unchanged(self, url: str, content_hash: str) -> bool:
+        return CrawledPage.objects.filter(url=url, content_hash=content_hash).exists()
+
+    def remember(self, portal: str, url: str, content_hash: str):
+        CrawledPage.objects.update_or_create(
+            url=url, defaults={"portal": portal, "content_hash": content_hash}
+        )
+
+    def advance(self, portal: str, entries: List):
+        dated = [entry for entry in entries if entry.published_at is not None]
+        if not dated:
+            return
+        newest = max(dated, key=lambda entry: entry.published_at)
+        state, _ = CrawlState.objects.get_or_create(portal=portal)
+        if state.high_water_mark is None or newest.published_at > state.high_water_mark:
+            state.high_water_mark = newest.published_at
+            state.high_water_url = newest.url
+            state.save()
@@ -0,0 +1,231 @@
+"""Streaming, content-addressed download of tender documents.
+
+Files are streamed to `<DOCUMENT_STORE_ROOT>/.partial/<document id>` and
+hashed on the way, then moved to `<root>/<aa>/<bb>/<sha256>`. The same
+document attached to several tenders or portals is stored once. An
+interrupted download resumes from its partial file with an HTTP Range
+request.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PublicationDocument
+from .response_cache import invalidate
+
+CHUNK_SIZE = 256 * 1024
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+# Magic numbers for the formats portals actually serve, for when they send
+# everything as application/octet-stream.
+_SIGNATURES = [
+    (b"%PDF", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\xd0\xcf\x11\xe0", "application/x-ole-storage"),
+    (b"<?xml", "application/xml"),
+]
+
+
+class DownloadFailed(Exception):
+    pass
+
+
+class DocumentStore:
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or settings.DOCUMENT_STORE_ROOT)
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def partial_path(self, document_id: int) -> Path:
+        return self.root / ".partial" / str(document_id)
+
+    def commit(self, partial: Path, sha256: str) -> Path:
+        final = self.path_for(sha256)
+        if final.exists():
+            partial.unlink()
+        else:
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(partial, final)
+        return final
+
+
+@dataclass
+class DownloadStats:
+    downloaded: int = 0
+    deduplicated: int = 0
+    failed: int = 0
+    bytes: int = 0
+
+    def __str__(self):
+        return (
+            f"✅ documents: downloaded {self.downloaded} "
+            f"({self.bytes / 1_048_576:.1f} MB), "
+            f"already stored {self.deduplicated}, failed {self.failed}"
+        )
+
+
+class DocumentDownloader:
+    def __init__(
+        self,
+        store: Optional[DocumentStore] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        max_concurrency: int = 16,
+        max_per_host: int = 2,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.store = store or DocumentStore()
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._hosts = {}
+
+    async def download_all(self, documents: Iterable[PublicationDocument]):
+        stats = DownloadStats()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        own_client = self.client is None
+        client = self.client or httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0, read=120.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+        )
+
+        async def run(document):
+            async with slots, self._host_slot(document.download_link):
+                await self._download(client, document, stats)
+
+        try:
+            await asyncio.gather(*(run(document) for document in documents))
+        finally:
+            if own_client:
+                await client.aclose()
+        return stats
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return self._hosts[host]
+
+    async def _download(self, client, document, stats: DownloadStats):
+        partial = self.store.partial_path(document.pk)
+        partial.parent.mkdir(parents=True, exist_ok=True)
+
+        for attempt in range(self.retries + 1):
+            try:
+                sha256, size, mime_type = await self._stream(client, document, partial)
+                break
+            except (httpx.HTTPError, httpx.InvalidURL) as exc:
+                # Anything else (redirect loops, bad links, undecodable
+                # bodies) fails this document only, without retrying.
+                if isinstance(exc, httpx.HTTPStatusError):
+                    retryable = exc.response.status_code in RETRY_STATUSES
+                else:
+                    retryable = isinstance(exc, httpx.TransportError) and not (
+                        isinstance(exc, httpx.UnsupportedProtocol)
+                    )
+                if not retryable or attempt == self.retries:
+                    stats.failed += 1
+                    logger.warning(
+                        "%s: download failed (%s)", document.download_link, exc
+                    )
+                    return
+                await asyncio.sleep(self.backoff * 2**attempt)
+
+        if self.store.path_for(sha256).exists():
+            stats.deduplicated += 1
+        else:
+            stats.downloaded += 1
+            stats.bytes += size
+        self.store.commit(partial, sha256)
+
+        await sync_to_async(self._record)(document, sha256, size, mime_type)
+
+    def _record(self, document, sha256: str, size: int, mime_type: str):
+        PublicationDocument.objects.filter(pk=document.pk).update(
+            sha256=sha256,
+            size=size,
+            mime_type=mime_type,
+            downloaded_at=timezone.now(),
+        )
+        invalidate([document.tender_id])
+
+    async def _stream(self, client, document, partial: Path):
+        digest = hashlib.sha256()
+        offset = 0
+        if partial.exists():
+            # Resume: re-hash what we already have, then ask for the rest.
+            with partial.open("rb") as handle:
+                for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    offset += len(chunk)
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        async with client.stream(
+            "GET", document.download_link, headers=headers
+        ) as response:
+            content_type = response.headers.get("content-type", "")
+            if response.status_code == 416:
+                # The partial file is already complete.
+                content_type = ""
+            else:
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    # Server ignored the Range header; start over.
+                    digest, offset = hashlib.sha256(), 0
+                with partial.open("ab" if offset else "wb") as handle:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        handle.write(chunk)
+                        digest.update(chunk)
+                        offset += len(chunk)
+
+        return (
+            digest.hexdigest(),
+            offset,
+            self._mime_type(document, partial, content_type),
+        )
+
+    def _mime_type(self, document, partial: Path, content_type: str) -> str:
+        content_type = content_type.split(";")[0].strip().lower()
+        if content_type and content_type != "application/octet-stream":
+            return content_type
+        with partial.open("rb") as handle:
+            head = handle.read(8)
+        for signature, mime_type in _SIGNATURES:
+            if head.startswith(signature):
+                return mime_type
+        guessed, _ = mimetypes.guess_type(document.filename)
+        return guessed or "application/octet-stream"
+
+
+async def download_document(
+    document_id: int, downloader: Optional[DocumentDownloader] = None
+):
+    """Store one document, e.g. for a crawl job; raises DownloadFailed."""
+    document = await PublicationDocument.objects.aget(pk=document_id)
+    if document.sha256:
+        return
+    stats = await (downloader or DocumentDownloader()).download_all([document])
+    if stats.failed:
+        raise DownloadFailed(f"downloading {document.download_link} failed")
+
+
+def pending_documents():
+    return PublicationDocument.objects.filter(sha256__isnull=True).order_by("pk")
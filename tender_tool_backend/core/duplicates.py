@@ -0,0 +1,291 @@
+"""Detection of the same tender published on several portals.
+
+Each publication gets a one-permutation MinHash signature (every shingle is
+hashed once and kept in one of NUM_PERM bins; empty bins borrow from the
+next filled one) over word pairs of its title and description plus its
+authority and deadline (see shingles()). The signature
+is cut into BANDS bands of ROWS values and every band is hashed to an LSH
+bucket key, so publications whose estimated Jaccard similarity is high land
+in a shared bucket with high probability. Candidates from shared buckets
+are confirmed on the full signature (THRESHOLD), must come from different
+portals and, when both have one, close within a day of each other.
+
+Confirmed duplicates are linked to the oldest publication of their cluster
+through Publication.canonical. index_publications() does this for freshly
+ingested publications; cluster_backlog() for everything, in time roughly
+linear in the number of publications (one pass over the bucket index
+sorted by key, skipping buckets larger than MAX_BUCKET).
+"""
+
+import hashlib
+import itertools
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from .models import LshBucket, Publication, PublicationSignature
+from .names import fold
+from .response_cache import invalidate
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.7
+MAX_BUCKET = 20
+CHUNK_SIZE = 5000
+
+_EMPTY = 1 << 31
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}I")
+
+
+@dataclass
+class LinkResult:
+    signed: int = 0
+    candidates: int = 0
+    duplicates: int = 0
+    clusters: int = 0
+
+    def __str__(self):
+        return (
+            f"Signed {self.signed} publications, checked {self.candidates} "
+            f"candidate pairs, linked {self.duplicates} duplicates in "
+            f"{self.clusters} clusters"
+        )
+
+
+def shingles(title, description, authority_key, deadline) -> Set[str]:
+    words = fold(f"{title or ''} {description or ''}").split()
+    result = {f"{first} {second}" for first, second in zip(words, words[1:])}
+    if len(words) == 1:
+        result.add(words[0])
+    if authority_key:
+        result.add(f"authority:{authority_key}")
+    if deadline is not None:
+        result.add(f"deadline:{deadline:%Y-%m-%d}")
+    return result
+
+
+def minhash(shingle_set: Iterable[str]) -> Optional[List[int]]:
+    # blake2b rather than hash(): signatures are stored and compared across
+    # processes. The low bits pick the bin, the top 31 bits are the value.
+    signature = [_EMPTY] * NUM_PERM
+    for shingle in shingle_set:
+        digest = hashlib.blake2b(shingle.encode(), digest_size=8).digest()
+        h = int.from_bytes(digest, "little")
+        slot, value = h % NUM_PERM, h >> 33
+        if value < signature[slot]:
+            signature[slot] = value
+    filled = [slot for slot, value in enumerate(signature) if value != _EMPTY]
+    if not filled:
+        return None
+    for offset in range(1, NUM_PERM):
+        slot = (filled[0] - offset) % NUM_PERM
+        if signature[slot] == _EMPTY:
+            signature[slot] = signature[(slot + 1) % NUM_PERM]
+    return signature
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f"<{ROWS + 1}i", band, *values), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(first: List[int], second: List[int]) -> float:
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def _sign(publication_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """Compute and store signatures and bucket keys; returns the signatures."""
+    publication_ids = list(publication_ids)
+    publications = Publication.objects.filter(pk__in=publication_ids).values_list(
+        "pk",
+        "title",
+        "description",
+        "contracting_authority__normalized_name",
+        "dates__application_deadline",
+    )
+    signatures = {}
+    for pk, title, description, authority_key, deadline in publications:
+        signature = minhash(shingles(title, description, authority_key, deadline))
+        if signature is not None:
+            signatures[pk] = signature
+
+    PublicationSignature.objects.bulk_create(
+        [
+            PublicationSignature(publication_id=pk, minhash=_SIGNATURE.pack(*signature))
+            for pk, signature in signatures.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["publication"],
+        update_fields=["minhash"],
+    )
+    LshBucket.objects.filter(publication_id__in=publication_ids).delete()
+    LshBucket.objects.bulk_create(
+        [
+            LshBucket(key=key, publication_id=pk)
+            for pk, signature in signatures.items()
+            for key in band_keys(signature)
+        ],
+        batch_size=10_000,
+    )
+    return signatures
+
+
+def _confirm(pairs: Set[tuple]) -> List[tuple]:
+    """The candidate pairs that really are the same tender."""
+    confirmed = []
+    for batch in _batched(sorted(pairs), CHUNK_SIZE):
+        # Portal and deadline rule out most candidates; only the rest need
+        # their signatures loaded.
+        details = dict(
+            (pk, (portal, deadline))
+            for pk, portal, deadline in Publication.objects.filter(
+                pk__in={pk for pair in batch for pk in pair}
+            ).values_list("pk", "portal", "dates__application_deadline")
+        )
+        batch = [
+            (first, second)
+            for first, second in batch
+            if first in details
+            and second in details
+            and _compatible(details[first], details[second])
+        ]
+        signatures = {
+            pk: _SIGNATURE.unpack(minhash)
+            for pk, minhash in PublicationSignature.objects.filter(
+                pk__in={pk for pair in batch for pk in pair}
+            ).values_list("pk", "minhash")
+        }
+        confirmed += [
+            (first, second)
+            for first, second in batch
+            if first in signatures
+            and second in signatures
+            and similarity(signatures[first], signatures[second]) >= THRESHOLD
+        ]
+    return confirmed
+
+
+def _compatible(first: tuple, second: tuple) -> bool:
+    (portal_a, deadline_a), (portal_b, deadline_b) = first, second
+    if portal_a == portal_b:
+        return False
+    return not (
+        deadline_a and deadline_b and abs(deadline_a - deadline_b) > timedelta(days=1)
+    )
+
+
+def _link(pairs: List[tuple]) -> LinkResult:
+    """Merge the pairs with the clusters their publications are already in
+    and point every member at the oldest publication of its cluster."""
+    result = LinkResult()
+    parent = {}
+
+    def find(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    def union(first, second):
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    for first, second in pairs:
+        union(first, second)
+    current = {}
+    for batch in _batched(list(parent), CHUNK_SIZE):
+        current.update(
+            Publication.objects.filter(pk__in=batch).values_list("pk", "canonical_id")
+        )
+    for pk, canonical_id in list(current.items()):
+        if canonical_id is not None:
+            union(pk, canonical_id)
+    for batch in _batched(list(parent), CHUNK_SIZE):
+        for pk, canonical_id in Publication.objects.filter(
+            canonical_id__in=batch
+        ).values_list("pk", "canonical_id"):
+            current[pk] = canonical_id
+            union(pk, canonical_id)
+
+    changed = []
+    clusters = set()
+    for pk in parent:
+        root = find(pk)
+        clusters.add(root)
+        canonical_id = None if root == pk else root
+        if current.get(pk, None) != canonical_id:
+            changed.append(Publication(pk=pk, canonical_id=canonical_id))
+    Publication.objects.bulk_update(changed, ["canonical"], batch_size=1000)
+    if changed:
+        invalidate([publication.pk for publication in changed])
+    result.duplicates = len(parent) - len(clusters)
+    result.clusters = len(clusters)
+    return result
+
+
+def index_publications(publication_ids: Iterable[int]) -> LinkResult:
+    """Sign new or amended publications and link them to their duplicates."""
+    signatures = _sign(publication_ids)
+    keys = defaultdict(list)
+    for pk, signature in signatures.items():
+        for key in band_keys(signature):
+            keys[key].append(pk)
+
+    buckets = defaultdict(list)
+    for key, pk in LshBucket.objects.filter(key__in=list(keys)).values_list(
+        "key", "publication_id"
+    ):
+        buckets[key].append(pk)
+    pairs = set()
+    for key, members in buckets.items():
+        if len(members) <= MAX_BUCKET:
+            for pk in keys[key]:
+                pairs.update(
+                    tuple(sorted((pk, other))) for other in members if other != pk
+                )
+
+    result = _link(_confirm(pairs))
+    result.signed = len(signatures)
+    result.candidates = len(pairs)
+    return result
+
+
+def cluster_backlog(chunk_size: int = CHUNK_SIZE) -> LinkResult:
+    """Sign every publication that has no signature yet, then find all
+    duplicate pairs in one sorted pass over the bucket index."""
+    signed = 0
+    missing = Publication.objects.filter(signature__isnull=True).values_list(
+        "pk", flat=True
+    )
+    for batch in _batched(list(missing.iterator(chunk_size=chunk_size)), chunk_size):
+        signed += len(_sign(batch))
+
+    pairs = set()
+    buckets = LshBucket.objects.order_by("key").values_list("key", "publication_id")
+    for _, group in itertools.groupby(
+        buckets.iterator(chunk_size=chunk_size), key=lambda row: row[0]
+    ):
+        members = [pk for _, pk in group]
+        if 1 < len(members) <= MAX_BUCKET:
+            pairs.update(itertools.combinations(sorted(members), 2))
+
+    result = _link(_confirm(pairs))
+    result.signed = signed
+    result.candidates = len(pairs)
+    return result
+
+
+def _batched(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
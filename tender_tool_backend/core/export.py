@@ -0,0 +1,244 @@
+"""Streaming export of publications as CSV, NDJSON or Parquet.
+
+Publications are read with a server-side cursor, `chunk_size` rows at a
+time, and their dates, contracting authority, CPV codes and documents are
+fetched per chunk. Each writer yields encoded bytes as it goes, so memory
+stays at about one chunk however many rows are exported.
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Publication
+
+CHUNK_SIZE = 2000
+
+PUBLICATION_FIELDS = [
+    "id",
+    "tender_number",
+    "title",
+    "description",
+    "tender_procedure",
+    "execution_place",
+    "subdivision_into_lots",
+    "side_offers_allowed",
+    "several_main_offers_allowed",
+    "portal",
+    "publication_url",
+    "updated_at",
+]
+DATE_FIELDS = [
+    "period_start",
+    "period_end",
+    "application_deadline",
+    "award_period",
+    "expiration_time",
+    "bidders_requests_deadline",
+]
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_queryset(queryset=None):
+    queryset = Publication.objects.all() if queryset is None else queryset
+    return (
+        queryset.select_related("dates", "contracting_authority")
+        .prefetch_related("cpv_codes", "tender_documents")
+        .order_by("pk")
+    )
+
+
+def publication_rows(queryset, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """One nested dict per publication; prefetching happens per chunk."""
+    for publication in export_queryset(queryset).iterator(chunk_size=chunk_size):
+        authority = publication.contracting_authority
+        row = {name: getattr(publication, name) for name in PUBLICATION_FIELDS}
+        row["dates"] = {name: getattr(publication.dates, name) for name in DATE_FIELDS}
+        row["contracting_authority"] = {
+            "id": authority.pk,
+            "name": authority.name,
+            "address": authority.address,
+            "contact_email": authority.contact_email,
+        }
+        row["cpv_codes"] = sorted(cpv.code for cpv in publication.cpv_codes.all())
+        row["documents"] = [
+            {"filename": document.filename, "download_link": document.download_link}
+            for document in publication.tender_documents.all()
+        ]
+        yield row
+
+
+def _flat(row: dict) -> dict:
+    flat = {name: row[name] for name in PUBLICATION_FIELDS}
+    flat.update(row["dates"])
+    for name, value in row["contracting_authority"].items():
+        flat[f"contracting_authority_{name}"] = value
+    flat["cpv_codes"] = ";".join(row["cpv_codes"])
+    flat["documents"] = json.dumps(row["documents"], ensure_ascii=False)
+    return flat
+
+
+FLAT_FIELDS = list(
+    _flat(
+        {
+            **dict.fromkeys(PUBLICATION_FIELDS),
+            "dates": dict.fromkeys(DATE_FIELDS),
+            "contracting_authority": dict.fromkeys(
+                ["id", "name", "address", "contact_email"]
+            ),
+            "cpv_codes": [],
+            "documents": [],
+        }
+    )
+)
+
+
+def _batches(rows: Iterable[dict], size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_csv(rows: Iterable[dict], batch_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FLAT_FIELDS)
+    writer.writeheader()
+    for batch in _batches(rows, batch_size):
+        writer.writerows(_flat(row) for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export.
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def write_ndjson(rows: Iterable[dict], batch_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in _batches(rows, batch_size):
+        yield "".join(encoder.encode(row) + "\n" for row in batch).encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file whose contents are collected and handed on."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _parquet_schema(pa):
+    text, timestamp = pa.string(), pa.timestamp("us", tz="UTC")
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("tender_number", text),
+            ("title", text),
+            ("description", text),
+            ("tender_procedure", text),
+            ("execution_place", text),
+            ("subdivision_into_lots", pa.bool_()),
+            ("side_offers_allowed", pa.bool_()),
+            ("several_main_offers_allowed", pa.bool_()),
+            ("portal", text),
+            ("publication_url", text),
+            ("updated_at", timestamp),
+            (
+                "dates",
+                pa.struct(
+                    [
+                        ("period_start", pa.date32()),
+                        ("period_end", pa.date32()),
+                        ("application_deadline", timestamp),
+                        ("award_period", pa.date32()),
+                        ("expiration_time", timestamp),
+                        ("bidders_requests_deadline", timestamp),
+                    ]
+                ),
+            ),
+            (
+                "contracting_authority",
+                pa.struct(
+                    [
+                        ("id", pa.int64()),
+                        ("name", text),
+                        ("address", text),
+                        ("contact_email", text),
+                    ]
+                ),
+            ),
+            ("cpv_codes", pa.list_(text)),
+            (
+                "documents",
+                pa.list_(pa.struct([("filename", text), ("download_link", text)])),
+            ),
+        ]
+    )
+
+
+def write_parquet(
+    rows: Iterable[dict], batch_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """One Parquet row group per batch, written through an Arrow record
+    batch writer; the file footer comes last."""
+    pa, pq = _pyarrow()
+    schema = _parquet_schema(pa)
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in _batches(rows, batch_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+# format -> (content type, file extension, writer)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv", write_csv),
+    "ndjson": ("application/x-ndjson", "ndjson", write_ndjson),
+    "parquet": ("application/vnd.apache.parquet", "parquet", write_parquet),
+}
+
+
+def stream_export(
+    queryset, file_format: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Encoded chunks of the export. Raises ExportError up front for an
+    unknown format or a missing optional dependency."""
+    if file_format not in FORMATS:
+        raise ExportError(
+            f"unknown format {file_format!r}; choose one of {', '.join(FORMATS)}"
+        )
+    if file_format == "parquet":
+        _pyarrow()
+    write = FORMATS[file_format][2]
+    return write(publication_rows(queryset, chunk_size), chunk_size)
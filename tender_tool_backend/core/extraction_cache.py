@@ -0,0 +1,47 @@
+from datetime import timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExtractionCacheEntry
+
+
+class DatabaseBackend:
+    """crawler.cache backend storing entries in ExtractionCacheEntry, so that
+    every crawler process sharing the database shares the cache."""
+
+    def __init__(self, max_entries: int = 50_000):
+        self.max_entries = max_entries
+
+    def get(self, key: str, max_age: Optional[float]) -> Optional[dict]:
+        entry = ExtractionCacheEntry.objects.filter(key=key).first()
+        if entry is None:
+            return None
+        now = timezone.now()
+        if max_age is not None and entry.created_at < now - timedelta(seconds=max_age):
+            entry.delete()
+            return None
+        ExtractionCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=now)
+        return entry.payload
+
+    def set(self, key: str, url: str, value: dict) -> int:
+        now = timezone.now()
+        with transaction.atomic():
+            ExtractionCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "url": url,
+                    "payload": value,
+                    "created_at": now,
+                    "last_used_at": now,
+                },
+            )
+            excess = ExtractionCacheEntry.objects.count() - self.max_entries
+            if excess <= 0:
+                return 0
+            oldest = ExtractionCacheEntry.objects.order_by("last_used_at").values("pk")[
+                :excess
+            ]
+            deleted, _ = ExtractionCacheEntry.objects.filter(pk__in=oldest).delete()
+        return deleted
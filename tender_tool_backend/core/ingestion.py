@@ -0,0 +1,357 @@
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import F, FilteredRelation, Q
+from django.utils import timezone
+from pydantic import BaseModel, ValidationError
+
+from itwo_schemas import DatesInput, DocumentInput, PublicationInput
+from .names import normalize_name
+from .response_cache import invalidate
+from .statistics import record, record_documents, snapshot
+from .models import (
+    PublicationDates,
+    Contractor,
+    CPVCode,
+    Publication,
+    PublicationDocument,
+)
+
+
+@dataclass
+class IngestionResult:
+    kind: str
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+    created_ids: List[int] = field(default_factory=list)
+    updated_ids: List[int] = field(default_factory=list)
+    # Per input, by its position in the batch: "created", "updated",
+    # "skipped" or "failed", and the error of a failed one, so that callers
+    # batching several requests can split the result.
+    outcomes: Dict[int, str] = field(default_factory=dict)
+    item_errors: Dict[int, str] = field(default_factory=dict)
+    # Queries the batch took, when measured (see core.ingestion_writer).
+    db_queries: int = 0
+
+    def mark(self, position: int, outcome: str, error: Optional[str] = None):
+        self.outcomes[position] = outcome
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        if error is not None:
+            self.item_errors[position] = error
+            self.errors.append(error)
+
+    def __str__(self):
+        message = (
+            f"✅ {self.kind}: created {self.created}, updated {self.updated}, "
+            f"skipped {self.skipped}, failed {self.failed}"
+        )
+        if self.errors:
+            message += "\n" + "\n".join(f"❌ {error}" for error in self.errors)
+        return message
+
+
+def _validate(schema, raw_inputs, result):
+    """Coerce agent payloads (dicts or pydantic models) into `schema` objects,
+    returned as (position, object) pairs."""
+    valid = []
+    for position, raw in enumerate(raw_inputs):
+        try:
+            if isinstance(raw, BaseModel):
+                raw = raw.model_dump()
+            valid.append((position, schema.model_validate(raw)))
+        except ValidationError as exc:
+            result.mark(position, "failed", f"invalid input: {exc.errors()[0]['msg']}")
+    return valid
+
+
+def payload_hash(input_obj: PublicationInput) -> str:
+    payload = json.dumps(input_obj.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _publication_fields(input_obj: PublicationInput, contractors: dict) -> dict:
+    return {
+        "title": input_obj.title,
+        "description": input_obj.description,
+        "tender_procedure": input_obj.tender_procedure,
+        "execution_place": input_obj.execution_place,
+        "subdivision_into_lots": input_obj.subdivision_into_lots,
+        "side_offers_allowed": input_obj.side_offers_allowed,
+        "several_main_offers_allowed": input_obj.several_main_offers_allowed,
+        "portal": input_obj.portal_name,
+        "publication_url": input_obj.publication_url,
+        "contracting_authority": contractors[input_obj.contracting_authority.name],
+        "content_hash": payload_hash(input_obj),
+    }
+
+
+def ingest_publications(publication_inputs: Iterable) -> IngestionResult:
+    """Store a batch of publications with a fixed number of queries.
+
+    Existing tender numbers, contractors and CPV codes are resolved up front
+    with `IN` queries, everything new is written with `bulk_create`, and the
+    whole batch runs in one transaction. Known tenders whose content changed
+    since they were stored (amendments) are updated in place; unchanged ones
+    are skipped.
+    """
+    result = IngestionResult(kind="publications")
+
+    # --- Drop duplicates within the batch ---
+    by_number, positions = {}, {}
+    for position, input_obj in _validate(PublicationInput, publication_inputs, result):
+        if input_obj.tender_number in by_number:
+            result.mark(position, "skipped")
+            continue
+        by_number[input_obj.tender_number] = input_obj
+        positions[input_obj.tender_number] = position
+
+    with transaction.atomic():
+        # --- Split into new, amended and unchanged tenders ---
+        existing = {
+            publication.tender_number: publication
+            for publication in Publication.objects.filter(
+                tender_number__in=by_number
+            ).select_related("dates")
+        }
+        new_inputs, changed = [], []
+        for number, input_obj in by_number.items():
+            publication = existing.get(number)
+            if publication is None:
+                new_inputs.append(input_obj)
+            elif publication.content_hash == payload_hash(input_obj):
+                result.mark(positions[number], "skipped")
+            else:
+                changed.append((input_obj, publication))
+        if not new_inputs and not changed:
+            return result
+        stats_before = snapshot([publication.pk for _, publication in changed])
+
+        touched = new_inputs + [input_obj for input_obj, _ in changed]
+
+        # --- Contractors ---
+        contractors = _resolve_contractors(touched)
+
+        # --- CPV Codes ---
+        cpv_codes = _resolve_cpv_codes(touched)
+
+        # --- Dates ---
+        dates = PublicationDates.objects.bulk_create(
+            [
+                PublicationDates(**input_obj.dates.model_dump())
+                for input_obj in new_inputs
+            ]
+        )
+
+        # --- Publications ---
+        publications = Publication.objects.bulk_create(
+            [
+                Publication(
+                    tender_number=input_obj.tender_number,
+                    dates=dates_obj,
+                    **_publication_fields(input_obj, contractors),
+                )
+                for input_obj, dates_obj in zip(new_inputs, dates)
+            ]
+        )
+
+        # --- Amended publications ---
+        portals = {publication.portal for _, publication in changed}
+        if changed:
+            now = timezone.now()
+            for input_obj, publication in changed:
+                publication.updated_at = now
+                for name, value in input_obj.dates.model_dump().items():
+                    setattr(publication.dates, name, value)
+                for name, value in _publication_fields(input_obj, contractors).items():
+                    setattr(publication, name, value)
+            PublicationDates.objects.bulk_update(
+                [publication.dates for _, publication in changed],
+                list(DatesInput.model_fields),
+            )
+            Publication.objects.bulk_update(
+                [publication for _, publication in changed],
+                list(_publication_fields(changed[0][0], contractors)) + ["updated_at"],
+            )
+
+        # --- Publication <-> CPV Code through rows ---
+        through = Publication.cpv_codes.through
+        through.objects.filter(
+            publication_id__in=[publication.pk for _, publication in changed]
+        ).delete()
+        through.objects.bulk_create(
+            [
+                through(publication_id=publication.pk, cpvcode_id=cpv_codes[code])
+                for input_obj, publication in list(zip(new_inputs, publications))
+                + changed
+                for code in {cpv.code for cpv in input_obj.cpv_codes}
+            ],
+            ignore_conflicts=True,
+        )
+        record(
+            stats_before,
+            snapshot(
+                [publication.pk for publication in publications]
+                + [publication.pk for _, publication in changed]
+            ),
+        )
+        invalidate(
+            [publication.pk for publication in publications]
+            + [publication.pk for _, publication in changed],
+            portals | {input_obj.portal_name for input_obj in touched},
+        )
+
+    result.created_ids = [publication.pk for publication in publications]
+    result.updated_ids = [publication.pk for _, publication in changed]
+    for input_obj in new_inputs:
+        result.mark(positions[input_obj.tender_number], "created")
+    for input_obj, _ in changed:
+        result.mark(positions[input_obj.tender_number], "updated")
+    return result
+
+
+def _resolve_contractors(inputs) -> dict:
+    """Map contractor name -> Contractor, creating the missing ones in bulk.
+
+    Names are matched on their normalized key, so spelling variants of a
+    known authority reuse it instead of creating a duplicate. Keys that
+    core.contractors merged away resolve through their ContractorAlias.
+    """
+    wanted = {}
+    for input_obj in inputs:
+        wanted.setdefault(
+            input_obj.contracting_authority.name, input_obj.contracting_authority
+        )
+
+    keys = {name: normalize_name(name) for name in wanted if name is not None}
+    wanted_keys = set(keys.values())
+    # Exact matches and merged-away keys in one query; a contractor comes
+    # back once per alias of it that matches.
+    by_key, by_alias = {}, {}
+    for contractor in (
+        Contractor.objects.annotate(
+            alias=FilteredRelation(
+                "aliases", condition=Q(aliases__normalized_name__in=wanted_keys)
+            ),
+            alias_key=F("alias__normalized_name"),
+        )
+        .filter(Q(normalized_name__in=wanted_keys) | Q(alias__isnull=False))
+        .order_by("pk")
+    ):
+        if contractor.normalized_name in wanted_keys:
+            by_key.setdefault(contractor.normalized_name, contractor)
+        if contractor.alias_key is not None:
+            by_alias[contractor.alias_key] = contractor
+    by_key = {**by_alias, **by_key}
+    contractors = {name: by_key[key] for name, key in keys.items() if key in by_key}
+    if None in wanted:
+        unnamed = Contractor.objects.filter(name__isnull=True).order_by("pk").first()
+        if unnamed is not None:
+            contractors[None] = unnamed
+
+    # One new contractor per key, shared by all of its spellings in the batch.
+    missing = {}
+    for name in wanted:
+        if name not in contractors:
+            missing.setdefault(keys.get(name), name)
+    created = Contractor.objects.bulk_create(
+        [
+            Contractor(
+                name=name,
+                normalized_name=key or "",
+                address=wanted[name].address,
+                contact_email=wanted[name].contact_email,
+            )
+            for key, name in missing.items()
+        ]
+    )
+    created = dict(zip(missing, created))
+    for name in wanted:
+        if name not in contractors:
+            contractors[name] = created[keys.get(name)]
+    return contractors
+
+
+def _resolve_cpv_codes(inputs) -> dict:
+    """Map CPV code string -> CPVCode id, creating the missing ones in bulk."""
+    wanted = {}
+    for input_obj in inputs:
+        for cpv in input_obj.cpv_codes:
+            wanted.setdefault(cpv.code, cpv.description)
+    if not wanted:
+        return {}
+
+    CPVCode.objects.bulk_create(
+        [
+            CPVCode(code=code, description=description)
+            for code, description in wanted.items()
+        ],
+        ignore_conflicts=True,
+    )
+    return dict(CPVCode.objects.filter(code__in=wanted).values_list("code", "pk"))
+
+
+def ingest_documents(document_inputs: Iterable) -> IngestionResult:
+    """Store a batch of tender documents with a fixed number of queries."""
+    result = IngestionResult(kind="documents")
+    inputs = _validate(DocumentInput, document_inputs, result)
+    new_positions = []
+
+    with transaction.atomic():
+        tenders, portals = {}, {}
+        for tender_number, pk, portal in Publication.objects.filter(
+            tender_number__in={doc.publication_tender_number for _, doc in inputs}
+        ).values_list("tender_number", "pk", "portal"):
+            tenders[tender_number] = pk
+            portals[pk] = portal
+        seen = set(
+            PublicationDocument.objects.filter(
+                tender_id__in=tenders.values()
+            ).values_list("tender_id", "filename", "download_link")
+        )
+
+        new_documents = []
+        for position, doc in inputs:
+            tender_id = tenders.get(doc.publication_tender_number)
+            if tender_id is None:
+                result.mark(
+                    position,
+                    "failed",
+                    f"unknown publication {doc.publication_tender_number!r} "
+                    f"for document {doc.filename!r}",
+                )
+                continue
+
+            key = (tender_id, doc.filename, doc.download_link)
+            if key in seen:
+                result.mark(position, "skipped")
+                continue
+            seen.add(key)
+            new_positions.append(position)
+            new_documents.append(
+                PublicationDocument(
+                    filename=doc.filename,
+                    download_link=doc.download_link,
+                    tender_id=tender_id,
+                )
+            )
+
+        created = PublicationDocument.objects.bulk_create(new_documents)
+        if created:
+            tender_ids = {document.tender_id for document in created}
+            Publication.objects.filter(pk__in=tender_ids).update(
+                updated_at=timezone.now()
+            )
+            record_documents(Counter(document.tender_id for document in created))
+            invalidate(tender_ids, {portals[pk] for pk in tender_ids})
+
+    result.created_ids = [document.pk for document in created]
+    for position in new_positions:
+        result.mark(position, "created")
+    return result
@@ -0,0 +1,228 @@
+"""Background writer that batches ingestion off the crawler's event loop.
+
+Tool actions and the orchestrator hand validated payloads to the writer and
+get a Future back straight away; a single writer thread (one DB connection)
+collects submissions until a batch is `batch_size` rows or `max_delay`
+seconds old and stores it with one ingest_publications/ingest_documents call
+each. Every Future resolves to an IngestionResult for just its own payloads,
+with its share of the queries the batch took in `db_queries`. When a batch
+fails, its submissions are retried one by one, so that one bad submission
+does not fail the others.
+
+Submissions block (or, from async code, wait without blocking the loop) once
+`max_pending` rows are queued, which caps the queue's memory. close() writes
+out everything that was accepted before returning.
+"""
+
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from django.db import connection
+
+from itwo_schemas import DocumentInput, PublicationInput
+from .crawl_runs import count_queries
+from .ingestion import (
+    IngestionResult,
+    _validate,
+    ingest_documents,
+    ingest_publications,
+)
+
+PUBLICATIONS = "publications"
+DOCUMENTS = "documents"
+
+_SCHEMAS = {PUBLICATIONS: PublicationInput, DOCUMENTS: DocumentInput}
+_INGEST = {PUBLICATIONS: ingest_publications, DOCUMENTS: ingest_documents}
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Submission:
+    kind: str
+    # (position in the submission, validated input) pairs.
+    inputs: list
+    result: IngestionResult
+    future: Future
+
+
+class IngestionWriter:
+    def __init__(
+        self,
+        batch_size: int = 500,
+        max_delay: float = 0.5,
+        max_pending: int = 5000,
+        keep_results: int = 1000,
+        on_flush: Optional[Callable[[str, IngestionResult], None]] = None,
+    ):
+        """`on_flush(kind, result)` runs on the writer thread after every
+        stored batch, e.g. to score new publications; its errors are logged
+        and do not fail the batch."""
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.keep_results = keep_results
+        self.on_flush = on_flush
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._space = threading.Condition()
+        self._tickets = itertools.count(1)
+        self._results = OrderedDict()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="ingestion-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Submitting ---
+
+    def submit(self, kind: str, raw_inputs: Iterable) -> "tuple[int, Future]":
+        """Validate and queue payloads; returns (ticket, Future). Blocks while
+        the queue is full."""
+        if self._closed:
+            raise RuntimeError("ingestion writer is closed")
+        result = IngestionResult(kind=kind)
+        inputs = _validate(_SCHEMAS[kind], raw_inputs, result)
+        future = Future()
+        ticket = next(self._tickets)
+        self._remember(ticket, future)
+        if not inputs:
+            future.set_result(result)
+            return ticket, future
+
+        with self._space:
+            # A submission larger than the whole queue still gets in once
+            # the queue has drained.
+            self._space.wait_for(
+                lambda: self._pending == 0
+                or self._pending + len(inputs) <= self.max_pending
+            )
+            self._pending += len(inputs)
+        self._queue.put(_Submission(kind, inputs, result, future))
+        return ticket, future
+
+    def submit_publications(self, raw_inputs: Iterable):
+        return self.submit(PUBLICATIONS, raw_inputs)
+
+    def submit_documents(self, raw_inputs: Iterable):
+        return self.submit(DOCUMENTS, raw_inputs)
+
+    async def asubmit(self, kind: str, raw_inputs: Iterable) -> IngestionResult:
+        """Submit from async code and wait for the result without blocking
+        the event loop, neither on backpressure nor on the write."""
+        _, future = await asyncio.to_thread(self.submit, kind, list(raw_inputs))
+        return await asyncio.wrap_future(future)
+
+    def result(self, ticket: int, timeout: Optional[float] = None) -> IngestionResult:
+        """Wait for the result of an earlier submission."""
+        future = self._results.get(ticket)
+        if future is None:
+            raise KeyError(f"unknown or expired ticket {ticket}")
+        return future.result(timeout)
+
+    def _remember(self, ticket: int, future: Future):
+        self._results[ticket] = future
+        while len(self._results) > self.keep_results:
+            self._results.popitem(last=False)
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting payloads and wait until everything queued is written."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch, rows = [first], len(first.inputs)
+                deadline = time.monotonic() + self.max_delay
+                while rows < self.batch_size:
+                    try:
+                        item = self._queue.get(
+                            timeout=max(0.0, deadline - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    rows += len(item.inputs)
+                self._flush(batch)
+        finally:
+            connection.close()
+
+    def _flush(self, batch: List[_Submission]):
+        # Publications first, so that documents queued alongside find them.
+        for kind in (PUBLICATIONS, DOCUMENTS):
+            submissions = [item for item in batch if item.kind == kind]
+            if submissions:
+                self._store(kind, submissions)
+                self.batches += 1
+
+        with self._space:
+            self._pending -= sum(len(item.inputs) for item in batch)
+            self._space.notify_all()
+
+    def _store(self, kind: str, submissions: List[_Submission]):
+        try:
+            with count_queries() as queries:
+                combined = _INGEST[kind](
+                    [input_obj for item in submissions for _, input_obj in item.inputs]
+                )
+        except Exception as exc:
+            if len(submissions) == 1:
+                submissions[0].future.set_exception(exc)
+                return
+            for item in submissions:
+                self._store(kind, [item])
+            return
+
+        rows, start = sum(len(item.inputs) for item in submissions), 0
+        for item in submissions:
+            end = start + len(item.inputs)
+            result = _split(combined, item, start)
+            result.db_queries = queries[0] * end // rows - queries[0] * start // rows
+            item.future.set_result(result)
+            start = end
+        if self.on_flush is not None:
+            try:
+                self.on_flush(kind, combined)
+            except Exception as exc:
+                logger.warning("on_flush failed for %s (%s)", kind, exc)
+
+
+def _split(combined: IngestionResult, item: _Submission, offset: int):
+    """The outcomes of `item`, stored as `combined` from `offset` on."""
+    result = item.result
+    for index, (position, _) in enumerate(item.inputs):
+        result.mark(
+            position,
+            combined.outcomes[offset + index],
+            combined.item_errors.get(offset + index),
+        )
+    return result
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVE_AFTER_DAYS, BATCH_SIZE, archive_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Move tenders that expired more than --older-than-days ago to the "
+        "archive, in short batches. Meant to run regularly (e.g. nightly from "
+        "cron); it can run next to crawls and be interrupted at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, help="stop after this many")
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="seconds to sleep between batches, to spread the load",
+        )
+
+    def handle(self, older_than_days, batch_size, max_batches, pause, **options):
+        result = archive_expired(
+            older_than_days=older_than_days,
+            batch_size=batch_size,
+            max_batches=max_batches,
+            pause=pause,
+        )
+        self.stdout.write(self.style.SUCCESS(str(result)))
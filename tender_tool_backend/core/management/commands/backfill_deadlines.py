@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Publication, PublicationDates
+from core.response_cache import invalidate
+from core.statistics import record, snapshot
+from crawler.extractors.common import parse_german_datetime
+
+# (typed column, original string column)
+FIELDS = [
+    ("application_deadline", "application_deadline_raw"),
+    ("bidders_requests_deadline", "bidders_requests_deadline_raw"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse the deadline strings stored before the deadline columns were "
+        "typed. Each batch commits on its own, so the command can be "
+        "interrupted and re-run; it only touches rows that are still unparsed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, batch_size, **options):
+        pending = Q()
+        for typed, raw in FIELDS:
+            pending |= Q(**{f"{typed}__isnull": True, f"{raw}__isnull": False})
+        queryset = (
+            PublicationDates.objects.filter(pending)
+            .only("pk", *(name for pair in FIELDS for name in pair))
+            .order_by("pk")
+        )
+
+        parsed = unparsed = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for dates in batch:
+                for typed, raw in FIELDS:
+                    if getattr(dates, typed) is not None or not getattr(dates, raw):
+                        continue
+                    value = parse_german_datetime(getattr(dates, raw))
+                    if value is None:
+                        unparsed += 1
+                    else:
+                        setattr(dates, typed, value)
+                        parsed += 1
+            with transaction.atomic():
+                publication_ids = list(
+                    Publication.objects.filter(dates__in=batch).values_list(
+                        "pk", flat=True
+                    )
+                )
+                stats_before = snapshot(publication_ids)
+                PublicationDates.objects.bulk_update(
+                    batch, [typed for typed, _ in FIELDS]
+                )
+                record(stats_before, snapshot(publication_ids))
+                invalidate(everything=True)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"… up to id {last_pk}: {parsed} parsed")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Parsed {parsed} deadlines, {unparsed} left unparsed")
+        )
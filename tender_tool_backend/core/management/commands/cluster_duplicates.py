@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.duplicates import CHUNK_SIZE, cluster_backlog
+
+
+class Command(BaseCommand):
+    help = (
+        "Sign all publications without a MinHash signature and link tenders "
+        "published on several portals to one canonical publication."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, chunk_size, **options):
+        self.stdout.write(str(cluster_backlog(chunk_size=chunk_size)))
@@ -0,0 +1,57 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from crawler.instrumentation import StartupTimes
+
+
+class Command(BaseCommand):
+    help = (
+        "Crawl every portal once and store what changed. With --cdp-url the "
+        "crawl attaches to a running browser (see serve_browser) instead of "
+        "launching Chromium; the startup times are reported at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--portal", action="append", help="only these portals")
+        parser.add_argument(
+            "--cdp-url",
+            help="DevTools endpoint of a running browser, e.g. "
+            "http://127.0.0.1:9222 (default: CRAWL_CDP_URL)",
+        )
+        parser.add_argument(
+            "--record", metavar="DIR", help="record the crawl (CRAWL_RECORD)"
+        )
+        parser.add_argument(
+            "--replay", metavar="DIR", help="replay a recording (CRAWL_REPLAY)"
+        )
+
+    def handle(self, **options):
+        startup = StartupTimes()
+        # Imported here so that other commands do not load the scraper.
+        with startup.measure("import"):
+            import itwo_scraper
+        itwo_scraper.configure(
+            record=options["record"],
+            replay=options["replay"],
+            cdp=options["cdp_url"],
+            startup_times=startup,
+        )
+
+        orchestrator = itwo_scraper.orchestrator()
+        if options["portal"]:
+            orchestrator.portals = [
+                portal
+                for portal in orchestrator.portals
+                if portal.name in options["portal"]
+            ]
+        try:
+            stats = asyncio.run(orchestrator.run())
+        finally:
+            itwo_scraper.close()
+        itwo_scraper.write_metrics()
+        for portal_stats in stats.values():
+            self.stdout.write(str(portal_stats))
+        if orchestrator.cache is not None:
+            self.stdout.write(str(orchestrator.cache.stats))
+        self.stdout.write(str(startup))
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+
+from core.crawl_queue import DOCUMENTS, LEASE_SECONDS, CrawlQueue, enqueue_listings
+from core.downloads import DocumentDownloader, download_document
+
+
+class Command(BaseCommand):
+    help = (
+        "Lease crawl jobs from the shared queue and run them. Start one per "
+        "machine (or several); portal concurrency caps hold across all of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--worker-id", default=f"{socket.gethostname()}-{os.getpid()}"
+        )
+        parser.add_argument("--portal", action="append", help="only these portals")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--download-concurrency",
+            type=int,
+            default=8,
+            help="cap on document downloads across all workers; 0 for none",
+        )
+        parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+        parser.add_argument("--heartbeat-seconds", type=float, default=60.0)
+        parser.add_argument("--poll-seconds", type=float, default=5.0)
+        parser.add_argument(
+            "--enqueue-listings",
+            action="store_true",
+            help="queue the listing page of every portal first",
+        )
+        parser.add_argument(
+            "--until-idle",
+            action="store_true",
+            help="exit once no job is due instead of polling",
+        )
+
+    def handle(self, **options):
+        # Imported here so that other commands do not load the scraper.
+        import itwo_scraper
+        from crawler.worker import CrawlWorker
+
+        itwo_scraper.configure()
+        orchestrator = itwo_scraper.orchestrator()
+        if options["portal"]:
+            orchestrator.portals = [
+                portal
+                for portal in orchestrator.portals
+                if portal.name in options["portal"]
+            ]
+        caps = {portal.name: portal.max_concurrency for portal in orchestrator.portals}
+        if options["download_concurrency"] > 0:
+            caps[DOCUMENTS] = options["download_concurrency"]
+        if options["enqueue_listings"]:
+            enqueue_listings(
+                {portal.name: portal.listing_url for portal in orchestrator.portals}
+            )
+
+        downloader = DocumentDownloader(max_concurrency=1)
+
+        async def download(document_id):
+            await download_document(document_id, downloader)
+
+        worker = CrawlWorker(
+            orchestrator,
+            CrawlQueue(options["worker_id"], caps, options["lease_seconds"]),
+            download=download,
+            concurrency=options["concurrency"],
+            poll_interval=options["poll_seconds"],
+            heartbeat_interval=options["heartbeat_seconds"],
+        )
+        try:
+            stats = asyncio.run(worker.run(until_idle=options["until_idle"]))
+        finally:
+            itwo_scraper.close()
+        for portal_stats in worker.portal_stats.values():
+            if (
+                portal_stats.listed
+                or portal_stats.extracted
+                or portal_stats.agent_runs
+                or portal_stats.failed
+            ):
+                self.stdout.write(str(portal_stats))
+        self.stdout.write(f"{options['worker_id']}: {stats}")
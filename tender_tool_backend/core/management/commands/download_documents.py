@@ -0,0 +1,23 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from core.downloads import DocumentDownloader, pending_documents
+
+
+class Command(BaseCommand):
+    help = "Download tender documents that have not been fetched yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--per-host", type=int, default=2)
+        parser.add_argument("--retries", type=int, default=3)
+
+    def handle(self, limit, concurrency, per_host, retries, **options):
+        documents = list(pending_documents()[:limit])
+        downloader = DocumentDownloader(
+            max_concurrency=concurrency, max_per_host=per_host, retries=retries
+        )
+        stats = asyncio.run(downloader.download_all(documents))
+        self.stdout.write(str(stats))
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.export import CHUNK_SIZE, FORMATS, ExportError, stream_export
+from core.models import Publication
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream publications with dates, contracting authority, CPV codes and "
+        "documents to a CSV, NDJSON or Parquet file in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--output", "-o", default="-", help="file to write, - for stdout"
+        )
+        parser.add_argument(
+            "--since",
+            help="only publications changed at or after this ISO 8601 datetime",
+        )
+        parser.add_argument("--portal")
+        parser.add_argument("--cpv", help="CPV code or prefix")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, format, output, since, portal, cpv, chunk_size, **options):
+        queryset = Publication.objects.all()
+        if since:
+            since_dt = parse_datetime(since)
+            if since_dt is None:
+                raise CommandError("--since expects an ISO 8601 datetime")
+            queryset = queryset.filter(updated_at__gte=since_dt)
+        if portal:
+            queryset = queryset.filter(portal=portal)
+        if cpv:
+            queryset = queryset.in_cpv(cpv)
+
+        # Rows changed while the export runs may or may not be in it, so the
+        # next incremental export starts from here.
+        started = timezone.now()
+        try:
+            chunks = stream_export(queryset, format, chunk_size)
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        handle = sys.stdout.buffer if output == "-" else open(output, "wb")
+        try:
+            for chunk in chunks:
+                handle.write(chunk)
+        finally:
+            if handle is not sys.stdout.buffer:
+                handle.close()
+        self.stderr.write(f"next incremental export: --since {started.isoformat()}")
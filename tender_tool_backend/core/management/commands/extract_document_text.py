@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.text_extraction import extract_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract text from downloaded documents into searchable chunks. "
+        "Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument(
+            "--memory-mb",
+            type=int,
+            default=2048,
+            help="memory budget used to size the worker pool",
+        )
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, limit, memory_mb, workers, **options):
+        stats = extract_pending(
+            limit=limit, memory_budget_mb=memory_mb, max_workers=workers
+        )
+        self.stdout.write(str(stats))
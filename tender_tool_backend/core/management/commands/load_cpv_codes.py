@@ -0,0 +1,74 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import CPVCode
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the official CPV 2008 code list (the EU's cpv_2008 .xlsx, or a "
+        "CSV export of it) into CPVCode, updating existing descriptions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--language",
+            default="DE",
+            help="description column to load (DE, EN, FR, ...); default DE",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, path, language, batch_size, **options):
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+
+        rows = self.read_xlsx(path) if path.suffix == ".xlsx" else self.read_csv(path)
+        header = [str(cell or "").strip().upper() for cell in next(rows)]
+        try:
+            code_col = header.index("CODE")
+            text_col = header.index(language.upper())
+        except ValueError:
+            raise CommandError(
+                f"expected CODE and {language.upper()} columns, got {header}"
+            )
+
+        loaded = 0
+        batch = []
+        for row in rows:
+            code = str(row[code_col] or "").strip()
+            if not code:
+                continue
+            description = str(row[text_col] or "").strip()[:255] or None
+            batch.append(CPVCode(code=code, description=description))
+            if len(batch) >= batch_size:
+                loaded += self.upsert(batch)
+                batch = []
+        loaded += self.upsert(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} CPV codes"))
+
+    def upsert(self, batch):
+        CPVCode.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["code"],
+            update_fields=["description"],
+        )
+        return len(batch)
+
+    def read_csv(self, path):
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            dialect = csv.Sniffer().sniff(handle.read(4096), delimiters=",;\t")
+            handle.seek(0)
+            yield from csv.reader(handle, dialect)
+
+    def read_xlsx(self, path):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError("reading .xlsx needs openpyxl; export the sheet as CSV")
+        sheet = load_workbook(path, read_only=True).active
+        yield from sheet.iter_rows(values_only=True)
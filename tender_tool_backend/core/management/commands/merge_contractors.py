@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.contractors import MATCH_THRESHOLD, merge_duplicates
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge duplicate contracting authorities (same normalized name or "
+        "similar spelling) into the oldest record of each group."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=MATCH_THRESHOLD,
+            help="minimum trigram similarity of two names (0-1)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only list the groups found"
+        )
+
+    def handle(self, threshold, dry_run, **options):
+        result = merge_duplicates(threshold=threshold, dry_run=dry_run)
+        if dry_run:
+            for cluster in result.clusters:
+                self.stdout.write(" = ".join(str(pk) for pk in cluster))
+        self.stdout.write(str(result))
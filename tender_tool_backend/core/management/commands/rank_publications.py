@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.matching import CHUNK_SIZE, MatchingUnavailable, rank
+
+
+class Command(BaseCommand):
+    help = (
+        "Score all publications against the match profiles and store the "
+        "top-N per profile. Run after editing a profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            action="append",
+            dest="profiles",
+            help="profile name (repeatable); default all",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, profiles, chunk_size, **options):
+        try:
+            result = rank(profiles, chunk_size=chunk_size)
+        except MatchingUnavailable as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(str(result))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.statistics import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the dashboard statistics from the publications. Only "
+        "needed for repair: ingestion keeps them current."
+    )
+
+    def handle(self, **options):
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuild()} statistics rows"))
@@ -0,0 +1,48 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+BROWSERS = ["chromium", "chromium-browser", "google-chrome", "google-chrome-stable"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a Chromium that crawls attach to over CDP (crawl --cdp-url), so "
+        "they neither launch a browser nor log in again: the profile, and "
+        "with it the portal sessions, persists. Stop it with Ctrl+C."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=9222)
+        parser.add_argument(
+            "--chrome",
+            default=os.getenv("CHROME_PATH"),
+            help="browser executable (default: CHROME_PATH or the first of "
+            f"{', '.join(BROWSERS)} on PATH)",
+        )
+        parser.add_argument("--profile", type=Path, default=Path(".browser_profile"))
+        parser.add_argument("--headful", action="store_true")
+
+    def handle(self, port, chrome, profile, headful, **options):
+        chrome = chrome or next(filter(None, map(shutil.which, BROWSERS)), None)
+        if chrome is None:
+            raise CommandError("no Chromium found, pass --chrome")
+        command = [
+            chrome,
+            f"--remote-debugging-port={port}",
+            f"--user-data-dir={profile.resolve()}",
+            "--no-first-run",
+            "--no-default-browser-check",
+        ]
+        if not headful:
+            command.append("--headless=new")
+        process = subprocess.Popen(command + ["about:blank"])
+        self.stdout.write(f"crawl with --cdp-url http://127.0.0.1:{port}")
+        try:
+            process.wait()
+        except KeyboardInterrupt:
+            process.terminate()
+            process.wait()
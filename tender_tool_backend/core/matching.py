@@ -0,0 +1,357 @@
+"""Ranking of publications against company capability profiles.
+
+Every publication is reduced to a set of hashed features: words of title
+and description, all prefixes of its CPV codes, and words and postal-code
+prefixes of the execution place. Those sets are stored per publication
+(PublicationFeatures) and form the rows of a sparse 0/1 matrix X; each
+profile is a sparse weight column in W (CPV prefixes, regions, keywords),
+so scoring all publications against all profiles is the product X @ W,
+computed chunk by chunk with SciPy. The best `top_n` publications per
+profile are kept in ProfileMatch; publications of a profile's excluded
+authorities are filtered out by contracting authority id before that.
+
+rank() rebuilds the matches from scratch; update_matches() scores just
+newly ingested or amended publications and merges them into the stored
+top-N (a publication that an amendment pushes out of the top-N is not
+replaced until the next rank()). NumPy and SciPy are only needed for the
+scoring itself.
+"""
+
+import itertools
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import (
+    MatchProfile,
+    ProfileMatch,
+    Publication,
+    PublicationFeatures,
+    cpv_prefix,
+)
+from .names import transliterate
+
+N_FEATURES = 1 << 20
+CPV_WEIGHT = 3.0
+REGION_WEIGHT = 2.0
+KEYWORD_WEIGHT = 1.0
+CHUNK_SIZE = 50_000
+
+_WORD = re.compile(r"[a-z]{3,}")
+_POSTAL_CODE = re.compile(r"\b\d{5}\b")
+_STOPWORDS = {
+    "der", "die", "das", "den", "dem", "des", "und", "oder", "fuer", "mit",
+    "von", "vom", "zur", "zum", "bei", "aus", "auf", "ein", "eine", "einer",
+    "eines", "sowie", "nach", "ueber", "unter", "sind", "ist", "werden",
+}  # fmt: skip
+
+
+class MatchingUnavailable(Exception):
+    pass
+
+
+def _scipy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise MatchingUnavailable("ranking publications needs numpy and scipy")
+    return numpy, sparse
+
+
+def _feature(namespace: str, token) -> int:
+    # crc32 rather than hash(): indices are stored, so they must not depend
+    # on the process's hash seed.
+    return zlib.crc32(f"{namespace}:{token}".encode()) & (N_FEATURES - 1)
+
+
+def _words(text: Optional[str]) -> List[str]:
+    words = _WORD.findall(transliterate(text or ""))
+    return [word for word in words if word not in _STOPWORDS]
+
+
+def publication_features(
+    title: Optional[str],
+    description: Optional[str],
+    cpv_codes: Iterable[str],
+    execution_place: Optional[str],
+) -> List[int]:
+    features = {_feature("w", word) for word in _words(title) + _words(description)}
+    for code in cpv_codes:
+        digits = code.split("-")[0]
+        features.update(_feature("c", digits[:size]) for size in range(2, 9))
+    features.update(_feature("r", word) for word in _words(execution_place))
+    for postal_code in _POSTAL_CODE.findall(execution_place or ""):
+        features.update(_feature("r", postal_code[:size]) for size in range(1, 6))
+    return sorted(features)
+
+
+def profile_weights(profile: MatchProfile) -> dict:
+    """Feature index -> weight. A multi-word region or keyword spreads its
+    weight over its words, so a full match scores the same as a single word."""
+    weights = defaultdict(float)
+    for prefix in profile.cpv_prefixes:
+        weights[_feature("c", cpv_prefix(prefix))] += CPV_WEIGHT
+    for region in profile.regions:
+        region = region.strip()
+        tokens = [region] if region.isdigit() else _words(region)
+        for token in tokens:
+            weights[_feature("r", token)] += REGION_WEIGHT / len(tokens)
+    for keyword in profile.keywords:
+        tokens = _words(keyword)
+        for token in tokens:
+            weights[_feature("w", token)] += KEYWORD_WEIGHT / len(tokens)
+    return weights
+
+
+def feature_matrix(rows: List[List[int]]):
+    """CSR matrix with a 1 for every feature of every row."""
+    np, sparse = _scipy()
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.int32, count=int(indptr[-1])
+    )
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix(
+        (data, indices, indptr), shape=(len(rows), N_FEATURES), copy=False
+    )
+
+
+def weight_matrix(weights: List[dict]):
+    """CSC matrix, one column of feature weights per profile."""
+    np, sparse = _scipy()
+    rows = [index for column in weights for index in column]
+    columns = [number for number, column in enumerate(weights) for _ in column]
+    data = [weight for column in weights for weight in column.values()]
+    return sparse.csc_matrix(
+        (
+            np.array(data, dtype=np.float32),
+            (np.array(rows, dtype=np.int32), np.array(columns, dtype=np.int32)),
+        ),
+        shape=(N_FEATURES, len(weights)),
+    )
+
+
+class TopN:
+    """Running top-`limit` publications per profile column, leaving out the
+    publications of the authorities `excluded` for each column."""
+
+    def __init__(
+        self, limits: List[int], excluded: Optional[List[Iterable[int]]] = None
+    ):
+        np, _ = _scipy()
+        self.np = np
+        self.limits = limits
+        self.excluded = [
+            np.fromiter(ids, dtype=np.int64) for ids in excluded or [()] * len(limits)
+        ]
+        self.ids = [np.empty(0, dtype=np.int64) for _ in limits]
+        self.scores = [np.empty(0, dtype=np.float32) for _ in limits]
+
+    def add(self, ids, scores, authorities=None):
+        """`ids`: publication ids of a chunk; `scores`: dense (rows x profiles);
+        `authorities`: contracting authority ids of the chunk (-1 for none),
+        needed when there are exclusions."""
+        np = self.np
+        for column, limit in enumerate(self.limits):
+            chunk = scores[:, column]
+            keep = chunk > 0
+            if len(self.excluded[column]):
+                keep &= ~np.isin(authorities, self.excluded[column])
+            ids_ = np.concatenate([self.ids[column], ids[keep]])
+            scores_ = np.concatenate([self.scores[column], chunk[keep]])
+            if len(ids_) > limit:
+                # Everything scoring at least the limit-th best, then the
+                # same order as results() to break ties.
+                kth = np.partition(scores_, len(scores_) - limit)[-limit]
+                best = np.flatnonzero(scores_ >= kth)
+                best = best[np.lexsort((-ids_[best], -scores_[best]))[:limit]]
+                ids_, scores_ = ids_[best], scores_[best]
+            self.ids[column], self.scores[column] = ids_, scores_
+
+    def results(self, column: int):
+        """(publication id, score) pairs, best first, newer first on ties."""
+        ids, scores = self.ids[column], self.scores[column]
+        order = self.np.lexsort((-ids, -scores))
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+@dataclass
+class RankResult:
+    publications: int = 0
+    profiles: int = 0
+    matches: int = 0
+
+    def __str__(self):
+        return (
+            f"Ranked {self.publications} publications against {self.profiles} "
+            f"profiles, kept {self.matches} matches"
+        )
+
+
+def update_features(publication_ids: Iterable[int]) -> int:
+    publications = (
+        Publication.objects.filter(pk__in=list(publication_ids))
+        .only("pk", "title", "description", "execution_place")
+        .prefetch_related("cpv_codes")
+    )
+    features = [
+        PublicationFeatures(
+            publication_id=publication.pk,
+            indices=publication_features(
+                publication.title,
+                publication.description,
+                [cpv.code for cpv in publication.cpv_codes.all()],
+                publication.execution_place,
+            ),
+        )
+        for publication in publications
+    ]
+    PublicationFeatures.objects.bulk_create(
+        features,
+        update_conflicts=True,
+        unique_fields=["publication"],
+        update_fields=["indices"],
+    )
+    return len(features)
+
+
+def _profiles(names: Optional[List[str]] = None) -> List[MatchProfile]:
+    profiles = MatchProfile.objects.prefetch_related("excluded_authorities").order_by(
+        "pk"
+    )
+    if names:
+        profiles = profiles.filter(name__in=names)
+    return list(profiles)
+
+
+def _top(profiles: List[MatchProfile]) -> TopN:
+    return TopN(
+        [profile.top_n for profile in profiles],
+        [
+            [authority.pk for authority in profile.excluded_authorities.all()]
+            for profile in profiles
+        ],
+    )
+
+
+def _features(rows):
+    """(publication ids, authority ids, feature matrix) of a chunk of
+    (pk, authority id, indices) rows."""
+    np, _ = _scipy()
+    ids = np.fromiter((pk for pk, _, _ in rows), dtype=np.int64, count=len(rows))
+    authorities = np.fromiter(
+        (-1 if authority is None else authority for _, authority, _ in rows),
+        dtype=np.int64,
+        count=len(rows),
+    )
+    return ids, authorities, feature_matrix([indices for _, _, indices in rows])
+
+
+def rank(
+    profile_names: Optional[List[str]] = None, chunk_size: int = CHUNK_SIZE
+) -> RankResult:
+    """Score every publication against the profiles (all by default) and
+    replace their stored matches."""
+    result = RankResult()
+    profiles = _profiles(profile_names)
+    if not profiles:
+        return result
+    np, _ = _scipy()
+
+    missing = Publication.objects.filter(features__isnull=True).values_list(
+        "pk", flat=True
+    )
+    for batch in _batched(missing.iterator(chunk_size=chunk_size), chunk_size):
+        update_features(batch)
+
+    weights = weight_matrix([profile_weights(profile) for profile in profiles])
+    top = _top(profiles)
+    rows = PublicationFeatures.objects.order_by("pk").values_list(
+        "pk", "publication__contracting_authority", "indices"
+    )
+    for chunk in _batched(rows.iterator(chunk_size=chunk_size), chunk_size):
+        ids, authorities, matrix = _features(chunk)
+        top.add(ids, (matrix @ weights).toarray(), authorities)
+        result.publications += len(chunk)
+
+    with transaction.atomic():
+        ProfileMatch.objects.filter(profile__in=profiles).delete()
+        matches = ProfileMatch.objects.bulk_create(
+            [
+                ProfileMatch(profile=profile, publication_id=pk, score=score)
+                for column, profile in enumerate(profiles)
+                for pk, score in top.results(column)
+            ],
+            batch_size=5000,
+        )
+    result.profiles = len(profiles)
+    result.matches = len(matches)
+    return result
+
+
+def update_matches(publication_ids: List[int]) -> int:
+    """Refresh the features of these (new or amended) publications and merge
+    their scores into every profile's top-N. Returns the matches written."""
+    publication_ids = set(publication_ids)
+    update_features(publication_ids)
+    profiles = _profiles()
+    if not profiles:
+        return 0
+    np, _ = _scipy()
+
+    ids, authorities, matrix = _features(
+        list(
+            PublicationFeatures.objects.filter(pk__in=publication_ids).values_list(
+                "pk", "publication__contracting_authority", "indices"
+            )
+        )
+    )
+    weights = weight_matrix([profile_weights(profile) for profile in profiles])
+    scores = (matrix @ weights).toarray()
+
+    existing: Dict[int, list] = defaultdict(list)
+    for match in (
+        ProfileMatch.objects.filter(profile__in=profiles)
+        .exclude(publication_id__in=publication_ids)
+        .annotate(authority_id=F("publication__contracting_authority"))
+    ):
+        existing[match.profile_id].append(match)
+
+    top = _top(profiles)
+    for column, profile in enumerate(profiles):
+        # Exclusions added since the last rank() apply to kept matches too.
+        excluded = {authority.pk for authority in profile.excluded_authorities.all()}
+        kept = [m for m in existing[profile.pk] if m.authority_id not in excluded]
+        top.ids[column] = np.array([m.publication_id for m in kept], dtype=np.int64)
+        top.scores[column] = np.array([m.score for m in kept], dtype=np.float32)
+    top.add(ids, scores, authorities)
+
+    stale, fresh = [], []
+    for column, profile in enumerate(profiles):
+        best = dict(top.results(column))
+        stale += [m.pk for m in existing[profile.pk] if m.publication_id not in best]
+        fresh += [
+            ProfileMatch(profile=profile, publication_id=pk, score=score)
+            for pk, score in best.items()
+            if pk in publication_ids
+        ]
+    with transaction.atomic():
+        ProfileMatch.objects.filter(
+            Q(pk__in=stale)
+            | Q(profile__in=profiles, publication_id__in=publication_ids)
+        ).delete()
+        ProfileMatch.objects.bulk_create(fresh)
+    return len(fresh)
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_remove_publication_tender_documents_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawledPage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=500, unique=True)),
+                ("portal", models.CharField(max_length=100)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("last_seen_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CrawlState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("portal", models.CharField(max_length=100, unique=True)),
+                ("high_water_mark", models.DateTimeField(blank=True, null=True)),
+                (
+                    "high_water_url",
+                    models.URLField(blank=True, max_length=500, null=True),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="publication",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name="publication",
+            name="publication_url",
+            field=models.URLField(db_index=True, default="https://www.google.com/"),
+        ),
+    ]
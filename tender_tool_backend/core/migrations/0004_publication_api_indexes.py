@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_crawl_state"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="publicationdates",
+            name="expiration_time",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="publication",
+            index=models.Index(
+                fields=["portal", "-id"], name="core_public_portal_7c5194_idx"
+            ),
+        ),
+    ]
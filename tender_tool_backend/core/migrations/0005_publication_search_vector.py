@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_publication_api_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publication",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector(
+                        "title", config="german", weight="A"
+                    ),
+                    "||",
+                    django.contrib.postgres.search.SearchVector(
+                        "description", config="german", weight="B"
+                    ),
+                    django.contrib.postgres.search.SearchConfig("german"),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="publication",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="core_public_search__1a35ea_gin"
+            ),
+        ),
+    ]
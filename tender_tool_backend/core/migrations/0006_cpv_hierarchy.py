@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_publication_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cpvcode",
+            name="category",
+            field=models.GeneratedField(
+                db_index=True,
+                db_persist=True,
+                expression=django.db.models.functions.text.Substr("code", 1, 5),
+                output_field=models.CharField(max_length=5),
+            ),
+        ),
+        migrations.AddField(
+            model_name="cpvcode",
+            name="cpv_class",
+            field=models.GeneratedField(
+                db_index=True,
+                db_persist=True,
+                expression=django.db.models.functions.text.Substr("code", 1, 4),
+                output_field=models.CharField(max_length=4),
+            ),
+        ),
+        migrations.AddField(
+            model_name="cpvcode",
+            name="digits",
+            field=models.GeneratedField(
+                db_index=True,
+                db_persist=True,
+                expression=django.db.models.functions.text.Substr("code", 1, 8),
+                output_field=models.CharField(max_length=8),
+            ),
+        ),
+        migrations.AddField(
+            model_name="cpvcode",
+            name="division",
+            field=models.GeneratedField(
+                db_index=True,
+                db_persist=True,
+                expression=django.db.models.functions.text.Substr("code", 1, 2),
+                output_field=models.CharField(max_length=2),
+            ),
+        ),
+        migrations.AddField(
+            model_name="cpvcode",
+            name="group",
+            field=models.GeneratedField(
+                db_index=True,
+                db_persist=True,
+                expression=django.db.models.functions.text.Substr("code", 1, 3),
+                output_field=models.CharField(max_length=3),
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_cpv_hierarchy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="downloaded_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="mime_type",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="sha256",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_document_download_metadata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentTextChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.IntegerField()),
+                ("page_from", models.IntegerField(blank=True, null=True)),
+                ("page_to", models.IntegerField(blank=True, null=True)),
+                ("text", models.TextField()),
+                (
+                    "search_vector",
+                    models.GeneratedField(
+                        db_persist=True,
+                        expression=django.contrib.postgres.search.SearchVector(
+                            "text", config="german"
+                        ),
+                        output_field=django.contrib.postgres.search.SearchVectorField(),
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="page_count",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="text_error",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="text_extracted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdocument",
+            name="text_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("done", "Done"),
+                    ("unsupported", "Unsupported format"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="publicationdocument",
+            index=models.Index(
+                condition=models.Q(
+                    ("sha256__isnull", False), ("text_status", "pending")
+                ),
+                fields=["id"],
+                name="document_text_pending_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="documenttextchunk",
+            name="document",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="text_chunks",
+                to="core.publicationdocument",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="documenttextchunk",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="core_docume_search__ae259f_gin"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="documenttextchunk",
+            constraint=models.UniqueConstraint(
+                fields=("document", "position"), name="unique_chunk_position"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+from core.names import normalize_name
+
+
+def backfill_normalized_names(apps, schema_editor):
+    Contractor = apps.get_model("core", "Contractor")
+    contractors = list(Contractor.objects.exclude(name__isnull=True))
+    for contractor in contractors:
+        contractor.normalized_name = normalize_name(contractor.name)
+    Contractor.objects.bulk_update(contractors, ["normalized_name"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_document_text_chunks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contractor",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_contractor_normalized_name"),
+    ]
+
+    # Keep the old strings next to the new typed columns; the
+    # backfill_deadlines command parses them in batches afterwards.
+    operations = [
+        migrations.RenameField(
+            model_name="publicationdates",
+            old_name="application_deadline",
+            new_name="application_deadline_raw",
+        ),
+        migrations.RenameField(
+            model_name="publicationdates",
+            old_name="bidders_requests_deadline",
+            new_name="bidders_requests_deadline_raw",
+        ),
+        migrations.AddField(
+            model_name="publicationdates",
+            name="application_deadline",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publicationdates",
+            name="bidders_requests_deadline",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
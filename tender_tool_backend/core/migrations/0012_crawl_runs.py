@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_extraction_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("portal", models.CharField(db_index=True, max_length=100)),
+                ("task", models.TextField()),
+                ("status", models.CharField(max_length=20)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("started_at", models.DateTimeField(db_index=True)),
+                ("duration", models.FloatField()),
+                ("llm_calls", models.IntegerField(default=0)),
+                ("prompt_tokens", models.IntegerField(default=0)),
+                ("completion_tokens", models.IntegerField(default=0)),
+                ("db_queries", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CrawlStep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.IntegerField()),
+                ("kind", models.CharField(max_length=20)),
+                ("name", models.CharField(max_length=200)),
+                ("started_at", models.DateTimeField()),
+                ("duration", models.FloatField()),
+                ("prompt_tokens", models.IntegerField(blank=True, null=True)),
+                ("completion_tokens", models.IntegerField(blank=True, null=True)),
+                ("db_queries", models.IntegerField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="steps",
+                        to="core.crawlrun",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["run", "position"],
+            },
+        ),
+    ]
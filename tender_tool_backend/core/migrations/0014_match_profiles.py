@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_publication_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicationFeatures",
+            fields=[
+                (
+                    "publication",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="features",
+                        serialize=False,
+                        to="core.publication",
+                    ),
+                ),
+                (
+                    "indices",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), size=None
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MatchProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("cpv_prefixes", models.JSONField(blank=True, default=list)),
+                ("regions", models.JSONField(blank=True, default=list)),
+                ("keywords", models.JSONField(blank=True, default=list)),
+                ("top_n", models.IntegerField(default=200)),
+                (
+                    "excluded_authorities",
+                    models.ManyToManyField(
+                        blank=True, related_name="+", to="core.contractor"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProfileMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches",
+                        to="core.matchprofile",
+                    ),
+                ),
+                (
+                    "publication",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="profile_matches",
+                        to="core.publication",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["profile", "-score"],
+                        name="core_profil_profile_b6b5f7_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("profile", "publication"), name="unique_profile_match"
+                    )
+                ],
+            },
+        ),
+    ]
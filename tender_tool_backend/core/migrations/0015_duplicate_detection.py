@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_match_profiles"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicationSignature",
+            fields=[
+                (
+                    "publication",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="core.publication",
+                    ),
+                ),
+                ("minhash", models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="publication",
+            name="canonical",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="core.publication",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LshBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.BigIntegerField(db_index=True)),
+                (
+                    "publication",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.publication",
+                    ),
+                ),
+            ],
+        ),
+    ]
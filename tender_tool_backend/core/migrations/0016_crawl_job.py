@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_duplicate_detection"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("listing", "Listing page"),
+                            ("detail", "Detail page"),
+                            ("document", "Document download"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("portal", models.CharField(max_length=100)),
+                ("url", models.URLField(max_length=500)),
+                ("priority", models.IntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("leased", "Leased"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("max_attempts", models.IntegerField(default=5)),
+                (
+                    "available_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("leased_by", models.CharField(blank=True, max_length=100, null=True)),
+                ("lease_expires_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "document",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.publicationdocument",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "queued")),
+                        fields=["portal", "-priority", "available_at"],
+                        name="crawl_job_queued_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "leased")),
+                        fields=["lease_expires_at"],
+                        name="crawl_job_leased_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status__in", ["queued", "leased"])),
+                        fields=("kind", "url"),
+                        name="unique_pending_crawl_job",
+                    )
+                ],
+            },
+        ),
+    ]
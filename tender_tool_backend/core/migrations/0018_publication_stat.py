@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_cache_generation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publication",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # The best guess for tenders stored before the column existed. Their
+        # statistics are built by `manage.py rebuild_stats`.
+        migrations.RunSQL(
+            "UPDATE core_publication SET created_at = updated_at",
+            migrations.RunSQL.noop,
+        ),
+        migrations.CreateModel(
+            name="PublicationStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dimension", models.CharField(max_length=30)),
+                ("key", models.CharField(max_length=100)),
+                ("publications", models.IntegerField(default=0)),
+                ("documents", models.IntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["dimension", "-publications"],
+                        name="core_public_dimensi_c00f5c_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("dimension", "key"), name="unique_publication_stat"
+                    )
+                ],
+            },
+        ),
+    ]
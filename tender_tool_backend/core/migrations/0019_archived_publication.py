@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:03
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_publication_stat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedPublication",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("tender_number", models.CharField(max_length=100, unique=True)),
+                ("portal", models.CharField(max_length=100)),
+                ("expired_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "archived_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-id"],
+                "indexes": [
+                    models.Index(
+                        fields=["portal", "-id"], name="core_archiv_portal_bd1a43_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_archived_publication"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContractorAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("normalized_name", models.CharField(max_length=255, unique=True)),
+                (
+                    "contractor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="core.contractor",
+                    ),
+                ),
+            ],
+        ),
+    ]
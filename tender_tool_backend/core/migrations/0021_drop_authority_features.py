@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+def drop_features(apps, schema_editor):
+    # Stored features still carry the hashed contracting authority, which
+    # matching no longer uses; rank_publications recomputes missing ones.
+    apps.get_model("core", "PublicationFeatures").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_contractor_alias"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_features, migrations.RunPython.noop),
+    ]
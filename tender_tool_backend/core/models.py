@@ -1,13 +1,37 @@
+from datetime import timedelta
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .names import normalize_name
 
 
 class PublicationDates(models.Model):
     period_start = models.DateField(null=True, blank=True)
     period_end = models.DateField(null=True, blank=True)
-    application_deadline = models.CharField(max_length=100, null=True, blank=True)
+    application_deadline = models.DateTimeField(null=True, blank=True, db_index=True)
     award_period = models.DateField(null=True, blank=True)
-    expiration_time = models.DateTimeField(null=True, blank=True)
-    bidders_requests_deadline = models.CharField(max_length=100, null=True, blank=True)
+    expiration_time = models.DateTimeField(null=True, blank=True, db_index=True)
+    bidders_requests_deadline = models.DateTimeField(
+        null=True, blank=True, db_index=True
+    )
+    # Deadlines as the portals spelled them before the columns were typed;
+    # parsed into the columns above by the backfill_deadlines command.
+    application_deadline_raw = models.CharField(max_length=100, null=True, blank=True)
+    bidders_requests_deadline_raw = models.CharField(
+        max_length=100, null=True, blank=True
+    )
 
     def __str__(self):
         return f"Dates from {self.period_start} to {self.period_end}"
@@ -15,21 +39,147 @@ class PublicationDates(models.Model):
 
 class Contractor(models.Model):
     name = models.CharField(max_length=255, null=True, blank=True)
+    # Matching key, see core.names.normalize_name.
+    normalized_name = models.CharField(
+        max_length=255, blank=True, default="", db_index=True, editable=False
+    )
     address = models.TextField(null=True, blank=True)
     contact_email = models.EmailField(null=True, blank=True)
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name or "Unknown Contractor"
 
 
+# The normalized name of a contractor that core.contractors merged into
+# another one; ingestion resolves that name to the surviving contractor.
+class ContractorAlias(models.Model):
+    normalized_name = models.CharField(max_length=255, unique=True)
+    contractor = models.ForeignKey(
+        Contractor, on_delete=models.CASCADE, related_name="aliases"
+    )
+
+    def __str__(self):
+        return f"{self.normalized_name} -> {self.contractor_id}"
+
+
+def _cpv_level(length):
+    return models.GeneratedField(
+        expression=Substr("code", 1, length),
+        output_field=models.CharField(max_length=length),
+        db_persist=True,
+        db_index=True,
+    )
+
+
+def cpv_prefix(code: str) -> str:
+    """Significant digits of a CPV code or prefix: "45210000-2" -> "4521"."""
+    digits = code.split("-")[0].strip()[:8]
+    return digits.rstrip("0").ljust(2, "0")
+
+
 class CPVCode(models.Model):
     code = models.CharField(max_length=20, unique=True)
     description = models.CharField(max_length=255, null=True, blank=True)
 
+    # CPV 2008 hierarchy ("45210000-2": division 45, group 452, class 4521,
+    # category 45210), maintained by Postgres so subtree filters are plain
+    # index lookups.
+    division = _cpv_level(2)
+    group = _cpv_level(3)
+    cpv_class = _cpv_level(4)
+    category = _cpv_level(5)
+    digits = _cpv_level(8)
+
+    LEVELS = {2: "division", 3: "group", 4: "cpv_class", 5: "category"}
+
+    def ancestors(self):
+        """The division/group/class/category entries above this code."""
+        codes = {getattr(self, level).ljust(8, "0") for level in self.LEVELS.values()}
+        codes.discard(self.digits)
+        return CPVCode.objects.filter(digits__in=codes).order_by("digits")
+
     def __str__(self):
         return f"{self.code} - {self.description or 'No description'}"
 
 
+class PublicationQuerySet(models.QuerySet):
+    def closing_between(self, start=None, end=None):
+        """Publications whose application deadline falls in `[start, end)`;
+        either bound may be left open. One range scan on the deadline index."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(dates__application_deadline__gte=start)
+        if end is not None:
+            queryset = queryset.filter(dates__application_deadline__lt=end)
+        return queryset
+
+    def closing_within(self, days: int):
+        now = timezone.now()
+        return self.closing_between(now, now + timedelta(days=days))
+
+    def expired(self, before):
+        """Publications that expired before `before`: by their expiration
+        time, or by their application deadline where they have none."""
+        return self.filter(
+            models.Q(dates__expiration_time__lt=before)
+            | models.Q(
+                dates__expiration_time__isnull=True,
+                dates__application_deadline__lt=before,
+            )
+        )
+
+    def search(self, terms: str, include_documents: bool = False):
+        """Rank publications against a web-style German query (`"..."`, `-`,
+        `or`) and annotate highlighted title and description snippets.
+
+        With `include_documents`, publications whose extracted document text
+        matches are returned too (ranked by title/description only)."""
+        query = SearchQuery(terms, config="german", search_type="websearch")
+        highlight = {"config": "german", "start_sel": "<mark>", "stop_sel": "</mark>"}
+        matches = models.Q(search_vector=query)
+        if include_documents:
+            matches |= models.Exists(
+                DocumentTextChunk.objects.filter(
+                    document__tender_id=models.OuterRef("pk"), search_vector=query
+                )
+            )
+        return (
+            self.filter(matches)
+            .annotate(
+                rank=SearchRank(models.F("search_vector"), query),
+                title_highlight=SearchHeadline("title", query, **highlight),
+                snippet=SearchHeadline(
+                    "description", query, max_fragments=2, **highlight
+                ),
+            )
+            .order_by("-rank", "-id")
+        )
+
+    def in_cpv(self, code: str):
+        """Publications tagged with `code` or anything below it in the CPV
+        tree; accepts full codes ("45210000-2") and prefixes ("4521")."""
+        prefix = cpv_prefix(code)
+        level = CPVCode.LEVELS.get(len(prefix)) or (
+            "digits" if len(prefix) == 8 else None
+        )
+        lookup = (
+            {f"cpvcode__{level}": prefix}
+            if level
+            else {"cpvcode__digits__startswith": prefix}
+        )
+        return self.filter(
+            models.Exists(
+                Publication.cpv_codes.through.objects.filter(
+                    publication_id=models.OuterRef("pk"), **lookup
+                )
+            )
+        )
+
+
 class Publication(models.Model):
     tender_number = models.CharField(max_length=100, unique=True)
     title = models.CharField(max_length=255)
@@ -40,7 +190,22 @@ class Publication(models.Model):
     side_offers_allowed = models.BooleanField(default=False)
     several_main_offers_allowed = models.BooleanField(default=False)
     portal = models.CharField(max_length=100, default="No Portal")
-    publication_url = models.URLField(default="https://www.google.com/")
+    publication_url = models.URLField(default="https://www.google.com/", db_index=True)
+    # Hash of the extracted payload, used to tell amendments from re-crawls.
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    # When the tender was first stored.
+    created_at = models.DateTimeField(default=timezone.now)
+    # Bumped when the tender or its documents change; incremental exports
+    # select on it.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Maintained by Postgres on every insert/update, so ingestion never has
+    # to rebuild the search index.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("title", weight="A", config="german")
+        + SearchVector("description", weight="B", config="german"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     dates = models.OneToOneField(
         PublicationDates, on_delete=models.CASCADE, related_name="publication"
@@ -49,6 +214,23 @@ class Publication(models.Model):
         Contractor, on_delete=models.CASCADE, related_name="publications"
     )
     cpv_codes = models.ManyToManyField(CPVCode, related_name="publications", blank=True)
+    # The same tender seen on another portal points at the oldest copy, see
+    # core.duplicates; null for the canonical publication itself.
+    canonical = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        related_name="duplicates",
+        on_delete=models.SET_NULL,
+    )
+
+    objects = PublicationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["portal", "-id"]),
+            GinIndex(fields=["search_vector"]),
+        ]
 
     def __str__(self):
         return f"{self.tender_number} - {self.title}"
@@ -64,5 +246,329 @@ class PublicationDocument(models.Model):
         on_delete=models.CASCADE,
     )
 
+    # Set by core.downloads once the file is in the content-addressed store.
+    sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    mime_type = models.CharField(max_length=100, null=True, blank=True)
+    downloaded_at = models.DateTimeField(null=True, blank=True)
+
+    # Set by core.text_extraction.
+    TEXT_PENDING = "pending"
+    TEXT_DONE = "done"
+    TEXT_UNSUPPORTED = "unsupported"
+    TEXT_FAILED = "failed"
+    TEXT_STATUS_CHOICES = [
+        (TEXT_PENDING, "Pending"),
+        (TEXT_DONE, "Done"),
+        (TEXT_UNSUPPORTED, "Unsupported format"),
+        (TEXT_FAILED, "Failed"),
+    ]
+    text_status = models.CharField(
+        max_length=20, choices=TEXT_STATUS_CHOICES, default=TEXT_PENDING
+    )
+    text_error = models.TextField(null=True, blank=True)
+    page_count = models.IntegerField(null=True, blank=True)
+    text_extracted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="document_text_pending_idx",
+                condition=models.Q(text_status="pending", sha256__isnull=False),
+            )
+        ]
+
     def __str__(self):
         return self.filename
+
+
+# Per-portal high-water mark of the newest listing entry crawled.
+class CrawlState(models.Model):
+    portal = models.CharField(max_length=100, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    high_water_url = models.URLField(max_length=500, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.portal} up to {self.high_water_mark}"
+
+
+# Content hash of the last successfully processed version of a page.
+class CrawledPage(models.Model):
+    url = models.URLField(max_length=500, unique=True)
+    portal = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+
+# A page or document to crawl, leased to one crawl worker at a time, see
+# core.crawl_queue.
+class CrawlJob(models.Model):
+    LISTING = "listing"
+    DETAIL = "detail"
+    DOCUMENT = "document"
+    KIND_CHOICES = [
+        (LISTING, "Listing page"),
+        (DETAIL, "Detail page"),
+        (DOCUMENT, "Document download"),
+    ]
+
+    QUEUED = "queued"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (LEASED, "Leased"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # The portal whose concurrency cap the job counts against.
+    portal = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+    document = models.ForeignKey(
+        PublicationDocument,
+        null=True,
+        blank=True,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    # Higher first.
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # Not leased before this; pushed back after a failed attempt.
+    available_at = models.DateTimeField(default=timezone.now)
+    leased_by = models.CharField(max_length=100, null=True, blank=True)
+    # Extended by the worker's heartbeats; past it, the job is queued again.
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "url"],
+                condition=models.Q(status__in=["queued", "leased"]),
+                name="unique_pending_crawl_job",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["portal", "-priority", "available_at"],
+                name="crawl_job_queued_idx",
+                condition=models.Q(status="queued"),
+            ),
+            models.Index(
+                fields=["lease_expires_at"],
+                name="crawl_job_leased_idx",
+                condition=models.Q(status="leased"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.url} ({self.status})"
+
+
+class DocumentTextChunk(models.Model):
+    document = models.ForeignKey(
+        PublicationDocument, related_name="text_chunks", on_delete=models.CASCADE
+    )
+    position = models.IntegerField()
+    page_from = models.IntegerField(null=True, blank=True)
+    page_to = models.IntegerField(null=True, blank=True)
+    text = models.TextField()
+    search_vector = models.GeneratedField(
+        expression=SearchVector("text", config="german"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "position"], name="unique_chunk_position"
+            )
+        ]
+        indexes = [GinIndex(fields=["search_vector"])]
+
+    def __str__(self):
+        return f"{self.document} [{self.position}]"
+
+
+# Agent extraction cached under URL + page fingerprint, see crawler.cache.
+class ExtractionCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    url = models.URLField(max_length=500)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.url
+
+
+# One LLM agent run of a crawl and its timed steps, see crawler.instrumentation.
+class CrawlRun(models.Model):
+    portal = models.CharField(max_length=100, db_index=True)
+    task = models.TextField()
+    status = models.CharField(max_length=20)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(db_index=True)
+    duration = models.FloatField()
+    llm_calls = models.IntegerField(default=0)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    db_queries = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.portal} {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class CrawlStep(models.Model):
+    run = models.ForeignKey(CrawlRun, related_name="steps", on_delete=models.CASCADE)
+    position = models.IntegerField()
+    kind = models.CharField(max_length=20)
+    name = models.CharField(max_length=200)
+    started_at = models.DateTimeField()
+    duration = models.FloatField()
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    completion_tokens = models.IntegerField(null=True, blank=True)
+    db_queries = models.IntegerField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run", "position"]
+
+    def __str__(self):
+        return f"{self.kind} {self.name}"
+
+
+# A company capability profile that publications are ranked against, see
+# core.matching. Regions are place names or postal-code prefixes ("53").
+class MatchProfile(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    cpv_prefixes = models.JSONField(default=list, blank=True)
+    regions = models.JSONField(default=list, blank=True)
+    keywords = models.JSONField(default=list, blank=True)
+    excluded_authorities = models.ManyToManyField(
+        Contractor, related_name="+", blank=True
+    )
+    top_n = models.IntegerField(default=200)
+
+    def __str__(self):
+        return self.name
+
+
+# Hashed matching features of a publication, kept current at ingestion so
+# that ranking never has to re-tokenize the corpus.
+class PublicationFeatures(models.Model):
+    publication = models.OneToOneField(
+        Publication,
+        primary_key=True,
+        related_name="features",
+        on_delete=models.CASCADE,
+    )
+    indices = ArrayField(models.IntegerField())
+
+
+class ProfileMatch(models.Model):
+    profile = models.ForeignKey(
+        MatchProfile, related_name="matches", on_delete=models.CASCADE
+    )
+    publication = models.ForeignKey(
+        Publication, related_name="profile_matches", on_delete=models.CASCADE
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "publication"], name="unique_profile_match"
+            )
+        ]
+        indexes = [models.Index(fields=["profile", "-score"])]
+
+    def __str__(self):
+        return f"{self.profile} {self.publication_id}: {self.score:.2f}"
+
+
+# MinHash signature of a publication and its LSH band keys, see
+# core.duplicates.
+class PublicationSignature(models.Model):
+    publication = models.OneToOneField(
+        Publication,
+        primary_key=True,
+        related_name="signature",
+        on_delete=models.CASCADE,
+    )
+    # NUM_PERM packed little-endian uint32 values.
+    minhash = models.BinaryField()
+
+
+class LshBucket(models.Model):
+    key = models.BigIntegerField(db_index=True)
+    publication = models.ForeignKey(
+        Publication, related_name="+", on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        return f"{self.key}: {self.publication_id}"
+
+
+# Generation of a set of API responses, bumped whenever data they show
+# changes, see core.response_cache.
+class CacheGeneration(models.Model):
+    key = models.CharField(max_length=200, unique=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+# Publication and document counts per portal, CPV division, contracting
+# authority, week first stored and deadline day, kept current by the
+# writers, see core.statistics.
+class PublicationStat(models.Model):
+    dimension = models.CharField(max_length=30)
+    key = models.CharField(max_length=100)
+    publications = models.IntegerField(default=0)
+    documents = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dimension", "key"], name="unique_publication_stat"
+            )
+        ]
+        indexes = [models.Index(fields=["dimension", "-publications"])]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key}: {self.publications}"
+
+
+# An expired tender moved out of the hot tables, see core.archive: its
+# PublicationSerializer representation when it was archived, under its
+# original id.
+class ArchivedPublication(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    tender_number = models.CharField(max_length=100, unique=True)
+    portal = models.CharField(max_length=100)
+    expired_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [models.Index(fields=["portal", "-id"])]
+
+    def __str__(self):
+        return f"{self.tender_number} (archived)"
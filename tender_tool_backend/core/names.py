@@ -0,0 +1,137 @@
+"""Normalization and fuzzy matching of contracting authority names.
+
+Pure functions without Django imports, so that they can be used from models,
+migrations and the merge command alike. transliterate() and fold() are also
+what core.matching and core.duplicates split publication text with.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, Optional, Tuple
+
+_TRANSLITERATION = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+# Trailing legal forms, compared after transliteration and removal of dots.
+_LEGAL_FORMS = {
+    "ag",
+    "aoer",
+    "co",
+    "eg",
+    "ev",
+    "gbr",
+    "gmbh",
+    "haftungsbeschraenkt",
+    "kg",
+    "kgaa",
+    "koer",
+    "mbh",
+    "ohg",
+    "se",
+    "ug",
+}
+_LEGAL_PHRASES = re.compile(
+    r"\b(anstalt|koerperschaft) des oeffentlichen rechts\b"
+    r"|\bgesellschaft mit beschraenkter haftung\b"
+)
+
+# Leading titles that do not change which municipality is meant
+# ("Landeshauptstadt München" is "Stadt München"). Landkreis, Gemeinde etc.
+# are kept: "Landkreis München" is a different authority.
+_MUNICIPAL_TITLES = re.compile(
+    r"^(freie und hansestadt|freie hansestadt|landeshauptstadt|hansestadt"
+    r"|universitaetsstadt|kreisfreie stadt|grosse kreisstadt|stadtverwaltung"
+    r"|stadt) "
+)
+_POSTAL_CODE = re.compile(r"\b\d{5}\b")
+
+
+def transliterate(value: str) -> str:
+    """Lower case, umlauts spelled out ("ü" is "ue"), other accents dropped."""
+    value = value.lower().translate(_TRANSLITERATION)
+    if value.isascii():
+        return value
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in value if not unicodedata.combining(char))
+
+
+def fold(value: str) -> str:
+    """transliterate(), then only letters and digits, single-spaced."""
+    value = transliterate(value).replace(".", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", value).split())
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Matching key for an authority name: lower case, umlauts spelled out,
+    punctuation, legal forms and municipal titles removed, so "Stadt
+    München", "Landeshauptstadt München" and "Stadt Muenchen " share a key."""
+    if not name:
+        return ""
+    folded = fold(name)
+    key = _LEGAL_PHRASES.sub(" ", folded)
+    tokens = key.split()
+    while tokens and tokens[-1] in _LEGAL_FORMS:
+        tokens.pop()
+    key = _MUNICIPAL_TITLES.sub("", " ".join(tokens))
+    # Never reduce a name to nothing ("Stadt", "GmbH").
+    return key or folded
+
+
+def postal_code(address: Optional[str]) -> Optional[str]:
+    match = _POSTAL_CODE.search(address or "")
+    return match.group() if match else None
+
+
+def trigrams(key: str) -> frozenset:
+    # Padded like pg_trgm, so short names still get a few trigrams.
+    padded = f"  {key} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def similar_pairs(
+    keys: Dict[int, str], threshold: float
+) -> Iterator[Tuple[int, int, float]]:
+    """Yield (id, id, similarity) for keys whose trigram Jaccard similarity is
+    at least `threshold`, without comparing every pair.
+
+    Blocking uses prefix filtering (the AllPairs algorithm): with the
+    trigrams of every key sorted rarest first, two sets with Jaccard >= t
+    must share a trigram within their first few trigrams. Only those
+    prefixes are indexed, so candidate lists stay short even for 100k+ keys
+    and common trigrams ("str", " st") never act as block keys.
+    """
+    grams = {pk: trigrams(key) for pk, key in keys.items() if key}
+    frequency = Counter(gram for values in grams.values() for gram in values)
+    index = defaultdict(list)
+    # Per posting list, how many leading entries are too small to match any
+    # later (larger) probe; lets the scan skip them.
+    skip = defaultdict(int)
+    overlap = 2 * threshold / (1 + threshold)
+
+    # Smallest sets first: every indexed candidate is no larger than the
+    # probe, which makes the length filter one-sided and monotonic.
+    for pk in sorted(grams, key=lambda pk: (len(grams[pk]), pk)):
+        probe = grams[pk]
+        size = len(probe)
+        min_size = threshold * size
+        ordered = sorted(probe, key=lambda gram: (frequency[gram], gram))
+        probe_prefix = size - math.ceil(threshold * size) + 1
+        index_prefix = size - math.ceil(overlap * size) + 1
+
+        candidates = set()
+        for position, gram in enumerate(ordered[:probe_prefix]):
+            postings = index[gram]
+            start = skip[gram]
+            while start < len(postings) and len(grams[postings[start]]) < min_size:
+                start += 1
+            skip[gram] = start
+            candidates.update(postings[start:])
+            if position < index_prefix:
+                postings.append(pk)
+
+        for other in candidates:
+            shared = len(probe & grams[other])
+            score = shared / (size + len(grams[other]) - shared)
+            if score >= threshold:
+                yield other, pk, score
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class PublicationCursorPagination(CursorPagination):
+    # Keyset pagination over the primary key keeps every page an index range
+    # scan, no matter how deep the client pages.
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class SearchResultPagination(LimitOffsetPagination):
+    # Search results are ordered by rank, which has no stable cursor.
+    default_limit = 20
+    max_limit = 100
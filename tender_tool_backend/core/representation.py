@@ -0,0 +1,229 @@
+"""Fast, field-selectable publication representations for the API.
+
+PublicationSerializer (and PublicationSearchSerializer) stay the definition
+of the wire format. A Representation compiles one of them once into plain
+attribute getters and converters, and then renders rows without DRF's
+per-row field binding, attribute lookup and `to_representation` calls; the
+output is the same as `serializer.data`.
+
+Sparse fieldsets: `fields` names the top-level fields to return. Relations
+among them (dates, contracting_authority, cpv_codes, tender_documents) come
+back as ids, unless also named in `expand`, which returns them nested (and
+implies the field). With neither, every field is returned with every
+relation nested, as the serializer does. queryset() trims the SQL to match:
+only() the columns that are shown, joins and prefetches only for expanded
+relations, and id-only prefetches for the rest.
+"""
+
+import functools
+from operator import attrgetter
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.encoding import is_protected_type
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+from .serializers import PublicationSerializer
+
+# Field types whose to_representation() returns database values unchanged.
+PASSTHROUGH = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+class Representation:
+    def __init__(
+        self,
+        serializer_class=PublicationSerializer,
+        fields: Optional[Sequence[str]] = None,
+        expand: Sequence[str] = (),
+    ):
+        serializer = serializer_class()
+        available = {
+            name: field
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        }
+        relations = {
+            name
+            for name, field in available.items()
+            if isinstance(field, serializers.BaseSerializer)
+        }
+        unknown = (set(fields or ()) | set(expand)) - set(available)
+        if unknown:
+            raise FieldsetError(
+                f"Unknown fields: {', '.join(sorted(unknown))}. "
+                f"Available: {', '.join(available)}."
+            )
+        if set(expand) - relations:
+            raise FieldsetError(f"Only {', '.join(sorted(relations))} can be expanded.")
+
+        if fields is None:
+            names, expanded = list(available), relations
+        else:
+            names = [name for name in available if name in fields or name in expand]
+            expanded = set(expand)
+
+        self.model = serializer.Meta.model
+        self.fields = [available[name] for name in names]
+        self.expanded = expanded
+        self._columns = [
+            (
+                field.field_name,
+                _convert(field, self.model, field.field_name in expanded),
+            )
+            for field in self.fields
+        ]
+
+    def queryset(self, queryset):
+        """`queryset` loading just what this representation shows."""
+        columns, joins, prefetches = [], [], []
+        for field in self.fields:
+            try:
+                model_field = self.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue  # An annotation, such as the search rank.
+            if model_field.many_to_many or model_field.one_to_many:
+                if field.field_name in self.expanded:
+                    prefetches.append(field.source)
+                else:
+                    prefetches.append(_ids_prefetch(model_field))
+            elif model_field.concrete:
+                columns.append(field.source)
+                if model_field.is_relation and field.field_name in self.expanded:
+                    joins.append(field.source)
+        return (
+            queryset.only("pk", *columns)
+            .select_related(*joins)
+            .prefetch_related(*prefetches)
+        )
+
+    def one(self, instance) -> dict:
+        return self._row(instance, timezone.get_current_timezone())
+
+    def many(self, instances: Iterable) -> List[dict]:
+        tz = timezone.get_current_timezone()
+        return [self._row(instance, tz) for instance in instances]
+
+    def _row(self, instance, tz) -> dict:
+        return {name: convert(instance, tz) for name, convert in self._columns}
+
+
+@functools.lru_cache(maxsize=256)
+def representation(
+    serializer_class=PublicationSerializer,
+    fields: Optional[Tuple[str, ...]] = None,
+    expand: Tuple[str, ...] = (),
+) -> Representation:
+    """A shared, compiled Representation (they are immutable)."""
+    return Representation(serializer_class, fields, expand)
+
+
+def _ids_prefetch(model_field) -> Prefetch:
+    related = model_field.related_model._default_manager
+    if model_field.one_to_many:
+        # The reverse foreign key is needed to attach the rows.
+        return Prefetch(model_field.name, related.only("pk", model_field.field.name))
+    return Prefetch(model_field.name, related.only("pk"))
+
+
+# (instance, time zone) -> representation of one field of it.
+Converter = Callable[[object, object], object]
+
+
+def _convert(field, model, expanded: bool) -> Converter:
+    source = field.source
+    if isinstance(field, serializers.ListSerializer):
+        if not expanded:
+            return lambda instance, tz: [
+                item.pk for item in getattr(instance, source).all()
+            ]
+        child = _nested(field.child)
+        return lambda instance, tz: [
+            child(item, tz) for item in getattr(instance, source).all()
+        ]
+    if isinstance(field, serializers.BaseSerializer) and expanded:
+        child = _nested(field)
+
+        def convert(instance, tz):
+            value = getattr(instance, source)
+            return None if value is None else child(value, tz)
+
+        return convert
+    if isinstance(field, (serializers.BaseSerializer, serializers.RelatedField)):
+        # Not expanded, or a primary key field: the id, without a query.
+        get = attrgetter(model._meta.get_field(source).attname)
+        return lambda instance, tz: get(instance)
+
+    if isinstance(field, serializers.ModelField):
+        get = attrgetter(field.model_field.attname)
+
+        def convert(instance, tz):
+            value = get(instance)
+            if isinstance(value, str) or is_protected_type(value):
+                return value
+            return field.to_representation(instance)
+
+        return convert
+
+    if source == "*" or "." in source:
+        return _fallback(field)
+    get = attrgetter(source)
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if hasattr(field, "timezone") or str(output_format).lower() != ISO_8601:
+            return _fallback(field)
+
+        def convert(instance, tz):
+            value = get(instance)
+            if not value:
+                return None
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return convert
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if str(output_format).lower() != ISO_8601:
+            return _fallback(field)
+        return lambda instance, tz: (value := get(instance)) and value.isoformat()
+    if isinstance(field, serializers.BigIntegerField) and getattr(
+        field, "coerce_to_string", api_settings.COERCE_BIGINT_TO_STRING
+    ):
+        return _fallback(field)
+    if isinstance(field, PASSTHROUGH):
+        return lambda instance, tz: get(instance)
+    return _fallback(field)
+
+
+def _nested(serializer) -> Converter:
+    model = serializer.Meta.model
+    columns = [
+        (name, _convert(field, model, True))
+        for name, field in serializer.fields.items()
+        if not field.write_only
+    ]
+    return lambda instance, tz: {
+        name: convert(instance, tz) for name, convert in columns
+    }
+
+
+def _fallback(field) -> Converter:
+    # Whatever the field itself does, for types without a fast path.
+    def convert(instance, tz):
+        value = field.get_attribute(instance)
+        return None if value is None else field.to_representation(value)
+
+    return convert
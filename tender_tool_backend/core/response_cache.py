@@ -0,0 +1,246 @@
+"""Read-through cache of rendered publication API responses.
+
+A response is cached under its URL (host, path and sorted query string)
+plus the current *generations* of the data it shows: a tender's detail
+depends on `publication:<id>`, an unfiltered list or search on `list`, one
+filtered by portal on `list:<portal>`. Writes bump generations through
+invalidate() instead of deleting entries, so exactly the responses that
+show changed tenders get new keys, and the old entries age out of the
+backend. The key doubles as the ETag, so a client sending it back in
+If-None-Match gets a 304 without the body even being looked up.
+
+Backends: LocalBackend is an LRU in the API process; its generations live
+in the database (CacheGeneration), so crawler processes can invalidate what
+the API processes cached. RedisBackend keeps bodies and generations in any
+Redis-compatible server shared by all processes (needs the `redis` package).
+
+Entries also expire after RESPONSE_CACHE_TTL seconds, which bounds how stale
+relative filters (`closing_within`) and writes outside the ingestion path
+can get.
+"""
+
+import functools
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+
+from .models import CacheGeneration
+
+# Bumped for changes whose portals or publications are unknown.
+ALL_PUBLICATIONS = "publication:*"
+ALL_PORTAL_LISTS = "list:*"
+
+
+class CacheUnavailable(Exception):
+    pass
+
+
+class DatabaseGenerations:
+    def get(self, keys: List[str]) -> Dict[str, int]:
+        found = dict(
+            CacheGeneration.objects.filter(key__in=keys).values_list("key", "value")
+        )
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(self.bump(missing))
+        return found
+
+    def bump(self, keys: List[str]) -> Dict[str, int]:
+        # A fresh random value rather than +1: a generation must never come
+        # back, even when its row is lost with a rolled-back transaction.
+        value = random.getrandbits(63)
+        CacheGeneration.objects.bulk_create(
+            [CacheGeneration(key=key, value=value) for key in keys],
+            update_conflicts=True,
+            unique_fields=["key"],
+            update_fields=["value"],
+        )
+        return dict.fromkeys(keys, value)
+
+
+class LocalBackend:
+    """Bodies in a per-process LRU of at most `max_entries`."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.generations = DatabaseGenerations()
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisGenerations:
+    # Plain counters: they only start over together with the responses
+    # cached under them.
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, keys: List[str]) -> Dict[str, int]:
+        values = self.client.mget([f"{self.prefix}generation:{key}" for key in keys])
+        return {key: int(value or 0) for key, value in zip(keys, values)}
+
+    def bump(self, keys: List[str]) -> Dict[str, int]:
+        pipeline = self.client.pipeline()
+        for key in keys:
+            pipeline.incr(f"{self.prefix}generation:{key}")
+        return dict(zip(keys, pipeline.execute()))
+
+
+class RedisBackend:
+    """Bodies and generations in Redis (or anything speaking its protocol).
+    `client` is a redis.Redis; by default one is created for `url`."""
+
+    def __init__(self, url: str = "", client=None, prefix: str = "tender_tool:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise CacheUnavailable("the Redis response cache needs redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.generations = RedisGenerations(client, prefix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(f"{self.prefix}response:{key}")
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(f"{self.prefix}response:{key}", value, ex=max(1, int(ttl)))
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, request, dependencies: List[str]) -> str:
+        generations = self.backend.generations.get(dependencies)
+        parts = [
+            request.get_host(),
+            request.path,
+            sorted(request.GET.lists()),
+            [(key, generations[key]) for key in dependencies],
+        ]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def respond(
+        self,
+        request,
+        dependencies: List[str],
+        render: Callable[[], HttpResponse],
+    ) -> HttpResponse:
+        """The cached response for `request` if there is a current one,
+        else `render()`'s (cached when it is a 200)."""
+        key = self.key(request, dependencies)
+        etag = f'"{key[:32]}"'
+        if etag in _etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        cached = self.backend.get(key)
+        if cached is not None:
+            content_type, content = _unpack(cached)
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Cache"] = "hit"
+        else:
+            response = render()
+            if response.status_code != 200:
+                return response
+            self.backend.set(
+                key, _pack(response["Content-Type"], response.content), self.ttl
+            )
+            response["X-Cache"] = "miss"
+        response["ETag"] = etag
+        return response
+
+    def invalidate(self, keys: List[str]):
+        self.backend.generations.bump(keys)
+
+
+def _etags(header: str) -> List[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def _pack(content_type: str, content: bytes) -> bytes:
+    return content_type.encode() + b"\n" + content
+
+
+def _unpack(value: bytes) -> Tuple[str, bytes]:
+    content_type, _, content = bytes(value).partition(b"\n")
+    return content_type.decode(), content
+
+
+@functools.lru_cache(maxsize=None)
+def _build(backend: str, url: str, ttl: float, max_entries: int):
+    if backend == "off":
+        return None
+    if backend == "redis":
+        return ResponseCache(RedisBackend(url), ttl)
+    return ResponseCache(LocalBackend(max_entries), ttl)
+
+
+def response_cache() -> Optional[ResponseCache]:
+    """The cache RESPONSE_CACHE configures ("local", "redis" or "off")."""
+    return _build(
+        settings.RESPONSE_CACHE,
+        settings.RESPONSE_CACHE_URL,
+        settings.RESPONSE_CACHE_TTL,
+        settings.RESPONSE_CACHE_MAX_ENTRIES,
+    )
+
+
+def list_dependencies(portal: Optional[str]) -> List[str]:
+    return [f"list:{portal}", ALL_PORTAL_LISTS] if portal else ["list"]
+
+
+def detail_dependencies(publication_id) -> List[str]:
+    return [f"publication:{publication_id}", ALL_PUBLICATIONS]
+
+
+def invalidate(
+    publication_ids: Iterable[int] = (),
+    portals: Optional[Iterable[str]] = None,
+    everything: bool = False,
+):
+    """Make responses showing these publications stale once the current
+    transaction commits. Without `portals`, every list is stale; with
+    `everything`, every response."""
+    cache = response_cache()
+    if cache is None:
+        return
+    keys = ["list"] + [f"publication:{pk}" for pk in publication_ids]
+    if portals is None or everything:
+        keys.append(ALL_PORTAL_LISTS)
+    else:
+        keys += [f"list:{portal}" for portal in set(portals)]
+    if everything:
+        keys.append(ALL_PUBLICATIONS)
+    transaction.on_commit(lambda: cache.invalidate(keys))
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import (
+    ArchivedPublication,
     PublicationDates,
     Contractor,
     CPVCode,
@@ -11,7 +12,7 @@ from .models import (
 class PublicationDatesSerializer(serializers.ModelSerializer):
     class Meta:
         model = PublicationDates
-        fields = "__all__"
+        exclude = ["application_deadline_raw", "bidders_requests_deadline_raw"]
 
 
 class ContractorSerializer(serializers.ModelSerializer):
@@ -40,4 +41,20 @@ class PublicationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Publication
-        fields = "__all__"
+        exclude = ["content_hash", "search_vector"]
+
+
+class PublicationSearchSerializer(PublicationSerializer):
+    rank = serializers.FloatField(read_only=True)
+    title_highlight = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+
+class ArchivedPublicationSerializer(serializers.ModelSerializer):
+    # The stored representation, plus when it was archived.
+    class Meta:
+        model = ArchivedPublication
+        fields = ["archived_at"]
+
+    def to_representation(self, instance):
+        return {**instance.data, **super().to_representation(instance)}
@@ -0,0 +1,226 @@
+"""Dashboard statistics, kept in PublicationStat rows.
+
+Every publication counts, together with its documents, towards one row per
+dimension: the total, its portal, each CPV division of its codes, its
+contracting authority, the week it was first stored and the day of its
+application deadline. Writers take a snapshot() of the publications they
+touch before and after the change and record() the difference in the same
+transaction, as one upsert that adds to the stored counts; concurrent
+writers therefore never lose each other's deltas. rebuild() recomputes all
+rows with GROUP BY queries, for repair (`manage.py rebuild_stats`).
+
+Weeks (keyed by their Monday) and deadline days are dates in the current
+time zone, like TruncWeek and TruncDate.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import Contractor, Publication, PublicationDocument, PublicationStat
+
+TOTAL = "total"
+PORTAL = "portal"
+CPV_DIVISION = "cpv_division"
+AUTHORITY = "contracting_authority"
+WEEK = "week"
+DEADLINE = "deadline"
+DIMENSIONS = [TOTAL, PORTAL, CPV_DIVISION, AUTHORITY, WEEK, DEADLINE]
+
+# Publication id -> (the (dimension, key) rows it counts towards, number of
+# documents).
+Snapshot = Dict[int, Tuple[FrozenSet[Tuple[str, str]], int]]
+
+
+def snapshot(publication_ids: Iterable[int], documents: bool = True) -> Snapshot:
+    """What these publications currently count towards. Without
+    `documents`, their document counts are left at 0."""
+    ids = list(publication_ids)
+    if not ids:
+        return {}
+    divisions = {}
+    for pk, division in Publication.cpv_codes.through.objects.filter(
+        publication_id__in=ids
+    ).values_list("publication_id", "cpvcode__division"):
+        divisions.setdefault(pk, set()).add(division)
+
+    tz = timezone.get_current_timezone()
+    rows = Publication.objects.filter(pk__in=ids)
+    if documents:
+        rows = rows.annotate(document_count=Count("tender_documents"))
+    result = {}
+    for row in rows.values(
+        "pk",
+        "portal",
+        "contracting_authority_id",
+        "created_at",
+        "dates__application_deadline",
+        *(["document_count"] if documents else []),
+    ):
+        keys = {
+            (TOTAL, ""),
+            (PORTAL, row["portal"]),
+            (AUTHORITY, str(row["contracting_authority_id"])),
+            (WEEK, _week(row["created_at"].astimezone(tz).date())),
+        }
+        keys.update(
+            (CPV_DIVISION, division) for division in divisions.get(row["pk"], ())
+        )
+        if row["dates__application_deadline"] is not None:
+            deadline = row["dates__application_deadline"].astimezone(tz)
+            keys.add((DEADLINE, deadline.date().isoformat()))
+        result[row["pk"]] = (frozenset(keys), row.get("document_count", 0))
+    return result
+
+
+def _week(day) -> str:
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def record(before: Snapshot, after: Snapshot):
+    """Apply the change from `before` to `after` to the stored counts."""
+    delta = Counter()
+    for sign, state in ((-1, before), (1, after)):
+        for keys, documents in state.values():
+            for key in keys:
+                delta[key, "publications"] += sign
+                delta[key, "documents"] += sign * documents
+    _apply(delta)
+
+
+def record_documents(counts: Dict[int, int]):
+    """Count `counts[publication id]` new documents."""
+    delta = Counter()
+    for pk, (keys, _) in snapshot(counts, documents=False).items():
+        for key in keys:
+            delta[key, "documents"] += counts[pk]
+    _apply(delta)
+
+
+def _apply(delta: Counter):
+    rows = {}
+    for (key, column), change in delta.items():
+        if change:
+            rows.setdefault(key, {"publications": 0, "documents": 0})[column] = change
+    if not rows:
+        return
+    table = PublicationStat._meta.db_table
+    # Sorted, so that concurrent writers lock the rows in the same order.
+    values = [
+        (dimension, key, counts["publications"], counts["documents"])
+        for (dimension, key), counts in sorted(rows.items())
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (dimension, key, publications, documents) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(values))} "
+            "ON CONFLICT (dimension, key) DO UPDATE SET "
+            f"publications = {table}.publications + EXCLUDED.publications, "
+            f"documents = {table}.documents + EXCLUDED.documents",
+            [value for row in values for value in row],
+        )
+
+
+def computed() -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """Every row recomputed from the publications: (dimension, key) ->
+    (publications, documents)."""
+    result = {
+        (TOTAL, ""): (
+            Publication.objects.count(),
+            PublicationDocument.objects.count(),
+        )
+    }
+    groups = [
+        (PORTAL, F("portal"), str),
+        (AUTHORITY, F("contracting_authority_id"), str),
+        (CPV_DIVISION, F("cpv_codes__division"), str),
+        (WEEK, TruncWeek("created_at"), lambda week: week.date().isoformat()),
+        (
+            DEADLINE,
+            TruncDate("dates__application_deadline"),
+            lambda day: day.isoformat(),
+        ),
+    ]
+    for dimension, expression, to_key in groups:
+        rows = (
+            Publication.objects.annotate(group=expression)
+            .filter(group__isnull=False)
+            .values("group")
+            .annotate(
+                publication_count=Count("pk", distinct=True),
+                document_count=Count("tender_documents", distinct=True),
+            )
+        )
+        for row in rows:
+            result[dimension, to_key(row["group"])] = (
+                row["publication_count"],
+                row["document_count"],
+            )
+    return result
+
+
+def rebuild() -> int:
+    """Replace all rows with computed() ones; returns how many there are."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Writers wait until the new rows are in, and the rebuild waits
+            # for writers that already applied deltas, so none gets lost.
+            cursor.execute(
+                f"LOCK TABLE {PublicationStat._meta.db_table} IN EXCLUSIVE MODE"
+            )
+        PublicationStat.objects.all().delete()
+        rows = PublicationStat.objects.bulk_create(
+            [
+                PublicationStat(
+                    dimension=dimension,
+                    key=key,
+                    publications=publications,
+                    documents=documents,
+                )
+                for (dimension, key), (publications, documents) in computed().items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def summary(limit: int = 20, weeks: int = 12, days: int = 14) -> dict:
+    """The dashboard figures: totals, the `limit` largest portals, CPV
+    divisions and contracting authorities, the last `weeks` weeks and the
+    deadlines in the next `days` days. A fixed number of index scans of
+    bounded size, however many publications there are."""
+    stats = PublicationStat.objects.filter(publications__gt=0)
+
+    def rows(queryset):
+        return list(queryset.values("key", "publications", "documents"))
+
+    def largest(dimension):
+        return rows(stats.filter(dimension=dimension).order_by("-publications")[:limit])
+
+    total = stats.filter(dimension=TOTAL).first()
+    authorities = largest(AUTHORITY)
+    names = Contractor.objects.in_bulk([int(row["key"]) for row in authorities])
+    for row in authorities:
+        contractor = names.get(int(row["key"]))
+        row["name"] = contractor.name if contractor is not None else None
+    today = timezone.localdate()
+    return {
+        "publications": total.publications if total else 0,
+        "documents": total.documents if total else 0,
+        "portals": largest(PORTAL),
+        "cpv_divisions": largest(CPV_DIVISION),
+        "contracting_authorities": authorities,
+        "weeks": rows(stats.filter(dimension=WEEK).order_by("-key")[:weeks])[::-1],
+        "deadlines": rows(
+            stats.filter(
+                dimension=DEADLINE,
+                key__gte=today.isoformat(),
+                key__lt=(today + timedelta(days=days)).isoformat(),
+            ).order_by("key")
+        ),
+    }
@@ -1,3 +1,2204 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import unittest
+import tempfile
+import zipfile
+from io import StringIO
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+
+from core.archive import archive_expired
+from core.contractors import merge_duplicates
+from core.crawl_queue import (
+    CrawlQueue,
+    enqueue_details,
+    enqueue_listings,
+)
+from core.crawl_state import CrawlTracker
+from core.text_readers import (
+    chunk_pages,
+    detect_format,
+    extract_to_spool,
+    read_pages,
+)
+from core.duplicates import cluster_backlog, index_publications
+from core.ingestion import ingest_documents, ingest_publications
+from core.ingestion_writer import IngestionWriter
+from core.matching import rank, update_matches
+from core.models import (
+    Contractor,
+    CPVCode,
+    CrawlJob,
+    CrawlRun,
+    DocumentTextChunk,
+    ArchivedPublication,
+    MatchProfile,
+    Publication,
+    PublicationDates,
+    PublicationDocument,
+    PublicationStat,
+)
+from core.names import normalize_name, similar_pairs, trigrams
+from core.statistics import computed, rebuild
+from core.representation import representation
+from core.response_cache import RedisBackend, ResponseCache
+from core.serializers import PublicationSearchSerializer, PublicationSerializer
+from crawler.extractors import (
+    DetailExtraction,
+    ExtractionError,
+    ListingEntry,
+    extract_detail,
+    extract_listing,
+)
+from crawler.cache import DiskBackend, ExtractionCache, normalize_url
+from crawler.extractors.common import PORTAL_TZ, parse_german_datetime
+from crawler.instrumentation import LLM, TOOL, Instrumentation
+from crawler.orchestrator import (
+    BrowserPool,
+    CrawlOrchestrator,
+    PortalConfig,
+    PortalStats,
+    RateLimiter,
+)
+from crawler.worker import CrawlWorker
+from crawler.recording import (
+    Recorder,
+    RecordedFetchError,
+    RecordingMissing,
+    Replayer,
+)
+from itwo_schemas import DocumentInput, PublicationInput
+
+FIXTURES = (
+    Path(__file__).resolve().parent.parent / "crawler" / "extractors" / "fixtures"
+)
+
+
+class ExtractorTests(SimpleTestCase):
+    def fixture(self, name):
+        return (FIXTURES / name).read_text(encoding="utf-8")
+
+    def test_service_bund_pages(self):
+        entries = extract_listing(
+            "https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/Formular.html",
+            self.fixture("service_bund_listing.html"),
+        )
+        self.assertEqual(len(entries), 3)
+        self.assertTrue(
+            entries[0].url.startswith("https://www.service.bund.de/IMPORTE/")
+        )
+
+        extraction = extract_detail(
+            entries[0].url, self.fixture("service_bund_detail.html")
+        )
+        publication = extraction.publication
+        self.assertEqual(publication.tender_number, "BBR-2025-0142")
+        self.assertEqual(publication.portal_name, "service.bund.de")
+        self.assertEqual(publication.dates.application_deadline.hour, 10)
+        self.assertEqual(
+            [cpv.code for cpv in publication.cpv_codes], ["90910000-9", "90911200-8"]
+        )
+        self.assertEqual(len(extraction.documents), 2)
+
+    def test_itwo_pages(self):
+        entries = extract_listing(
+            "https://www.myorder.rib.de/tender/index", self.fixture("itwo_listing.html")
+        )
+        self.assertEqual(len(entries), 2)
+
+        extraction = extract_detail(entries[0].url, self.fixture("itwo_detail.html"))
+        self.assertEqual(extraction.publication.tender_number, "2025-MS-0371")
+        self.assertEqual(
+            extraction.publication.contracting_authority.name, "Stadt Münster"
+        )
+        self.assertTrue(extraction.publication.side_offers_allowed)
+
+    def test_unknown_layout_fails_validation(self):
+        with self.assertRaises(ExtractionError):
+            extract_detail(
+                "https://www.myorder.rib.de/tender/view/1",
+                "<html><body>Wartung</body></html>",
+            )
+        with self.assertRaises(ExtractionError):
+            extract_detail(
+                "https://example.org/tender/1", self.fixture("itwo_detail.html")
+            )
+
+    def test_german_deadline_formats(self):
+        expected = datetime(2025, 3, 12, 10, 0, tzinfo=PORTAL_TZ)
+        for value in (
+            "12.03.2025, 10:00 Uhr",
+            "Ende: 12.3.25 10.00 Uhr",
+            "12. März 2025, 10 Uhr",
+            "2025-03-12T10:00:00+01:00",
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(parse_german_datetime(value), expected)
+        self.assertEqual(
+            parse_german_datetime("bis 12.03.25"),
+            datetime(2025, 3, 12, tzinfo=PORTAL_TZ),
+        )
+        # A second date is not mistaken for a time.
+        self.assertEqual(parse_german_datetime("01.05.2025 - 10.04.2027").hour, 0)
+        self.assertIsNone(parse_german_datetime("31.02.2025"))
+        self.assertIsNone(parse_german_datetime("nach Vereinbarung"))
+
+
+class OrchestratorTests(SimpleTestCase):
+    def test_portals_fan_out_within_limits(self):
+        listing = (FIXTURES / "service_bund_listing.html").read_text(encoding="utf-8")
+        detail = (FIXTURES / "service_bund_detail.html").read_text(encoding="utf-8")
+        in_flight = {"now": 0, "max": 0}
+        agent_tasks, stored = [], []
+
+        async def fetch(url):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            if "Suche" in url:
+                return listing
+            # The third tender uses a layout the parser does not know.
+            return detail if "4821533" not in url else "<html></html>"
+
+        async def run_agent(task, browser):
+            agent_tasks.append((task, browser))
+            return [agent_extraction("AGENT-1")]
+
+        async def ingest(extraction):
+            stored.append(extraction.publication.tender_number)
+
+        portal = PortalConfig(
+            name="service.bund.de",
+            listing_url="https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/",
+            listing_task="listing",
+            detail_task="detail {url}",
+            max_concurrency=2,
+            requests_per_second=1000,
+        )
+        orchestrator = CrawlOrchestrator(
+            portals=[portal],
+            pool=BrowserPool(object, size=1),
+            fetch=fetch,
+            run_agent=run_agent,
+            ingest=ingest,
+        )
+        stats = asyncio.run(orchestrator.run())["service.bund.de"]
+
+        self.assertEqual((stats.listed, stats.extracted, stats.agent_runs), (3, 2, 1))
+        self.assertLessEqual(in_flight["max"], 2)
+        self.assertEqual(len(stored), 2)
+        self.assertIn("4821533", agent_tasks[0][0])
+
+    def test_agent_pages_are_only_remembered_once_stored(self):
+        remembered = []
+
+        class Tracker:
+            def unchanged(self, url, content_hash):
+                return False
+
+            def remember(self, portal, url, content_hash):
+                remembered.append(url)
+
+        async def fetch(url):
+            return "<html></html>"
+
+        async def run_agent(task, browser):
+            if task.endswith("/empty"):
+                return []
+            if task.endswith("/broken"):
+                raise RuntimeError("storing publications failed")
+            return [agent_extraction("AGENT-1")]
+
+        portal = PortalConfig(
+            name="example",
+            listing_url="https://example.org/list",
+            listing_task="listing",
+            detail_task="detail {url}",
+        )
+        orchestrator = CrawlOrchestrator(
+            portals=[portal],
+            pool=BrowserPool(object, size=1),
+            fetch=fetch,
+            run_agent=run_agent,
+            ingest=None,
+            tracker=Tracker(),
+        )
+        stats = PortalStats(portal="example")
+
+        async def crawl():
+            return [
+                await orchestrator.crawl_detail(
+                    portal,
+                    ListingEntry(url=f"https://example.org/{name}"),
+                    stats,
+                    RateLimiter(1000),
+                    asyncio.Semaphore(1),
+                )
+                for name in ("empty", "broken", "stored")
+            ]
+
+        self.assertEqual(asyncio.run(crawl()), [False, False, True])
+        self.assertEqual(remembered, ["https://example.org/stored"])
+        self.assertEqual((stats.agent_runs, stats.failed), (2, 2))
+
+    def test_browser_pool_awaits_factory_and_close_hook(self):
+        closed = []
+
+        async def start():
+            await asyncio.sleep(0)
+            return object()
+
+        async def crawl():
+            pool = BrowserPool(start, size=2, close=closed.append)
+            async with pool.browser() as first:
+                async with pool.browser() as second:
+                    self.assertIsNot(first, second)
+            async with pool.browser() as again:
+                self.assertIn(again, (first, second))
+            await pool.close()
+            return first, second
+
+        self.assertEqual(list(asyncio.run(crawl())), closed)
+
+
+class RecordingTests(SimpleTestCase):
+    def test_replay_returns_what_was_recorded(self):
+        with tempfile.TemporaryDirectory() as root:
+            recorder = Recorder(root, redact=["s3cret"])
+            recorder.page("https://example.org/a", html="<p>A</p>")
+            recorder.page("https://example.org/b", error="503 Service Unavailable")
+            # Outside an agent run nothing is attributed to a task.
+            recorder.tool_call("create_publications", {"publication_inputs": []})
+            with recorder.agent_run("log in with s3cret, then detail a"):
+                recorder.llm("gpt", ["log in with s3cret"], "ok", None)
+                recorder.tool_call(
+                    "create_publications",
+                    {
+                        "publication_inputs": [
+                            PublicationInput(**publication_payload("A"))
+                        ]
+                    },
+                    "Queued 1 publication(s) (ticket 1)",
+                )
+            with self.assertRaises(ValueError):
+                with recorder.agent_run("detail b"):
+                    raise ValueError("browser crashed")
+
+            self.assertNotIn("s3cret", (Path(root) / "agent.jsonl").read_text())
+            replayer = Replayer(root)
+            with_secrets = Replayer(root, redact=["s3cret"])
+
+        self.assertEqual(replayer.page("https://example.org/a"), "<p>A</p>")
+        with self.assertRaises(RecordedFetchError):
+            replayer.page("https://example.org/b")
+        with self.assertRaises(RecordingMissing):
+            replayer.page("https://example.org/c")
+        # Runs are keyed by the redacted task.
+        llm, tool = replayer.agent_run("log in with ***, then detail a")
+        self.assertEqual(
+            with_secrets.agent_run("log in with s3cret, then detail a"),
+            [llm, tool],
+        )
+        self.assertEqual((llm["type"], llm["messages"]), ("llm", ["log in with ***"]))
+        self.assertEqual(
+            tool["arguments"]["publication_inputs"][0]["tender_number"], "A"
+        )
+        self.assertEqual(
+            [event["type"] for event in replayer.agent_run("detail b")], ["error"]
+        )
+
+    def test_har_files_are_redacted(self):
+        secret = 'p@ss "w0rd"'
+        with tempfile.TemporaryDirectory() as root:
+            recorder = Recorder(root, redact=[secret, None])
+            recorder.har_dir.mkdir()
+            har = recorder.har_dir / "browser-1.har"
+            har.write_text(
+                json.dumps(
+                    {
+                        "postData": {
+                            "text": "email=a%40b.de&password=p%40ss+%22w0rd%22",
+                            "params": [{"name": "password", "value": secret}],
+                        }
+                    }
+                ),
+                encoding="utf-8",
+            )
+            recorder.redact_har()
+
+            text = har.read_text(encoding="utf-8")
+        self.assertNotIn("w0rd", text)
+        self.assertEqual(json.loads(text)["postData"]["params"][0]["value"], "***")
+
+
+class ExtractionCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def extraction(self, number):
+        return DetailExtraction(
+            publication=PublicationInput.model_validate(publication_payload(number)),
+            documents=[
+                DocumentInput(
+                    filename="LV.pdf",
+                    download_link="https://example.org/LV.pdf",
+                    publication_tender_number=number,
+                )
+            ],
+        )
+
+    def test_normalized_url_and_content_key(self):
+        self.assertEqual(
+            normalize_url("HTTPS://Example.org/t/1/?b=2&utm_source=x&a=1#top"),
+            normalize_url("https://example.org/t/1;jsessionid=abc?a=1&b=2"),
+        )
+        cache = ExtractionCache(DiskBackend(self.root))
+        cache.set(
+            "https://example.org/t/1?utm_medium=mail", "hash", [self.extraction("A")]
+        )
+
+        [hit] = cache.get("https://example.org/t/1", "hash")
+        self.assertEqual(hit.publication.tender_number, "A")
+        self.assertEqual(hit.documents[0].filename, "LV.pdf")
+        self.assertIsNone(cache.get("https://example.org/t/1", "changed"))
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+
+    def test_ttl_and_lru_eviction(self):
+        cache = ExtractionCache(DiskBackend(self.root, max_entries=3), ttl=60)
+        for number in "ABC":
+            cache.set(f"https://example.org/{number}", "h", [self.extraction(number)])
+        # Make A and B old, then use A so that B is least recently used.
+        for path in self.root.glob("*/*.json"):
+            os.utime(path, (1, 1))
+        cache.get("https://example.org/A", "h")
+        cache.set("https://example.org/D", "h", [self.extraction("D")])
+
+        self.assertIsNone(cache.get("https://example.org/B", "h"))
+        self.assertIsNotNone(cache.get("https://example.org/A", "h"))
+        self.assertGreaterEqual(cache.stats.evictions, 1)
+
+        cache.ttl = 0
+        self.assertIsNone(cache.get("https://example.org/A", "h"))
+
+    def test_recrawl_replays_instead_of_calling_the_agent(self):
+        calls = []
+
+        async def fetch(url):
+            if url.endswith("/list"):
+                return "<html></html>"
+            return "<html><body>Ausschreibung ohne bekannten Aufbau</body></html>"
+
+        async def run_agent(task, browser):
+            # Stands in for the LLM agent.
+            calls.append(task)
+            if task == "listing":
+                return []
+            return [self.extraction("LLM-1")]
+
+        stored = []
+
+        async def ingest(extraction):
+            stored.append(extraction.publication.tender_number)
+
+        portal = PortalConfig(
+            name="example",
+            listing_url="https://example.org/list",
+            listing_task="listing",
+            detail_task="detail {url}",
+            requests_per_second=1000,
+        )
+        cache = ExtractionCache(DiskBackend(self.root))
+        orchestrator = CrawlOrchestrator(
+            portals=[portal],
+            pool=BrowserPool(object, size=1),
+            fetch=fetch,
+            run_agent=run_agent,
+            ingest=ingest,
+            cache=cache,
+        )
+
+        async def crawl_twice():
+            entry = ListingEntry(url="https://example.org/tender/1")
+            for _ in range(2):
+                await orchestrator.crawl_detail(
+                    portal,
+                    entry,
+                    PortalStats(portal="example"),
+                    RateLimiter(1000),
+                    asyncio.Semaphore(1),
+                )
+
+        asyncio.run(crawl_twice())
+
+        self.assertEqual(calls, ["detail https://example.org/tender/1"])
+        self.assertEqual(stored, ["LLM-1"])
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+
+
+class DatabaseExtractionCacheTests(TestCase):
+    def test_shared_cache_evicts_least_recently_used(self):
+        from core.extraction_cache import DatabaseBackend
+
+        backend = DatabaseBackend(max_entries=2)
+        backend.set("a", "https://example.org/a", {"extractions": []})
+        backend.set("b", "https://example.org/b", {"extractions": []})
+        self.assertEqual(backend.get("a", max_age=None), {"extractions": []})
+        self.assertEqual(backend.set("c", "https://example.org/c", {}), 1)
+
+        self.assertIsNone(backend.get("b", max_age=None))
+        self.assertIsNotNone(backend.get("a", max_age=None))
+        self.assertIsNone(backend.get("c", max_age=0))
+
+
+class InstrumentationTests(SimpleTestCase):
+    def test_agent_runs_record_steps_and_export_metrics(self):
+        runs = []
+        instrumentation = Instrumentation(sinks=[runs.append])
+
+        def tool():
+            with instrumentation.step(TOOL, "create_publications"):
+                pass
+
+        async def run_agent(task, browser):
+            with instrumentation.step(LLM, "stub-llm") as step:
+                step.prompt_tokens, step.completion_tokens = 1200, 80
+            # Tool actions run in worker threads.
+            await asyncio.to_thread(tool)
+            instrumentation.add_step("agent_step", "step 1", 0.5)
+            if "fail" in task:
+                raise RuntimeError("browser crashed")
+
+        orchestrator = CrawlOrchestrator(
+            portals=[],
+            pool=BrowserPool(object, size=1),
+            fetch=None,
+            run_agent=run_agent,
+            ingest=None,
+            instrumentation=instrumentation,
+        )
+
+        async def crawl():
+            stats = PortalStats(portal="example")
+            await orchestrator._run_agent(stats, "detail")
+            await orchestrator._run_agent(stats, "fail")
+
+        asyncio.run(crawl())
+
+        self.assertEqual([run.status for run in runs], ["ok", "failed"])
+        self.assertEqual(
+            [step.kind for step in runs[0].steps], ["llm", "tool", "agent_step"]
+        )
+        self.assertEqual(runs[0].total("prompt_tokens"), 1200)
+        self.assertIn("browser crashed", runs[1].error)
+        metrics = instrumentation.prometheus()
+        self.assertIn('crawl_agent_runs_total{portal="example",status="ok"} 1', metrics)
+        self.assertIn('crawl_llm_tokens_total{type="prompt"} 2400', metrics)
+        self.assertIn('crawl_step_seconds_count{kind="tool"} 2', metrics)
+
+    def test_credentials_in_tasks_are_not_stored(self):
+        runs = []
+        instrumentation = Instrumentation(sinks=[runs.append], redact=["s3cret", None])
+
+        async def run():
+            async with instrumentation.run("example", "log in with s3cret"):
+                raise RuntimeError("login with s3cret rejected")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+        self.assertEqual(runs[0].task, "log in with ***")
+        self.assertNotIn("s3cret", runs[0].error)
+
+    def test_disabled_instrumentation_is_a_no_op(self):
+        instrumentation = Instrumentation(enabled=False)
+
+        async def run():
+            async with instrumentation.run("example", "task") as record:
+                with instrumentation.step(LLM, "stub") as step:
+                    return record, step
+
+        self.assertEqual(asyncio.run(run()), (None, None))
+        self.assertEqual(instrumentation.runs, {})
+
+
+class CrawlRunStorageTests(TestCase):
+    def test_run_is_stored_with_query_counts(self):
+        from core.crawl_runs import count_queries, save_run
+
+        instrumentation = Instrumentation(query_counter=count_queries)
+        runs = []
+        instrumentation.sinks = [runs.append]
+
+        # Like the tool actions: the step is entered in the thread that
+        # runs the queries.
+        def tool():
+            with instrumentation.step(TOOL, "create_publications", count_queries=True):
+                ingest_publications([publication_payload("A")])
+
+        async def run():
+            async with instrumentation.run("example", "task"):
+                await sync_to_async(tool)()
+
+        async_to_sync(run)()
+        crawl_run = save_run(runs[0])
+
+        self.assertEqual(crawl_run.db_queries, 13)
+        step = crawl_run.steps.get()
+        self.assertEqual((step.kind, step.db_queries), ("tool", 13))
+
+
+def agent_extraction(tender_number):
+    return DetailExtraction(
+        publication=PublicationInput.model_validate(publication_payload(tender_number)),
+        documents=[],
+    )
+
+
+def publication_payload(tender_number, **overrides):
+    payload = {
+        "tender_number": tender_number,
+        "title": f"Tender {tender_number}",
+        "description": "Unterhaltsreinigung",
+        "tender_procedure": "Offenes Verfahren",
+        "execution_place": "Bonn",
+        "dates": {
+            "period_start": None,
+            "period_end": None,
+            "application_deadline": "2025-04-12T10:00:00+02:00",
+            "bidders_requests_deadline": None,
+            "expiration_time": None,
+            "award_period": None,
+        },
+        "contracting_authority": {
+            "name": "Stadt Bonn",
+            "address": None,
+            "contact_email": None,
+        },
+        "cpv_codes": [{"code": "90910000-9", "description": "Reinigungsdienste"}],
+        "publication_url": f"https://example.org/{tender_number}",
+        "portal_name": "service.bund.de",
+    }
+    payload.update(overrides)
+    return payload
+
+
+class IngestionTests(TestCase):
+    def test_batch_uses_constant_number_of_queries(self):
+        for size in (5, 50):
+            payloads = [
+                publication_payload(
+                    f"{size}-{i}",
+                    contracting_authority={
+                        "name": f"Vergabestelle {size}",
+                        "address": None,
+                        "contact_email": None,
+                    },
+                )
+                for i in range(size)
+            ]
+            with self.subTest(size=size), self.assertNumQueries(13):
+                result = ingest_publications(payloads)
+            self.assertEqual(result.created, size)
+        self.assertEqual(CPVCode.objects.count(), 1)
+
+    def test_skips_known_and_reports_failures(self):
+        ingest_publications([publication_payload("A")])
+        result = ingest_publications(
+            [publication_payload("A"), publication_payload("B"), {"title": "x"}]
+        )
+        self.assertEqual((result.created, result.skipped, result.failed), (1, 1, 1))
+
+        result = ingest_documents(
+            [
+                {
+                    "filename": "LV.pdf",
+                    "download_link": "https://example.org/LV.pdf",
+                    "publication_tender_number": number,
+                }
+                for number in ("A", "A", "missing")
+            ]
+        )
+        self.assertEqual((result.created, result.skipped, result.failed), (1, 1, 1))
+        self.assertEqual(PublicationDocument.objects.count(), 1)
+
+    def test_batch_duplicates_invalid_payloads_and_cpv_links(self):
+        building = {"code": "45210000-2", "description": "Bauleistungen"}
+        cleaning = {"code": "90910000-9", "description": "Reinigungsdienste"}
+        result = ingest_publications(
+            [
+                publication_payload("A"),
+                publication_payload("A", title="Second copy"),
+                {"tender_number": "C", "title": None},
+                publication_payload("B", cpv_codes=[building, cleaning, building]),
+            ]
+        )
+        self.assertEqual(
+            (result.created, result.updated, result.skipped, result.failed),
+            (2, 0, 1, 1),
+        )
+        self.assertEqual(
+            result.outcomes,
+            {0: "created", 1: "skipped", 2: "failed", 3: "created"},
+        )
+        self.assertEqual(list(result.item_errors), [2])
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(Publication.objects.get(tender_number="A").title, "Tender A")
+        links = Publication.cpv_codes.through.objects
+        self.assertEqual(
+            sorted(
+                links.filter(publication__tender_number="B").values_list(
+                    "cpvcode__code", flat=True
+                )
+            ),
+            ["45210000-2", "90910000-9"],
+        )
+        self.assertEqual(links.count(), 3)
+        self.assertEqual(CPVCode.objects.count(), 2)
+
+        result = ingest_documents(
+            [
+                {
+                    "filename": "LV.pdf",
+                    "download_link": "https://example.org/LV.pdf",
+                    "publication_tender_number": number,
+                }
+                for number in ("unknown", "A", "A")
+            ]
+        )
+        self.assertEqual((result.created, result.skipped, result.failed), (1, 1, 1))
+        self.assertEqual(result.outcomes, {0: "failed", 1: "created", 2: "skipped"})
+        self.assertIn("'unknown'", result.item_errors[0])
+        self.assertEqual(
+            list(
+                PublicationDocument.objects.values_list(
+                    "tender__tender_number", flat=True
+                )
+            ),
+            ["A"],
+        )
+
+    def test_amended_tender_updates_existing_row(self):
+        ingest_publications([publication_payload("A")])
+        result = ingest_publications(
+            [
+                publication_payload(
+                    "A",
+                    title="Tender A (2. Änderung)",
+                    cpv_codes=[{"code": "90911200-8", "description": None}],
+                )
+            ]
+        )
+        self.assertEqual((result.created, result.updated), (0, 1))
+        publication = Publication.objects.get(tender_number="A")
+        self.assertEqual(publication.title, "Tender A (2. Änderung)")
+        self.assertEqual(
+            list(publication.cpv_codes.values_list("code", flat=True)), ["90911200-8"]
+        )
+
+
+# The writer thread has its own connection, so its writes must be committed.
+class IngestionWriterTests(TransactionTestCase):
+    def test_submissions_share_a_batch_and_get_their_own_results(self):
+        with IngestionWriter(max_delay=0.5) as writer:
+            _, first = writer.submit_publications(
+                [publication_payload("A"), publication_payload("B")]
+            )
+            _, second = writer.submit_publications(
+                [publication_payload("A"), {"title": "x"}]
+            )
+            # Invalid payloads are reported without waiting for the writer.
+            _, invalid = writer.submit_publications([{"title": "x"}])
+            self.assertTrue(invalid.done())
+            self.assertEqual(invalid.result().failed, 1)
+            ticket, documents = writer.submit_documents(
+                [
+                    {
+                        "filename": "LV.pdf",
+                        "download_link": "https://example.org/LV.pdf",
+                        "publication_tender_number": number,
+                    }
+                    for number in ("B", "missing")
+                ]
+            )
+
+            first, second = first.result(5), second.result(5)
+            self.assertEqual((first.created, first.skipped), (2, 0))
+            # "A" is created for the first submission, a duplicate in the second.
+            self.assertEqual((second.created, second.skipped, second.failed), (0, 1, 1))
+            self.assertEqual(second.outcomes, {0: "skipped", 1: "failed"})
+            self.assertEqual(list(second.item_errors), [1])
+            self.assertGreater(first.db_queries + second.db_queries, 0)
+            result = writer.result(ticket, timeout=5)
+            self.assertEqual((result.created, result.failed), (1, 1))
+            self.assertEqual(list(result.item_errors), [1])
+            self.assertIn("'missing'", result.item_errors[1])
+            self.assertEqual(writer.batches, 2)
+        self.assertEqual(Publication.objects.count(), 2)
+
+    def test_failing_batch_is_retried_per_submission(self):
+        with IngestionWriter(max_delay=0.5) as writer:
+            _, good = writer.submit_publications([publication_payload("A")])
+            _, bad = writer.submit_publications(
+                [publication_payload("B", title="x" * 300)]
+            )
+            self.assertEqual(good.result(5).created, 1)
+            with self.assertRaises(Exception):
+                bad.result(5)
+        self.assertEqual(
+            list(Publication.objects.values_list("tender_number", flat=True)), ["A"]
+        )
+
+    def test_full_queue_blocks_until_flushed(self):
+        writer = IngestionWriter(max_delay=0.5, max_pending=2)
+        writer.submit_publications([publication_payload("A"), publication_payload("B")])
+        blocked = threading.Thread(
+            target=writer.submit_publications, args=([publication_payload("C")],)
+        )
+        blocked.start()
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        blocked.join(5)
+        self.assertFalse(blocked.is_alive())
+        writer.close()
+        self.assertEqual(Publication.objects.count(), 3)
+
+    def test_close_flushes_pending_payloads(self):
+        writer = IngestionWriter(max_delay=60)
+        _, future = writer.submit_publications([publication_payload("A")])
+        writer.close()
+        self.assertEqual(future.result(0).created, 1)
+        self.assertTrue(Publication.objects.filter(tender_number="A").exists())
+        with self.assertRaises(RuntimeError):
+            writer.submit_publications([publication_payload("B")])
+
+
+# The crawl stores through the writer thread, so its writes must be committed.
+class CrawlCommandTests(TransactionTestCase):
+    def test_replayed_crawl_without_browser_use(self):
+        import itwo_scraper
+
+        listing_url = next(
+            portal.listing_url
+            for portal in itwo_scraper.portals
+            if portal.name == "service.bund.de"
+        )
+        listing = (FIXTURES / "service_bund_listing.html").read_text(encoding="utf-8")
+        detail = (FIXTURES / "service_bund_detail.html").read_text(encoding="utf-8")
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as root:
+            recorder = Recorder(root)
+            recorder.page(listing_url, html=listing)
+            for entry in extract_listing(listing_url, listing):
+                recorder.page(entry.url, html=detail)
+            call_command("crawl", replay=root, portal=["service.bund.de"], stdout=out)
+
+        self.assertNotIn("browser_use", sys.modules)
+        self.assertIsNone(itwo_scraper._writer)
+        self.assertTrue(Publication.objects.filter(portal="service.bund.de").exists())
+        self.assertRegex(out.getvalue(), r"startup: import [\d.]+s, first page after")
+
+    def test_agent_runs_count_the_queries_of_their_writes(self):
+        import itwo_scraper
+
+        with tempfile.TemporaryDirectory() as root:
+            recorder = Recorder(root)
+            with recorder.agent_run("detail a"):
+                recorder.tool_call(
+                    "create_publications",
+                    {
+                        "publication_inputs": [
+                            PublicationInput(**publication_payload("A"))
+                        ]
+                    },
+                    "Queued 1 publication(s) (ticket 1)",
+                )
+            itwo_scraper.configure(replay=root)
+            self.addCleanup(itwo_scraper.configure)
+            self.addCleanup(itwo_scraper.close)
+
+            async def crawl():
+                async with itwo_scraper.instrumentation.run("example", "detail a"):
+                    return await itwo_scraper.replay_agent("detail a", None)
+
+            [extraction] = asyncio.run(crawl())
+
+        self.assertEqual(extraction.publication.tender_number, "A")
+        crawl_run = CrawlRun.objects.get()
+        self.assertGreater(crawl_run.db_queries, 0)
+        step = crawl_run.steps.get(name="store publications")
+        self.assertEqual(step.db_queries, crawl_run.db_queries)
+        self.assertRegex(
+            itwo_scraper.instrumentation.prometheus(), r"crawl_db_queries_total [1-9]"
+        )
+
+
+class CrawlQueueTests(TransactionTestCase):
+    def urls(self, portal, count):
+        return [f"https://{portal}.example/tender/{number}" for number in range(count)]
+
+    def test_leases_follow_priority_within_cluster_wide_caps(self):
+        enqueue_details("a", self.urls("a", 3))
+        enqueue_details("b", self.urls("b", 2))
+        # Queueing a page again while it is pending does nothing.
+        enqueue_details("a", self.urls("a", 1))
+        CrawlJob.objects.filter(url=self.urls("a", 3)[2]).update(priority=20)
+        first = CrawlQueue("first", {"a": 2, "b": 1})
+        second = CrawlQueue("second", {"a": 2, "b": 1})
+
+        jobs = first.lease(10)
+        self.assertEqual(sorted(job.portal for job in jobs), ["a", "a", "b"])
+        self.assertEqual([job.priority for job in jobs if job.portal == "a"][0], 20)
+        self.assertEqual(second.lease(10), [])
+        self.assertTrue(first.complete(next(job for job in jobs if job.portal == "a")))
+        self.assertEqual([job.portal for job in second.lease(10)], ["a"])
+        self.assertEqual(CrawlJob.objects.count(), 5)
+
+    def test_failed_jobs_back_off_and_expired_leases_return(self):
+        enqueue_details("a", self.urls("a", 1))
+        CrawlJob.objects.update(max_attempts=3)
+        first = CrawlQueue("first", {"a": 1})
+        second = CrawlQueue("second", {"a": 1})
+
+        [job] = first.lease()
+        self.assertTrue(first.fail(job, "HTTP 503"))
+        self.assertEqual(second.lease(), [])
+        CrawlJob.objects.update(available_at=datetime.now(timezone.utc))
+
+        # The first worker stalls with the job; its lease runs out and the
+        # job goes to the second worker.
+        [job] = first.lease()
+        CrawlJob.objects.update(
+            lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+        )
+        second.requeue_expired()
+        [stolen] = second.lease()
+        self.assertEqual(first.heartbeat([job.pk]), set())
+        self.assertFalse(first.complete(job))
+        self.assertTrue(second.fail(stolen, "HTTP 503"))
+        job = CrawlJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (CrawlJob.FAILED, 3))
+
+    def test_concurrent_workers_never_share_a_job(self):
+        enqueue_details("a", self.urls("a", 40))
+        leased = []
+
+        def work(name):
+            queue = CrawlQueue(name, {"a": 3})
+            try:
+                while jobs := queue.lease(2):
+                    for job in jobs:
+                        leased.append(job.pk)
+                        queue.complete(job)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertEqual(len(leased), 40)
+        self.assertEqual(len(set(leased)), 40)
+        self.assertEqual(CrawlJob.objects.filter(status=CrawlJob.DONE).count(), 40)
+
+    def test_worker_queues_and_crawls_detail_pages(self):
+        listing = (FIXTURES / "service_bund_listing.html").read_text(encoding="utf-8")
+        detail = (FIXTURES / "service_bund_detail.html").read_text(encoding="utf-8")
+        stored, agent_tasks = [], []
+
+        async def fetch(url):
+            if "Suche" in url:
+                return listing
+            return detail if "4821533" not in url else "<html></html>"
+
+        async def run_agent(task, browser):
+            agent_tasks.append(task)
+            return [agent_extraction("AGENT-1")]
+
+        async def ingest(extraction):
+            stored.append(extraction.publication.tender_number)
+
+        portal = PortalConfig(
+            name="service.bund.de",
+            listing_url="https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/",
+            listing_task="listing",
+            detail_task="detail {url}",
+            requests_per_second=1000,
+        )
+        orchestrator = CrawlOrchestrator(
+            portals=[portal],
+            pool=BrowserPool(object, size=1),
+            fetch=fetch,
+            run_agent=run_agent,
+            ingest=ingest,
+        )
+        enqueue_listings({portal.name: portal.listing_url})
+        worker = CrawlWorker(
+            orchestrator,
+            CrawlQueue("worker", {portal.name: 2}),
+            poll_interval=0.05,
+        )
+        stats = async_to_sync(worker.run)(until_idle=True)
+
+        self.assertEqual((stats.done, stats.failed), (4, 0))
+        self.assertEqual(len(stored), 2)
+        self.assertEqual(len(agent_tasks), 1)
+        self.assertEqual(
+            CrawlJob.objects.filter(kind=CrawlJob.DETAIL, status=CrawlJob.DONE).count(),
+            3,
+        )
+
+
+class ContractorResolutionTests(TestCase):
+    def authority(self, name, address=None):
+        return {"name": name, "address": address, "contact_email": None}
+
+    def test_normalized_names(self):
+        self.assertEqual(
+            {
+                normalize_name(name)
+                for name in (
+                    "Stadt München",
+                    "Landeshauptstadt München",
+                    "Stadt Muenchen ",
+                    "STADT  MÜNCHEN",
+                )
+            },
+            {"muenchen"},
+        )
+        self.assertEqual(
+            normalize_name("Stadtwerke Bonn GmbH & Co. KG"), "stadtwerke bonn"
+        )
+        self.assertEqual(normalize_name("Landkreis München"), "landkreis muenchen")
+        self.assertEqual(normalize_name("Stadt"), "stadt")
+
+    def test_similar_pairs_matches_brute_force(self):
+        names = [
+            "Bundesanstalt für Immobilienaufgaben",
+            "Bundesanstalt fuer Immobilienaufgabe",
+            "Bundesamt für Bauwesen",
+            "Universitätsklinikum Bonn",
+            "Universitaetsklinikum Bonn AöR",
+            "Stadt Münster",
+            "Stadt München",
+        ]
+        keys = {pk: normalize_name(name) for pk, name in enumerate(names)}
+        found = {(a, b) for a, b, _ in similar_pairs(keys, 0.7)}
+        brute = {
+            (a, b)
+            for a in keys
+            for b in keys
+            if a < b
+            and len(trigrams(keys[a]) & trigrams(keys[b]))
+            / len(trigrams(keys[a]) | trigrams(keys[b]))
+            >= 0.7
+        }
+        self.assertEqual({tuple(sorted(pair)) for pair in found}, brute)
+        self.assertIn((0, 1), brute)
+        self.assertNotIn((5, 6), brute)
+
+    def test_ingestion_reuses_normalized_contractor(self):
+        ingest_publications(
+            [
+                publication_payload(
+                    "A", contracting_authority=self.authority("Stadt München")
+                ),
+                publication_payload(
+                    "B",
+                    contracting_authority=self.authority("Landeshauptstadt München"),
+                ),
+            ]
+        )
+        ingest_publications(
+            [
+                publication_payload(
+                    "C", contracting_authority=self.authority("Stadt Muenchen ")
+                )
+            ]
+        )
+        self.assertEqual(Contractor.objects.count(), 1)
+        self.assertEqual(
+            Publication.objects.values("contracting_authority").distinct().count(), 1
+        )
+
+    def test_merge_command_folds_spelling_variants(self):
+        for number, name, address in [
+            ("A", "Bundesanstalt für Immobilienaufgaben", "53113 Bonn"),
+            ("B", "Bundesanstalt fuer Immobilienaufgabe", None),
+            ("C", "Bundesanstalt für Immobilienaufgaben Nord", "20095 Hamburg"),
+            ("D", "Stadt Bonn", None),
+        ]:
+            ingest_publications(
+                [
+                    publication_payload(
+                        number, contracting_authority=self.authority(name, address)
+                    )
+                ]
+            )
+
+        out = StringIO()
+        call_command("merge_contractors", stdout=out)
+        self.assertIn("merged 1 contractors, repointed 1 publications", out.getvalue())
+
+        authority = Publication.objects.get(tender_number="A").contracting_authority
+        self.assertEqual(
+            Publication.objects.get(tender_number="B").contracting_authority, authority
+        )
+        self.assertNotEqual(
+            Publication.objects.get(tender_number="C").contracting_authority, authority
+        )
+        self.assertEqual(Contractor.objects.count(), 3)
+        self.assertEqual(merge_duplicates().merged, 0)
+
+    def test_merged_spellings_are_reused_on_reingest(self):
+        for number, name in [
+            ("A", "Bundesanstalt für Immobilienaufgaben"),
+            ("B", "Bundesanstalt fuer Immobilienaufgabe"),
+        ]:
+            ingest_publications(
+                [
+                    publication_payload(
+                        number, contracting_authority=self.authority(name)
+                    )
+                ]
+            )
+        self.assertEqual(merge_duplicates().merged, 1)
+
+        ingest_publications(
+            [
+                publication_payload(
+                    "B",
+                    title="Amended",
+                    contracting_authority=self.authority(
+                        "Bundesanstalt fuer Immobilienaufgabe"
+                    ),
+                ),
+                publication_payload(
+                    "E",
+                    contracting_authority=self.authority(
+                        "Bundesanstalt für Immobilienaufgabe"
+                    ),
+                ),
+            ]
+        )
+
+        authority = Publication.objects.get(tender_number="A").contracting_authority
+        self.assertEqual(Contractor.objects.count(), 1)
+        self.assertEqual(
+            set(Publication.objects.values_list("contracting_authority", flat=True)),
+            {authority.pk},
+        )
+
+
+class DuplicateDetectionTests(TestCase):
+    DESCRIPTION = (
+        "Sanierung der Dachflächen der Grundschule am Rhein einschließlich "
+        "Dämmung, Abdichtung und Entwässerung, Bauabschnitt 2."
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        same = {"title": "Dachsanierung Grundschule", "description": cls.DESCRIPTION}
+        ingest_publications(
+            [
+                publication_payload("BUND-1", **same),
+                publication_payload("RIB-77", portal_name="myorder.rib.de", **same),
+                publication_payload(
+                    "RIB-78",
+                    portal_name="myorder.rib.de",
+                    title="Dachsanierung Grundschule (Bauabschnitt 2)",
+                    description=cls.DESCRIPTION,
+                ),
+                # Re-tendered a year later: same text, different deadline.
+                publication_payload(
+                    "EVERGABE-1",
+                    portal_name="evergabe.nrw.de",
+                    dates={
+                        **publication_payload("x")["dates"],
+                        "application_deadline": "2026-04-12T10:00:00+02:00",
+                    },
+                    **same,
+                ),
+                publication_payload("BUND-2"),
+            ]
+        )
+        cls.ids = dict(Publication.objects.values_list("tender_number", "pk"))
+
+    def canonical(self):
+        return dict(
+            Publication.objects.filter(canonical__isnull=False).values_list(
+                "tender_number", "canonical__tender_number"
+            )
+        )
+
+    def test_ingested_copies_are_linked_to_the_oldest(self):
+        first = index_publications([self.ids["BUND-1"], self.ids["BUND-2"]])
+        self.assertEqual(first.duplicates, 0)
+        index_publications(
+            [self.ids[number] for number in ("RIB-77", "RIB-78", "EVERGABE-1")]
+        )
+        # RIB-78 shares its portal with RIB-77 but matches BUND-1, so it
+        # joins the same cluster.
+        self.assertEqual(self.canonical(), {"RIB-77": "BUND-1", "RIB-78": "BUND-1"})
+
+        response = self.client.get(reverse("publication-list"), {"collapse": "1"})
+        numbers = {row["tender_number"] for row in response.json()["results"]}
+        self.assertEqual(numbers, {"BUND-1", "BUND-2", "EVERGABE-1"})
+
+    def test_backlog_clustering_matches_incremental_linking(self):
+        result = cluster_backlog()
+        self.assertEqual((result.signed, result.clusters), (5, 1))
+        self.assertEqual(self.canonical(), {"RIB-77": "BUND-1", "RIB-78": "BUND-1"})
+
+
+class CrawlTrackerTests(TestCase):
+    def test_only_new_or_changed_pages_are_crawled(self):
+        tracker = CrawlTracker()
+        march = datetime(2025, 3, 3, tzinfo=timezone.utc)
+        old = ListingEntry(url="https://example.org/old", published_at=march)
+        recent = ListingEntry(
+            url="https://example.org/recent", published_at=march + timedelta(days=20)
+        )
+        new = ListingEntry(
+            url="https://example.org/new", published_at=march + timedelta(days=30)
+        )
+
+        self.assertEqual(tracker.select("p", [old, recent, new]), [old, recent, new])
+        tracker.remember("p", old.url, "hash-1")
+        tracker.remember("p", recent.url, "hash-2")
+        tracker.advance("p", [old, recent, new])
+
+        # Known pages close to the mark are checked again.
+        self.assertEqual(tracker.select("p", [old, recent, new]), [recent, new])
+        self.assertTrue(tracker.unchanged(old.url, "hash-1"))
+        self.assertFalse(tracker.unchanged(old.url, "hash-3"))
+
+    def test_open_tenders_are_checked_for_amendments(self):
+        tracker = CrawlTracker()
+        march = datetime(2025, 3, 3, tzinfo=timezone.utc)
+        old = ListingEntry(url="https://example.org/old", published_at=march)
+        new = ListingEntry(
+            url="https://example.org/new", published_at=march + timedelta(days=60)
+        )
+        deadline = (datetime.now(timezone.utc) + timedelta(days=10)).isoformat()
+        ingest_publications(
+            [
+                publication_payload(
+                    "OLD",
+                    publication_url=old.url,
+                    dates=publication_payload("")["dates"]
+                    | {"application_deadline": deadline},
+                )
+            ]
+        )
+        tracker.remember("p", old.url, "hash-1")
+        tracker.advance("p", [old, new])
+
+        self.assertEqual(tracker.select("p", [old, new]), [old, new])
+        # An amended page is processed, an unchanged one is not.
+        self.assertFalse(tracker.unchanged(old.url, "hash-amended"))
+        self.assertTrue(tracker.unchanged(old.url, "hash-1"))
+
+        PublicationDates.objects.update(
+            application_deadline=datetime.now(timezone.utc) - timedelta(days=1)
+        )
+        self.assertEqual(tracker.select("p", [old, new]), [new])
+
+
+@override_settings(RESPONSE_CACHE="off")
+class PublicationAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_publications(
+            [
+                publication_payload(
+                    f"T-{i}",
+                    portal_name="service.bund.de" if i % 2 else "myorder.rib.de",
+                )
+                for i in range(60)
+            ]
+        )
+        ingest_documents(
+            [
+                {
+                    "filename": f"LV-{i}.pdf",
+                    "download_link": f"https://example.org/LV-{i}.pdf",
+                    "publication_tender_number": f"T-{i}",
+                }
+                for i in range(60)
+            ]
+        )
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        url = reverse("publication-list")
+        for page_size in (5, 50):
+            with self.subTest(page_size=page_size), self.assertNumQueries(3):
+                response = self.client.get(url, {"page_size": page_size})
+            self.assertEqual(len(response.json()["results"]), page_size)
+
+    def test_filters_and_cursor(self):
+        url = reverse("publication-list")
+        response = self.client.get(
+            url, {"portal": "service.bund.de", "cpv": "90910000-9", "page_size": 20}
+        )
+        body = response.json()
+        self.assertEqual(len(body["results"]), 20)
+        self.assertTrue(
+            all(row["portal"] == "service.bund.de" for row in body["results"])
+        )
+
+        second = self.client.get(body["next"]).json()
+        self.assertEqual(len(second["results"]), 10)
+        self.assertIsNone(second["next"])
+
+        response = self.client.get(url, {"deadline_after": "not-a-date"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_representation_matches_serializers(self):
+        first, second = Publication.objects.order_by("pk")[:2]
+        Publication.objects.filter(pk=second.pk).update(canonical=first)
+        PublicationDates.objects.filter(pk=first.dates_id).update(
+            period_start="2025-05-01"
+        )
+        PublicationDocument.objects.filter(tender=first).update(
+            downloaded_at=datetime(2025, 3, 1, 12, tzinfo=timezone.utc),
+            sha256="0" * 64,
+            size=1234,
+        )
+        publications = list(
+            representation().queryset(Publication.objects.order_by("pk"))[:10]
+        )
+        self.assertEqual(
+            representation().many(publications),
+            PublicationSerializer(publications, many=True).data,
+        )
+
+        results = list(Publication.objects.search("Unterhaltsreinigung")[:5])
+        self.assertEqual(len(results), 5)
+        self.assertEqual(
+            representation(PublicationSearchSerializer).many(results),
+            PublicationSearchSerializer(results, many=True).data,
+        )
+
+    def test_sparse_fieldsets(self):
+        url = reverse("publication-list")
+        params = {"fields": "id,title,portal,dates,cpv_codes", "page_size": 5}
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get(url, params).json()["results"]
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("description", queries[0]["sql"])
+        self.assertEqual(list(rows[0]), ["id", "dates", "cpv_codes", "title", "portal"])
+        publication = Publication.objects.get(pk=rows[0]["id"])
+        self.assertEqual(rows[0]["dates"], publication.dates_id)
+        self.assertEqual(
+            rows[0]["cpv_codes"], [code.pk for code in publication.cpv_codes.all()]
+        )
+
+        rows = self.client.get(
+            url, {**params, "expand": "dates,tender_documents"}
+        ).json()["results"]
+        self.assertEqual(rows[0]["dates"]["id"], publication.dates_id)
+        self.assertEqual(rows[0]["tender_documents"][0]["filename"], "LV-59.pdf")
+
+        detail = self.client.get(
+            reverse("publication-detail", args=[publication.pk]), {"fields": "title"}
+        )
+        self.assertEqual(detail.json(), {"title": publication.title})
+        self.assertEqual(self.client.get(url, {"fields": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"expand": "title"}).status_code, 400)
+
+    def test_renderers_and_compression(self):
+        url = reverse("publication-list")
+        response = self.client.get(url, {"page_size": 50})
+        self.assertEqual(
+            response.content,
+            DRFJSONRenderer().render(json.loads(response.content)),
+        )
+
+        compressed = self.client.get(
+            url, {"page_size": 50}, HTTP_ACCEPT_ENCODING="gzip, deflate"
+        )
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), response.content)
+
+    @unittest.skipUnless(importlib.util.find_spec("brotli"), "brotli is not installed")
+    def test_brotli(self):
+        import brotli
+
+        url = reverse("publication-list")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(
+            json.loads(brotli.decompress(response.content)),
+            self.client.get(url).json(),
+        )
+
+        page = self.client.get(reverse("admin:login"), HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(page["Content-Encoding"], "gzip")
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("msgpack"), "msgpack is not installed"
+    )
+    def test_msgpack(self):
+        import msgpack
+
+        url = reverse("publication-list")
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(url).json())
+
+
+class FakeRedis:
+    # Just the commands RedisBackend uses.
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def pipeline(self):
+        client, calls = self, []
+
+        class Pipeline:
+            def incr(self, key):
+                calls.append(key)
+
+            def execute(self):
+                return [client.incr(key) for key in calls]
+
+        return Pipeline()
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_publications(
+            [
+                publication_payload(
+                    f"T-{i}",
+                    portal_name="service.bund.de" if i % 2 else "myorder.rib.de",
+                )
+                for i in range(10)
+            ]
+        )
+
+    def test_hit_and_not_modified(self):
+        url = reverse("publication-list")
+        first = self.client.get(url, {"page_size": 5})
+        self.assertEqual(first["X-Cache"], "miss")
+        with self.assertNumQueries(1):
+            second = self.client.get(url, {"page_size": 5})
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Type"], first["Content-Type"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, {"page_size": 5}, HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, {"page_size": 6})["X-Cache"], "miss")
+
+    def test_ingestion_invalidates_affected_responses(self):
+        detail = reverse(
+            "publication-detail", args=[Publication.objects.get(tender_number="T-1").pk]
+        )
+        bund = {"portal": "service.bund.de"}
+        rib = {"portal": "myorder.rib.de"}
+        url = reverse("publication-list")
+        for params in (bund, rib, {}):
+            self.client.get(url, params)
+        etag = self.client.get(detail)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_publications(
+                [
+                    publication_payload(
+                        "T-1", portal_name="service.bund.de", title="Amended"
+                    )
+                ]
+            )
+        self.assertEqual(self.client.get(url, bund)["X-Cache"], "miss")
+        self.assertEqual(self.client.get(url, {})["X-Cache"], "miss")
+        self.assertEqual(self.client.get(url, rib)["X-Cache"], "hit")
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Amended")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_documents(
+                [
+                    {
+                        "filename": "LV.pdf",
+                        "download_link": "https://example.org/LV.pdf",
+                        "publication_tender_number": "T-1",
+                    }
+                ]
+            )
+        body = self.client.get(detail).json()
+        self.assertEqual(len(body["tender_documents"]), 1)
+        self.assertEqual(self.client.get(url, rib)["X-Cache"], "hit")
+
+    def test_redis_backend(self):
+        cache = ResponseCache(RedisBackend(client=FakeRedis()), ttl=60)
+        request = self.client.get(reverse("publication-list")).wsgi_request
+        renders = []
+
+        def render():
+            renders.append(1)
+            return HttpResponse(b"[]", content_type="application/json")
+
+        first = cache.respond(request, ["list"], render)
+        second = cache.respond(request, ["list"], render)
+        self.assertEqual((len(renders), second["X-Cache"]), (1, "hit"))
+        self.assertEqual(second["ETag"], first["ETag"])
+        cache.invalidate(["list"])
+        self.assertEqual(cache.respond(request, ["list"], render)["X-Cache"], "miss")
+        self.assertEqual(len(renders), 2)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_publications(
+            [
+                publication_payload(f"E-{i}", portal_name="myorder.rib.de")
+                for i in range(5)
+            ]
+            + [publication_payload("E-bund")]
+        )
+        ingest_documents(
+            [
+                {
+                    "filename": "LV.pdf",
+                    "download_link": "https://example.org/LV.pdf",
+                    "publication_tender_number": "E-0",
+                }
+            ]
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse("publication-export"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_nests_relations_and_applies_filters(self):
+        rows = [
+            json.loads(line)
+            for line in self.export(**{"as": "ndjson", "portal": "myorder.rib.de"})
+            .strip()
+            .splitlines()
+        ]
+        self.assertEqual(
+            [row["tender_number"] for row in rows], [f"E-{i}" for i in range(5)]
+        )
+        self.assertEqual(rows[0]["contracting_authority"]["name"], "Stadt Bonn")
+        self.assertEqual(rows[0]["cpv_codes"], ["90910000-9"])
+        self.assertEqual(rows[0]["documents"][0]["filename"], "LV.pdf")
+        self.assertEqual(
+            rows[0]["dates"]["application_deadline"], "2025-04-12T08:00:00Z"
+        )
+
+    def test_csv_and_since(self):
+        lines = self.export().strip().splitlines()
+        self.assertTrue(lines[0].startswith("id,tender_number,title"))
+        self.assertEqual(len(lines), 7)
+
+        since = datetime.now(timezone.utc)
+        ingest_publications([publication_payload("E-1", title="Tender E-1 (Änderung)")])
+        lines = self.export(since=since.isoformat()).strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Tender E-1 (Änderung)", lines[1])
+
+    def test_command_writes_file_in_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "export.ndjson"
+            call_command(
+                "export_publications",
+                format="ndjson",
+                output=str(path),
+                chunk_size=2,
+                stderr=StringIO(),
+            )
+            self.assertEqual(len(path.read_text().splitlines()), 6)
+
+    def test_unknown_or_unavailable_format(self):
+        response = self.client.get(reverse("publication-export"), {"as": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+        if importlib.util.find_spec("pyarrow") is None:
+            response = self.client.get(reverse("publication-export"), {"as": "parquet"})
+            self.assertEqual(response.status_code, 400)
+
+
+class DeadlineTests(TestCase):
+    def test_backfill_and_deadline_window(self):
+        now = datetime.now(timezone.utc)
+        ingest_publications(
+            [
+                publication_payload(
+                    number,
+                    dates={
+                        **publication_payload(number)["dates"],
+                        "application_deadline": deadline,
+                    },
+                )
+                for number, deadline in [
+                    ("SOON", now + timedelta(days=3)),
+                    ("LATER", now + timedelta(days=30)),
+                    ("OLD", None),
+                ]
+            ]
+        )
+        old = Publication.objects.get(tender_number="OLD").dates
+        PublicationDates.objects.filter(pk=old.pk).update(
+            application_deadline_raw="12.03.2025, 10:00 Uhr",
+            bidders_requests_deadline_raw="nach Vereinbarung",
+        )
+
+        out = StringIO()
+        call_command("backfill_deadlines", batch_size=1, stdout=out)
+        self.assertIn("Parsed 1 deadlines, 1 left unparsed", out.getvalue())
+        old.refresh_from_db()
+        self.assertEqual(
+            old.application_deadline, datetime(2025, 3, 12, 9, tzinfo=timezone.utc)
+        )
+
+        self.assertEqual(
+            list(
+                Publication.objects.closing_within(7).values_list(
+                    "tender_number", flat=True
+                )
+            ),
+            ["SOON"],
+        )
+        response = self.client.get(
+            reverse("publication-list"),
+            {"deadline_before": "2025-04-01T00:00:00Z"},
+        )
+        self.assertEqual(
+            [row["tender_number"] for row in response.json()["results"]], ["OLD"]
+        )
+
+
+class SearchTests(TestCase):
+    def test_ranked_german_search_with_highlights(self):
+        ingest_publications(
+            [
+                publication_payload(
+                    "S-1",
+                    title="Reinigung der Dienstgebäude",
+                    description="Reinigung der Büros und Flure",
+                ),
+                publication_payload(
+                    "S-2",
+                    title="Rohbauarbeiten Kita",
+                    description="Inklusive Reinigung der Baustelle",
+                ),
+                publication_payload("S-3", title="Winterdienst", description=None),
+            ]
+        )
+
+        results = list(Publication.objects.search("Reinigungen"))
+        self.assertEqual([p.tender_number for p in results], ["S-1", "S-2"])
+        self.assertIn("<mark>Reinigung</mark>", results[0].title_highlight)
+
+        response = self.client.get(
+            reverse("publication-search"), {"q": "reinigung -kita"}
+        )
+        body = response.json()
+        self.assertEqual(body["count"], 1)
+        self.assertEqual(body["results"][0]["tender_number"], "S-1")
+        self.assertIn("<mark>", body["results"][0]["snippet"])
+
+
+@unittest.skipUnless(importlib.util.find_spec("scipy"), "scipy is not installed")
+class MatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_publications(
+            [
+                publication_payload(
+                    "M-roof",
+                    title="Dachsanierung Grundschule",
+                    execution_place="53111 Bonn",
+                    cpv_codes=[{"code": "45261000-4", "description": None}],
+                ),
+                publication_payload(
+                    "M-roof-cologne",
+                    title="Dachsanierung Rathaus",
+                    execution_place="50667 Köln",
+                    cpv_codes=[{"code": "45261000-4", "description": None}],
+                    contracting_authority={
+                        "name": "Stadt Köln",
+                        "address": None,
+                        "contact_email": None,
+                    },
+                ),
+                publication_payload("M-cleaning", execution_place="53111 Bonn"),
+            ]
+        )
+        cls.roofing = MatchProfile.objects.create(
+            name="Dachdecker",
+            cpv_prefixes=["4526"],
+            regions=["53"],
+            keywords=["Dachsanierung"],
+            top_n=5,
+        )
+        cls.cleaning = MatchProfile.objects.create(
+            name="Reinigung", cpv_prefixes=["909"], regions=["Bonn"], top_n=1
+        )
+
+    def matches(self, profile):
+        return list(
+            profile.matches.order_by("-score").values_list(
+                "publication__tender_number", flat=True
+            )
+        )
+
+    def test_rank_orders_and_excludes(self):
+        result = rank()
+        self.assertEqual((result.publications, result.profiles), (3, 2))
+        self.assertEqual(
+            self.matches(self.roofing), ["M-roof", "M-roof-cologne", "M-cleaning"]
+        )
+        # "M-roof" is in Bonn too, but top_n keeps only the best.
+        self.assertEqual(self.matches(self.cleaning), ["M-cleaning"])
+
+        self.roofing.excluded_authorities.add(Contractor.objects.get(name="Stadt Köln"))
+        rank(["Dachdecker"])
+        self.assertEqual(self.matches(self.roofing), ["M-roof", "M-cleaning"])
+
+    def test_exclusions_are_exact_and_survive_merges(self):
+        cologne = Contractor.objects.get(name="Stadt Köln")
+        variant = Contractor.objects.create(name="Stadt Koeln (Gebäudewirtschaft)")
+        Publication.objects.filter(tender_number="M-roof-cologne").update(
+            contracting_authority=variant
+        )
+        self.roofing.excluded_authorities.add(variant)
+        rank()
+        self.assertEqual(self.matches(self.roofing), ["M-roof", "M-cleaning"])
+
+        # Folding the variant into "Stadt Köln" keeps it excluded.
+        Contractor.objects.filter(pk=variant.pk).update(
+            normalized_name=cologne.normalized_name
+        )
+        self.assertEqual(merge_duplicates().merged, 1)
+        self.assertEqual(list(self.roofing.excluded_authorities.all()), [cologne])
+        rank()
+        self.assertEqual(self.matches(self.roofing), ["M-roof", "M-cleaning"])
+
+        # Lifting the exclusion brings the tender back on its next update.
+        self.roofing.excluded_authorities.set([])
+        update_matches(Publication.objects.values_list("pk", flat=True))
+        self.assertEqual(
+            self.matches(self.roofing), ["M-roof", "M-roof-cologne", "M-cleaning"]
+        )
+
+    def test_new_publications_are_merged_into_the_top_n(self):
+        rank()
+        result = ingest_publications(
+            [
+                publication_payload(
+                    "M-new",
+                    description="Reinigung Bürogebäude",
+                    execution_place="Bonn",
+                    cpv_codes=[{"code": "90911200-8", "description": None}],
+                )
+            ]
+        )
+        update_matches(result.created_ids)
+        # Same score as "M-cleaning"; the newer one wins the only slot.
+        self.assertEqual(self.matches(self.cleaning), ["M-new"])
+        self.assertEqual(
+            self.matches(self.roofing), ["M-roof", "M-roof-cologne", "M-cleaning"]
+        )
+
+
+class StatisticsTests(TestCase):
+    def assertStatsCurrent(self):
+        stored = {
+            (row.dimension, row.key): (row.publications, row.documents)
+            for row in PublicationStat.objects.filter(publications__gt=0)
+        }
+        self.assertEqual(stored, computed())
+
+    def test_incremental_updates_match_recomputation(self):
+        building = {"code": "45210000-2", "description": "Bauleistungen"}
+        cleaning = {"code": "90910000-9", "description": "Reinigungsdienste"}
+        ingest_publications(
+            [
+                publication_payload(
+                    f"T-{i}",
+                    portal_name="service.bund.de" if i % 2 else "myorder.rib.de",
+                    cpv_codes=[cleaning, building][: i % 3],
+                )
+                for i in range(6)
+            ]
+        )
+        self.assertStatsCurrent()
+        ingest_documents(
+            [
+                {
+                    "filename": f"LV-{i}.pdf",
+                    "download_link": f"https://example.org/LV-{i}.pdf",
+                    "publication_tender_number": f"T-{i % 3}",
+                }
+                for i in range(5)
+            ]
+        )
+        self.assertStatsCurrent()
+
+        # Amendments move a tender (with its documents) between rows.
+        dates = publication_payload("T-1")["dates"] | {"application_deadline": None}
+        ingest_publications(
+            [
+                publication_payload(
+                    "T-1",
+                    portal_name="myorder.rib.de",
+                    cpv_codes=[building],
+                    dates=dates,
+                    contracting_authority={
+                        "name": "Bundesamt für Bauwesen",
+                        "address": None,
+                        "contact_email": None,
+                    },
+                )
+            ]
+        )
+        self.assertStatsCurrent()
+
+        duplicate = Contractor.objects.create(name="Stadt Bonn")
+        Publication.objects.filter(tender_number="T-2").update(
+            contracting_authority=duplicate
+        )
+        rebuild()
+        self.assertEqual(merge_duplicates().merged, 1)
+        self.assertStatsCurrent()
+
+    def test_endpoint_reads_a_fixed_number_of_rows(self):
+        soon = (datetime.now(timezone.utc) + timedelta(days=2)).isoformat()
+        ingest_publications(
+            [
+                publication_payload(
+                    f"T-{i}",
+                    dates=publication_payload("T")["dates"]
+                    | {"application_deadline": soon if i < 2 else None},
+                )
+                for i in range(3)
+            ]
+        )
+        with self.assertNumQueries(7):
+            body = self.client.get(reverse("stats-list"), {"days": 7}).json()
+        self.assertEqual(body["publications"], 3)
+        self.assertEqual(
+            body["portals"],
+            [{"key": "service.bund.de", "publications": 3, "documents": 0}],
+        )
+        self.assertEqual(body["contracting_authorities"][0]["name"], "Stadt Bonn")
+        self.assertEqual([row["publications"] for row in body["deadlines"]], [2])
+        self.assertEqual(len(body["weeks"]), 1)
+        response = self.client.get(reverse("stats-list"), {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE="off")
+class ArchiveTests(TestCase):
+    def test_expired_tenders_move_to_the_archive(self):
+        now = datetime.now(timezone.utc)
+
+        def dates(expiration_time=None, application_deadline=None):
+            return publication_payload("")["dates"] | {
+                "expiration_time": expiration_time,
+                "application_deadline": application_deadline,
+            }
+
+        ingest_publications(
+            [
+                publication_payload(
+                    "T-expired", dates=dates(expiration_time=now - timedelta(days=60))
+                ),
+                publication_payload(
+                    "T-deadline",
+                    dates=dates(application_deadline=now - timedelta(days=90)),
+                ),
+                publication_payload(
+                    "T-recent", dates=dates(expiration_time=now - timedelta(days=5))
+                ),
+                publication_payload(
+                    "T-open", dates=dates(application_deadline=now + timedelta(days=9))
+                ),
+            ]
+        )
+        ingest_documents(
+            [
+                {
+                    "filename": "LV.pdf",
+                    "download_link": "https://example.org/LV.pdf",
+                    "publication_tender_number": "T-expired",
+                }
+            ]
+        )
+        expired = Publication.objects.get(tender_number="T-expired")
+
+        result = archive_expired(batch_size=1)
+        self.assertEqual((result.archived, result.documents, result.batches), (2, 1, 2))
+        self.assertEqual(
+            set(Publication.objects.values_list("tender_number", flat=True)),
+            {"T-recent", "T-open"},
+        )
+        self.assertEqual(PublicationDates.objects.count(), 2)
+        self.assertEqual(PublicationDocument.objects.count(), 0)
+        self.assertEqual(
+            {
+                (row.dimension, row.key): (row.publications, row.documents)
+                for row in PublicationStat.objects.filter(publications__gt=0)
+            },
+            computed(),
+        )
+
+        url = reverse("publication-detail", args=[expired.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        data = self.client.get(url, {"history": "1"}).json()
+        self.assertEqual(data["tender_number"], "T-expired")
+        self.assertEqual(data["tender_documents"][0]["filename"], "LV.pdf")
+        self.assertIn("archived_at", data)
+        archive = self.client.get(reverse("archive-list")).json()["results"]
+        self.assertEqual(
+            [row["tender_number"] for row in archive], ["T-deadline", "T-expired"]
+        )
+
+        self.assertEqual(archive_expired().archived, 0)
+        # A tender crawled again after it was archived replaces its old copy.
+        ingest_publications(
+            [
+                publication_payload(
+                    "T-expired", dates=dates(expiration_time=now - timedelta(days=45))
+                )
+            ]
+        )
+        self.assertEqual(archive_expired().archived, 1)
+        self.assertEqual(ArchivedPublication.objects.count(), 2)
+
+
+class CPVHierarchyTests(TestCase):
+    def test_subtree_filters_and_ancestors(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "cpv_2008.csv"
+        path.write_text(
+            "CODE;DE;EN\n"
+            "45000000-7;Bauarbeiten;Construction work\n"
+            "45200000-9;Komplett- oder Teilbauleistungen;Works for complete ...\n"
+            "45210000-2;Bauleistungen im Hochbau;Building construction work\n"
+            "45262300-4;Betonarbeiten;Concrete work\n"
+            "90910000-9;Reinigungsdienste;Cleaning services\n",
+            encoding="utf-8",
+        )
+        call_command("load_cpv_codes", str(path), stdout=StringIO())
+        self.assertEqual(
+            CPVCode.objects.get(code="45210000-2").description,
+            "Bauleistungen im Hochbau",
+        )
+
+        def cpv(code):
+            return [{"code": code, "description": None}]
+
+        ingest_publications(
+            [
+                publication_payload("hochbau", cpv_codes=cpv("45210000-2")),
+                publication_payload("beton", cpv_codes=cpv("45262300-4")),
+                publication_payload("reinigung", cpv_codes=cpv("90910000-9")),
+            ]
+        )
+
+        def numbers(code):
+            return sorted(
+                Publication.objects.in_cpv(code).values_list("tender_number", flat=True)
+            )
+
+        self.assertEqual(numbers("45"), ["beton", "hochbau"])
+        self.assertEqual(numbers("4521"), ["hochbau"])
+        self.assertEqual(numbers("45000000-7"), ["beton", "hochbau"])
+        self.assertEqual(numbers("45262300-4"), ["beton"])
+
+        hochbau = CPVCode.objects.get(code="45210000-2")
+        self.assertEqual(
+            [ancestor.code for ancestor in hochbau.ancestors()],
+            ["45000000-7", "45200000-9"],
+        )
+
+
+class DocumentServer(BaseHTTPRequestHandler):
+    """Stand-in for a portal's download host, with Range support."""
+
+    body = b"%PDF-1.7\n" + bytes(range(256)) * 2048
+    flaky_failures = 0
+
+    def do_GET(self):
+        if self.path == "/loop.pdf":
+            self.send_response(302)
+            self.send_header("Location", self.path)
+            self.end_headers()
+            return
+        if self.path not in ("/lv.pdf", "/copy.pdf", "/flaky.pdf"):
+            self.send_error(404)
+            return
+
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.body) - start))
+        self.end_headers()
+
+        if self.path == "/flaky.pdf" and DocumentServer.flaky_failures == 0:
+            # Drop the connection half way through the first attempt.
+            DocumentServer.flaky_failures += 1
+            self.wfile.write(self.body[: len(self.body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(self.body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipUnless(importlib.util.find_spec("httpx"), "httpx is not installed")
+class DocumentDownloadTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DocumentServer)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.store_root = Path(store.name)
+
+    def test_streams_resumes_and_deduplicates(self):
+        from core.downloads import DocumentDownloader, DocumentStore, pending_documents
+
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        ingest_publications([publication_payload("D-1"), publication_payload("D-2")])
+        ingest_documents(
+            [
+                {
+                    "filename": filename,
+                    "download_link": f"{base}/{filename}",
+                    "publication_tender_number": number,
+                }
+                for filename, number in [
+                    ("lv.pdf", "D-1"),
+                    ("copy.pdf", "D-2"),
+                    ("flaky.pdf", "D-2"),
+                    ("missing.pdf", "D-2"),
+                    ("loop.pdf", "D-2"),
+                ]
+            ]
+        )
+
+        store = DocumentStore(self.store_root)
+        downloader = DocumentDownloader(store=store, max_per_host=2, backoff=0)
+        stats = async_to_sync(downloader.download_all)(list(pending_documents()))
+
+        self.assertEqual((stats.downloaded + stats.deduplicated, stats.failed), (3, 2))
+        self.assertEqual(stats.downloaded, 1)
+        sha256 = hashlib.sha256(DocumentServer.body).hexdigest()
+        self.assertEqual(store.path_for(sha256).read_bytes(), DocumentServer.body)
+
+        document = PublicationDocument.objects.get(filename="flaky.pdf")
+        self.assertEqual(document.sha256, sha256)
+        self.assertEqual(document.size, len(DocumentServer.body))
+        self.assertEqual(document.mime_type, "application/pdf")
+        self.assertEqual(
+            list(pending_documents().values_list("filename", flat=True)),
+            ["missing.pdf", "loop.pdf"],
+        )
+
+
+def write_docx(path, paragraphs):
+    namespace = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>',
+        )
+
+
+class TextReaderTests(SimpleTestCase):
+    def test_chunks_keep_page_ranges(self):
+        pages = [(1, "a " * 20), (2, ""), (3, "b " * 20), (4, "c" * 130)]
+        chunks = list(chunk_pages(iter(pages), chunk_chars=100))
+
+        self.assertEqual(
+            [(first, last) for first, last, _ in chunks][:2], [(1, 3), (4, 4)]
+        )
+        self.assertTrue(all(len(text) <= 100 for _, _, text in chunks))
+        self.assertEqual(sum(text.count("c") for _, _, text in chunks), 130)
+
+    def test_reads_docx_inside_nested_zip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            write_docx(tmp / "lv.docx", ["Leistungsverzeichnis", "Fensterreinigung"])
+            (tmp / "notes.txt").write_text("Hinweise zur Begehung", encoding="utf-8")
+            with zipfile.ZipFile(tmp / "inner.zip", "w") as archive:
+                archive.write(tmp / "lv.docx", "lv.docx")
+            with zipfile.ZipFile(tmp / "bundle.zip", "w") as archive:
+                archive.write(tmp / "inner.zip", "inner.zip")
+                archive.write(tmp / "notes.txt", "notes.txt")
+                archive.writestr("logo.png", b"not text")
+
+            fmt = detect_format(tmp / "bundle.zip", "application/zip", "bundle.zip")
+            pages = list(read_pages(tmp / "bundle.zip", fmt))
+
+        self.assertEqual(
+            pages,
+            [
+                (1, "Leistungsverzeichnis\nFensterreinigung"),
+                (2, "Hinweise zur Begehung"),
+            ],
+        )
+
+    def test_refuses_zip_bombs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bundle = Path(tmp) / "bundle.zip"
+            with zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("padding.txt", b" " * (4 * 1024 * 1024))
+
+            summary = extract_to_spool(
+                {
+                    "document_id": 1,
+                    "path": str(bundle),
+                    "mime_type": "application/zip",
+                    "filename": "bundle.zip",
+                }
+            )
+
+        self.assertEqual(summary["status"], "failed")
+        self.assertIn("UnsafeArchive: padding.txt", summary["error"])
+
+
+class ExitOnUnpickle:
+    # Kills the pool worker that receives it.
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+class TextExtractionTests(TestCase):
+    def setUp(self):
+        from core.downloads import DocumentStore
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = DocumentStore(Path(tmp.name))
+
+    def add_document(self, tender_number, filename, content):
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.store.path_for(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        ingest_documents(
+            [
+                {
+                    "filename": filename,
+                    "download_link": f"https://example.org/{filename}",
+                    "publication_tender_number": tender_number,
+                }
+            ]
+        )
+        PublicationDocument.objects.filter(filename=filename).update(sha256=sha256)
+
+    def test_extracts_once_and_feeds_document_search(self):
+        from core.text_extraction import extract_pending
+
+        ingest_publications([publication_payload("T-1"), publication_payload("T-2")])
+        self.add_document("T-1", "lv.txt", "Wartung der Aufzugsanlagen".encode())
+        self.add_document("T-2", "plan.dwg", b"\x00\x01")
+
+        stats = extract_pending(max_workers=1, store=self.store)
+        self.assertEqual((stats.documents, stats.chunks, stats.unsupported), (2, 1, 1))
+        self.assertEqual(
+            dict(PublicationDocument.objects.values_list("filename", "text_status")),
+            {"lv.txt": "done", "plan.dwg": "unsupported"},
+        )
+
+        # Finished documents are not extracted again.
+        self.assertEqual(extract_pending(max_workers=1, store=self.store).documents, 0)
+        self.assertEqual(DocumentTextChunk.objects.count(), 1)
+
+        self.assertFalse(Publication.objects.search("Aufzugsanlage").exists())
+        self.assertEqual(
+            list(
+                Publication.objects.search(
+                    "Aufzugsanlage", include_documents=True
+                ).values_list("tender_number", flat=True)
+            ),
+            ["T-1"],
+        )
+
+    def test_a_crashing_worker_fails_only_its_document(self):
+        from core.text_extraction import ExtractionStats, _extract_all
+
+        ingest_publications([publication_payload("T-1")])
+        self.add_document("T-1", "lv.txt", "Wartung der Aufzugsanlagen".encode())
+        self.add_document("T-1", "crash.txt", b"")
+        jobs = [
+            {
+                "document_id": document.pk,
+                "path": str(self.store.path_for(document.sha256)),
+                "mime_type": None,
+                "filename": document.filename,
+            }
+            for document in PublicationDocument.objects.order_by("id")
+        ]
+        jobs[1]["crash"] = ExitOnUnpickle()
+
+        stats = ExtractionStats()
+        _extract_all(jobs, 2, stats)
+
+        self.assertEqual((stats.documents, stats.failed), (2, 1))
+        self.assertEqual(
+            dict(PublicationDocument.objects.values_list("filename", "text_status")),
+            {"lv.txt": "done", "crash.txt": "failed"},
+        )
+        self.assertEqual(
+            PublicationDocument.objects.get(filename="crash.txt").text_error,
+            "the worker process died",
+        )
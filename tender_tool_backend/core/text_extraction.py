@@ -0,0 +1,223 @@
+"""Extract text from downloaded documents into DocumentTextChunk rows.
+
+Documents are parsed in a process pool (see core.text_readers). Workers
+stream pages into spool files; the parent loads each spool into the database
+in batches and marks the document done in the same transaction. A document
+is therefore either fully chunked or still pending, and an interrupted run
+simply picks up the pending ones again.
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .downloads import DocumentStore
+from .models import DocumentTextChunk, PublicationDocument
+from .response_cache import invalidate
+from .text_readers import extract_to_spool
+
+# Rough peak RSS of one worker on a large PDF; used to size the pool.
+WORKER_MEMORY_MB = 400
+INSERT_BATCH = 500
+
+
+def pool_size(memory_budget_mb: int, max_workers: Optional[int] = None) -> int:
+    by_memory = max(1, memory_budget_mb // WORKER_MEMORY_MB)
+    return max(1, min(max_workers or os.cpu_count() or 1, by_memory))
+
+
+@dataclass
+class ExtractionStats:
+    documents: int = 0
+    failed: int = 0
+    unsupported: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1_048_576 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"✅ text: {self.documents} documents, {self.chunks} chunks, "
+            f"{self.unsupported} unsupported, {self.failed} failed in "
+            f"{self.elapsed:.1f}s ({self.docs_per_second:.2f} docs/s, "
+            f"{self.mb_per_second:.2f} MB/s)"
+        )
+
+
+def pending_documents():
+    return PublicationDocument.objects.filter(
+        sha256__isnull=False, text_status=PublicationDocument.TEXT_PENDING
+    ).order_by("id")
+
+
+def extract_pending(
+    limit: Optional[int] = None,
+    memory_budget_mb: int = 2048,
+    max_workers: Optional[int] = None,
+    store: Optional[DocumentStore] = None,
+) -> ExtractionStats:
+    store = store or DocumentStore()
+    stats = ExtractionStats()
+    workers = pool_size(memory_budget_mb, max_workers)
+    documents = pending_documents().values_list("id", "sha256", "mime_type", "filename")
+    if limit is not None:
+        documents = documents[:limit]
+
+    jobs = [
+        {
+            "document_id": document_id,
+            "path": str(store.path_for(sha256)),
+            "mime_type": mime_type,
+            "filename": filename,
+        }
+        for document_id, sha256, mime_type, filename in documents
+    ]
+
+    _extract_all(jobs, workers, stats)
+    return stats
+
+
+def _extract_all(jobs, workers: int, stats: ExtractionStats):
+    # A worker that dies (a parser crash, the OOM killer) breaks the pool
+    # and every job in flight with it. Those jobs are retried one at a
+    # time, so that only the one that kills its worker is marked failed.
+    for job in _extract(jobs, workers, stats):
+        for crashed in _extract([job], 1, stats):
+            _store(_failed(crashed, "the worker process died"), stats)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned workers never inherit this process's DB connections, and are
+    # recycled regularly so a leaky parser cannot grow without bound.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=50,
+    )
+
+
+def _extract(jobs, workers: int, stats: ExtractionStats) -> list:
+    """Extract and store `jobs`; returns those lost to a broken pool."""
+    lost = []
+    pending = iter(jobs)
+    in_flight = {}
+    broken = False
+    pool = _pool(workers)
+    try:
+        while True:
+            if broken and not in_flight:
+                pool.shutdown()
+                pool, broken = _pool(workers), False
+            if not broken:
+                # Keep at most two jobs per worker queued.
+                for job in itertools.islice(pending, workers * 2 - len(in_flight)):
+                    try:
+                        in_flight[pool.submit(extract_to_spool, job)] = job
+                    except BrokenProcessPool:
+                        lost.append(job)
+                        broken = True
+                        break
+            if not in_flight:
+                if broken:
+                    continue
+                return lost
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                try:
+                    summary = future.result()
+                except BrokenProcessPool:
+                    lost.append(job)
+                    broken = True
+                    continue
+                except Exception as exc:
+                    summary = _failed(job, f"{type(exc).__name__}: {exc}")
+                _store(summary, stats)
+    finally:
+        pool.shutdown()
+
+
+def _failed(job: dict, error: str) -> dict:
+    return {
+        "document_id": job["document_id"],
+        "bytes": 0,
+        "pages": 0,
+        "chunks": 0,
+        "spool": None,
+        "status": PublicationDocument.TEXT_FAILED,
+        "error": error,
+    }
+
+
+def _store(summary: dict, stats: ExtractionStats):
+    document_id = summary["document_id"]
+    stats.documents += 1
+    stats.bytes += summary["bytes"]
+
+    with transaction.atomic():
+        DocumentTextChunk.objects.filter(document_id=document_id).delete()
+        if summary["spool"]:
+            try:
+                stats.chunks += _load_spool(document_id, summary["spool"])
+            finally:
+                os.unlink(summary["spool"])
+
+        if summary["status"] == PublicationDocument.TEXT_FAILED:
+            stats.failed += 1
+        elif summary["status"] == PublicationDocument.TEXT_UNSUPPORTED:
+            stats.unsupported += 1
+        PublicationDocument.objects.filter(pk=document_id).update(
+            text_status=summary["status"],
+            text_error=summary["error"],
+            page_count=summary["pages"] or None,
+            text_extracted_at=timezone.now(),
+        )
+        invalidate(
+            PublicationDocument.objects.filter(pk=document_id).values_list(
+                "tender_id", flat=True
+            )
+        )
+
+
+def _load_spool(document_id: int, spool: str) -> int:
+    count = 0
+    batch = []
+    with open(spool, encoding="utf-8") as handle:
+        for position, line in enumerate(handle):
+            page_from, page_to, text = json.loads(line)
+            batch.append(
+                DocumentTextChunk(
+                    document_id=document_id,
+                    position=position,
+                    page_from=page_from,
+                    page_to=page_to,
+                    text=text,
+                )
+            )
+            if len(batch) >= INSERT_BATCH:
+                DocumentTextChunk.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+    DocumentTextChunk.objects.bulk_create(batch)
+    return count + len(batch)
@@ -0,0 +1,227 @@
+"""Page-streaming text readers for downloaded tender documents.
+
+This module deliberately has no Django imports: it runs inside the worker
+processes of core.text_extraction, which are spawned without Django set up.
+Every reader yields one page (or paragraph block) at a time so that a
+300-page Leistungsverzeichnis never has to be held in memory whole.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+CHUNK_CHARS = 4000
+MAX_ZIP_DEPTH = 3
+# Limits on what one ZIP member may expand to, against zip bombs. The ratio
+# is only checked above MIN_RATIO_CHECK_BYTES: small files of padding can
+# legitimately compress very well.
+MAX_MEMBER_BYTES = 512 * 1024 * 1024
+MAX_COMPRESSION_RATIO = 100
+MIN_RATIO_CHECK_BYTES = 1024 * 1024
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_EXTENSIONS = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".zip": "application/zip",
+    ".txt": "text/plain",
+    ".xml": "application/xml",
+    ".x83": "application/xml",
+}
+
+
+class UnsupportedDocument(Exception):
+    pass
+
+
+class UnsafeArchive(Exception):
+    pass
+
+
+def detect_format(path: Path, mime_type: Optional[str], filename: str) -> str:
+    extension = Path(filename).suffix.lower()
+    if mime_type == "application/zip" and extension == ".docx":
+        return _EXTENSIONS[".docx"]
+    if mime_type in _EXTENSIONS.values():
+        return mime_type
+    if extension in _EXTENSIONS:
+        return _EXTENSIONS[extension]
+    raise UnsupportedDocument(f"no text reader for {filename} ({mime_type})")
+
+
+def read_pages(path: Path, fmt: str, depth: int = 0) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) pairs. Page numbers are 1-based and run on
+    across the members of a ZIP archive."""
+    if fmt == "application/pdf":
+        yield from _read_pdf(path)
+    elif fmt == _EXTENSIONS[".docx"]:
+        yield from _read_docx(path)
+    elif fmt == "application/zip":
+        yield from _read_zip(path, depth)
+    elif fmt == "application/xml":
+        yield from _read_xml(path)
+    else:
+        yield from _read_text(path)
+
+
+def _read_pdf(path: Path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedDocument("reading PDFs needs pypdf")
+    # PdfReader parses page objects lazily, one page at a time.
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def _read_docx(path: Path):
+    # DOCX has no fixed pages; stream paragraphs into page-sized blocks.
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        block, size, number = [], 0, 1
+        for _, element in iterparse(xml):
+            if element.tag != f"{_W}p":
+                continue
+            paragraph = "".join(node.text or "" for node in element.iter(f"{_W}t"))
+            element.clear()
+            if paragraph:
+                block.append(paragraph)
+                size += len(paragraph)
+            if size >= CHUNK_CHARS:
+                yield number, "\n".join(block)
+                block, size, number = [], 0, number + 1
+        if block:
+            yield number, "\n".join(block)
+
+
+def _read_zip(path: Path, depth: int):
+    if depth >= MAX_ZIP_DEPTH:
+        return
+    offset = 0
+    with zipfile.ZipFile(path) as archive, tempfile.TemporaryDirectory() as tmp:
+        for member in archive.infolist():
+            if member.is_dir():
+                continue
+            try:
+                fmt = detect_format(Path(member.filename), None, member.filename)
+            except UnsupportedDocument:
+                continue
+            _check_member(member)
+            target = Path(tmp) / f"member{Path(member.filename).suffix}"
+            with archive.open(member) as source, target.open("wb") as sink:
+                shutil.copyfileobj(source, sink)
+            last = 0
+            for number, text in read_pages(target, fmt, depth + 1):
+                last = number
+                yield offset + number, text
+            offset += last
+            target.unlink()
+
+
+def _check_member(member: zipfile.ZipInfo):
+    # ZipExtFile never returns more than file_size, so the header is binding.
+    if member.file_size > MAX_MEMBER_BYTES:
+        raise UnsafeArchive(
+            f"{member.filename} expands to {member.file_size} bytes "
+            f"(limit {MAX_MEMBER_BYTES})"
+        )
+    if (
+        member.file_size > MIN_RATIO_CHECK_BYTES
+        and member.file_size > member.compress_size * MAX_COMPRESSION_RATIO
+    ):
+        raise UnsafeArchive(
+            f"{member.filename} compresses {member.file_size} bytes into "
+            f"{member.compress_size} (limit {MAX_COMPRESSION_RATIO}:1)"
+        )
+
+
+def _read_xml(path: Path):
+    # GAEB (.x83) and other XML exports: element text only, streamed.
+    block, size, number = [], 0, 1
+    for _, element in iterparse(path):
+        if element.text and element.text.strip():
+            block.append(element.text.strip())
+            size += len(block[-1])
+        element.clear()
+        if size >= CHUNK_CHARS:
+            yield number, " ".join(block)
+            block, size, number = [], 0, number + 1
+    if block:
+        yield number, " ".join(block)
+
+
+def _read_text(path: Path):
+    with path.open(encoding="utf-8", errors="replace") as handle:
+        number = 1
+        while True:
+            text = handle.read(CHUNK_CHARS)
+            if not text:
+                break
+            yield number, text
+            number += 1
+
+
+def chunk_pages(pages: Iterator[Tuple[int, str]], chunk_chars: int = CHUNK_CHARS):
+    """Group pages into chunks of about `chunk_chars` characters, yielding
+    (page_from, page_to, text). Only the current chunk is held in memory."""
+    buffer, first, last = [], None, None
+    size = 0
+    for number, text in pages:
+        text = " ".join(text.split())
+        if not text:
+            continue
+        while len(text) > chunk_chars:
+            if buffer:
+                yield first, last, " ".join(buffer)
+                buffer, size = [], 0
+            yield number, number, text[:chunk_chars]
+            text = text[chunk_chars:]
+        if buffer and size + len(text) > chunk_chars:
+            yield first, last, " ".join(buffer)
+            buffer, size = [], 0
+        if not buffer:
+            first = number
+        buffer.append(text)
+        size += len(text)
+        last = number
+    if buffer:
+        yield first, last, " ".join(buffer)
+
+
+def extract_to_spool(job: dict) -> dict:
+    """Worker entry point: extract one document into a JSON-lines spool file.
+
+    Returns a summary dict; chunks themselves go through the spool file
+    rather than back over the process pipe.
+    """
+    path = Path(job["path"])
+    summary = {
+        "document_id": job["document_id"],
+        "bytes": path.stat().st_size if path.exists() else 0,
+        "pages": 0,
+        "chunks": 0,
+        "spool": None,
+        "status": "done",
+        "error": None,
+    }
+    fd, spool = tempfile.mkstemp(prefix=f"doc{job['document_id']}-", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            fmt = detect_format(path, job.get("mime_type"), job["filename"])
+            for page_from, page_to, text in chunk_pages(read_pages(path, fmt)):
+                handle.write(json.dumps([page_from, page_to, text]) + "\n")
+                summary["chunks"] += 1
+                summary["pages"] = page_to
+        summary["spool"] = spool
+    except UnsupportedDocument as exc:
+        summary.update(status="unsupported", error=str(exc))
+    except Exception as exc:
+        summary.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+    if summary["spool"] is None:
+        os.unlink(spool)
+    return summary
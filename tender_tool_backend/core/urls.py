@@ -0,0 +1,10 @@
+from rest_framework.routers import DefaultRouter
+
+from .views import ArchivedPublicationViewSet, PublicationViewSet, StatisticsViewSet
+
+router = DefaultRouter()
+router.register("publications", PublicationViewSet, basename="publication")
+router.register("archive", ArchivedPublicationViewSet, basename="archive")
+router.register("stats", StatisticsViewSet, basename="stats")
+
+urlpatterns = router.urls
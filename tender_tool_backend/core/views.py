@@ -1,3 +1,227 @@
-from django.shortcuts import render
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 
-# Create your views here.
+from .export import FORMATS, ExportError, stream_export
+from .models import ArchivedPublication, Publication
+from .pagination import SearchResultPagination
+from .representation import FieldsetError, representation
+from .response_cache import detail_dependencies, list_dependencies, response_cache
+from .statistics import summary
+from .serializers import (
+    ArchivedPublicationSerializer,
+    PublicationSearchSerializer,
+    PublicationSerializer,
+)
+
+
+class PublicationViewSet(viewsets.ReadOnlyModelViewSet):
+    """Tender list and detail.
+
+    Filters: `portal`, `cpv` (code or prefix, matches the whole subtree),
+    `contracting_authority` (id),
+    `deadline_after` / `deadline_before` (ISO 8601) and `closing_within`
+    (days from now) on the application deadline. `collapse=1` hides
+    copies of a tender found on another portal (see `canonical`).
+
+    Expired tenders are archived after a while (see core.archive) and
+    then only show up here in detail responses with `history=1`; the
+    archive itself is listed under /api/archive/.
+
+    `fields` (comma-separated) limits list, detail and search responses
+    to those fields; relations among them are returned as ids unless
+    named in `expand` (see core.representation).
+
+    JSON list, detail and search responses are served from the response
+    cache while the tenders they show are unchanged, with an ETag.
+    """
+
+    serializer_class = PublicationSerializer
+    queryset = Publication.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.action in ("list", "retrieve", "search"):
+            # One query for the page plus one per prefetched relation,
+            # whatever the page size.
+            queryset = self.representation().queryset(queryset)
+
+        if params.get("portal"):
+            queryset = queryset.filter(portal=params["portal"])
+        if params.get("cpv"):
+            queryset = queryset.in_cpv(params["cpv"])
+        if params.get("contracting_authority"):
+            queryset = queryset.filter(
+                contracting_authority_id=self._int_param("contracting_authority")
+            )
+        if params.get("deadline_after") or params.get("deadline_before"):
+            queryset = queryset.closing_between(
+                self._datetime_param("deadline_after"),
+                self._datetime_param("deadline_before"),
+            )
+        if params.get("closing_within"):
+            queryset = queryset.closing_within(self._int_param("closing_within"))
+        if params.get("collapse") == "1":
+            queryset = queryset.filter(canonical__isnull=True)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(
+            list_dependencies(request.query_params.get("portal")),
+            lambda: self._list(request),
+        )
+
+    def _list(self, request):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(self.representation().many(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(
+            detail_dependencies(kwargs[self.lookup_field]),
+            lambda: self._retrieve(request, *args, **kwargs),
+        )
+
+    def _retrieve(self, request, *args, **kwargs):
+        try:
+            return Response(self.representation().one(self.get_object()))
+        except Http404:
+            if request.query_params.get("history") != "1":
+                raise
+        archived = get_object_or_404(
+            ArchivedPublication.objects.all(), pk=kwargs[self.lookup_field]
+        )
+        return Response(ArchivedPublicationSerializer(archived).data)
+
+    @action(detail=False)
+    def search(self, request):
+        """Full-text search over title and description: `?q=` plus the
+        list filters, ordered by rank with highlighted snippets. Add
+        `documents=1` to also match the text of tender documents."""
+        return self._cached(
+            list_dependencies(request.query_params.get("portal")),
+            lambda: self._search(request),
+        )
+
+    def _search(self, request):
+        terms = request.query_params.get("q", "").strip()
+        if not terms:
+            raise ValidationError({"q": "This parameter is required."})
+
+        paginator = SearchResultPagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset().search(
+                terms, include_documents=request.query_params.get("documents") == "1"
+            ),
+            request,
+            view=self,
+        )
+        return paginator.get_paginated_response(self.representation().many(page))
+
+    @action(detail=False)
+    def export(self, request):
+        """Stream every publication matching the list filters as
+        `?as=csv|ndjson|parquet` (default CSV). `since` (ISO 8601) limits it
+        to publications changed since then, for incremental exports."""
+        file_format = request.query_params.get("as", "csv")
+        queryset = self.get_queryset()
+        since = self._datetime_param("since")
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        try:
+            chunks = stream_export(queryset, file_format)
+        except ExportError as exc:
+            raise ValidationError({"as": str(exc)})
+
+        content_type, extension, _ = FORMATS[file_format]
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="publications.{extension}"'
+        )
+        return response
+
+    def representation(self):
+        """The representation `fields` and `expand` ask for."""
+        try:
+            return representation(
+                (
+                    PublicationSearchSerializer
+                    if self.action == "search"
+                    else PublicationSerializer
+                ),
+                self._names_param("fields"),
+                self._names_param("expand") or (),
+            )
+        except FieldsetError as exc:
+            raise ValidationError({"fields": str(exc)})
+
+    def _cached(self, dependencies, render):
+        cache = response_cache()
+        if cache is None or self.request.accepted_renderer.format != "json":
+            return render()
+
+        def render_now():
+            response = self.finalize_response(self.request, render())
+            response.render()
+            return response
+
+        return cache.respond(self.request, dependencies, render_now)
+
+    def _names_param(self, name):
+        values = self.request.query_params.get(name, "").split(",")
+        return tuple(value.strip() for value in values if value.strip()) or None
+
+    def _int_param(self, name):
+        try:
+            return int(self.request.query_params[name])
+        except ValueError:
+            raise ValidationError({name: "Expected an integer."})
+
+    def _datetime_param(self, name):
+        if not self.request.query_params.get(name):
+            return None
+        value = parse_datetime(self.request.query_params[name])
+        if value is None:
+            raise ValidationError({name: "Expected an ISO 8601 datetime."})
+        return value
+
+
+class ArchivedPublicationViewSet(viewsets.ReadOnlyModelViewSet):
+    """Tenders moved out of the hot tables after they expired, newest id
+    first, in the shape they had when archived. Filters: `portal`,
+    `tender_number`."""
+
+    serializer_class = ArchivedPublicationSerializer
+
+    def get_queryset(self):
+        queryset = ArchivedPublication.objects.all()
+        for name in ("portal", "tender_number"):
+            if self.request.query_params.get(name):
+                queryset = queryset.filter(**{name: self.request.query_params[name]})
+        return queryset
+
+
+class StatisticsViewSet(viewsets.ViewSet):
+    """Dashboard statistics: publication and document counts in total, for
+    the `limit` (default 20) largest portals, CPV divisions and contracting
+    authorities, per week for the last `weeks` (12) weeks and per deadline
+    day for the next `days` (14) days. Answered from the summary tables
+    that ingestion maintains (see core.statistics)."""
+
+    LIMITS = {"limit": (20, 100), "weeks": (12, 104), "days": (14, 90)}
+
+    def list(self, request):
+        options = {}
+        for name, (default, maximum) in self.LIMITS.items():
+            try:
+                value = int(request.query_params.get(name, default))
+            except ValueError:
+                raise ValidationError({name: "Expected an integer."})
+            if not 0 < value <= maximum:
+                raise ValidationError({name: f"Expected 1 to {maximum}."})
+            options[name] = value
+        return Response(summary(**options))
@@ -0,0 +1,164 @@
+"""Cache of agent extractions, keyed by page URL and content.
+
+When a detail page has to go through the LLM agent, what the agent stored
+for it is cached under the normalized URL plus the page fingerprint (the
+hash of its visible text). A retried crawl, or a revisit of a page that has
+not changed, then replays the cached payloads instead of calling the LLM
+again. Entries expire after a TTL and the least recently used ones are
+evicted once the cache grows past its size cap.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from itwo_schemas import DocumentInput, PublicationInput
+
+from .extractors import DetailExtraction
+
+# Query parameters that never change what a page shows.
+_IGNORED_PARAMS = {"jsessionid", "sid", "gclid", "fbclid"}
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in _IGNORED_PARAMS and not name.lower().startswith("utm_")
+    )
+    path = parts.path.split(";")[0].rstrip("/") or "/"
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), "")
+    )
+
+
+def cache_key(url: str, content_hash: str) -> str:
+    return hashlib.sha256(f"{normalize_url(url)}\n{content_hash}".encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (
+            f"extraction cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%}), {self.stores} stored, "
+            f"{self.evictions} evicted"
+        )
+
+
+class DiskBackend:
+    """One JSON file per entry under `root`. A hit touches the file, so
+    modification time doubles as the LRU clock."""
+
+    def __init__(self, root: Path, max_entries: int = 10_000):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self._count = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str, max_age: Optional[float]) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if max_age is not None and time.time() - entry["created_at"] > max_age:
+            self._remove(path)
+            return None
+        os.utime(path)
+        return entry["value"]
+
+    def set(self, key: str, url: str, value: dict) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        existed = path.exists()
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"url": url, "created_at": time.time(), "value": value}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+        if self._count is None:
+            self._count = sum(1 for _ in self.root.glob("*/*.json"))
+        elif not existed:
+            self._count += 1
+        return self._evict() if self._count > self.max_entries else 0
+
+    def _evict(self) -> int:
+        # Trim to 90% of the cap so that eviction does not run on every set.
+        entries = sorted(self.root.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        excess = len(entries) - int(self.max_entries * 0.9)
+        for path in entries[:excess]:
+            self._remove(path)
+        self._count = len(entries) - max(excess, 0)
+        return max(excess, 0)
+
+    def _remove(self, path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        if self._count:
+            self._count -= 1
+
+
+class ExtractionCache:
+    def __init__(self, backend, ttl: Optional[float] = 7 * 24 * 3600):
+        """`backend` is a DiskBackend or core.extraction_cache.DatabaseBackend;
+        `ttl` is in seconds, None keeps entries until they are evicted."""
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, url: str, content_hash: str) -> Optional[List[DetailExtraction]]:
+        value = self.backend.get(cache_key(url, content_hash), self.ttl)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return [
+            DetailExtraction(
+                publication=PublicationInput.model_validate(item["publication"]),
+                documents=[
+                    DocumentInput.model_validate(document)
+                    for document in item["documents"]
+                ],
+            )
+            for item in value["extractions"]
+        ]
+
+    def set(self, url: str, content_hash: str, extractions: List[DetailExtraction]):
+        value = {
+            "extractions": [
+                {
+                    "publication": extraction.publication.model_dump(mode="json"),
+                    "documents": [
+                        document.model_dump(mode="json")
+                        for document in extraction.documents
+                    ],
+                }
+                for extraction in extractions
+            ]
+        }
+        self.stats.evictions += self.backend.set(
+            cache_key(url, content_hash), normalize_url(url), value
+        )
+        self.stats.stores += 1
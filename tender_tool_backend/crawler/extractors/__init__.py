@@ -0,0 +1,120 @@
+"""Deterministic HTML extractors for known portal page layouts.
+
+Parsers register themselves per portal and URL pattern. `extract_detail`
+validates a parser's output against the ingestion schemas and raises
+`ExtractionError` when the page does not look the way the parser expects,
+which is the signal for the caller to fall back to the LLM agent.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from pydantic import ValidationError
+
+from itwo_schemas import DocumentInput, PublicationInput
+
+
+class ExtractionError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Extractor:
+    portal: str
+    kind: str
+    pattern: re.Pattern
+    parse: Callable
+
+
+@dataclass
+class ListingEntry:
+    url: str
+    title: Optional[str] = None
+    published_at: Optional[datetime] = None
+
+
+@dataclass
+class DetailExtraction:
+    publication: PublicationInput
+    documents: List[DocumentInput] = field(default_factory=list)
+
+
+LISTING = "listing"
+DETAIL = "detail"
+
+_registry: List[Extractor] = []
+
+
+def register(portal: str, kind: str, url_pattern: str):
+    """Register `parse(url, html)` for pages of `portal` matching `url_pattern`."""
+
+    def decorator(parse):
+        _registry.append(Extractor(portal, kind, re.compile(url_pattern), parse))
+        return parse
+
+    return decorator
+
+
+def find_extractor(url: str, kind: str) -> Optional[Extractor]:
+    for extractor in _registry:
+        if extractor.kind == kind and extractor.pattern.search(url):
+            return extractor
+    return None
+
+
+def extract_listing(url: str, html: str) -> List[ListingEntry]:
+    extractor = find_extractor(url, LISTING)
+    if extractor is None:
+        raise ExtractionError(f"no listing extractor for {url}")
+    try:
+        entries = extractor.parse(url, html)
+    except ExtractionError:
+        raise
+    except Exception as exc:
+        raise ExtractionError(f"{extractor.portal} listing parser failed: {exc}")
+    if not entries:
+        raise ExtractionError(f"{extractor.portal} listing parser found no tenders")
+    return entries
+
+
+def extract_detail(url: str, html: str) -> DetailExtraction:
+    extractor = find_extractor(url, DETAIL)
+    if extractor is None:
+        raise ExtractionError(f"no detail extractor for {url}")
+    try:
+        data = extractor.parse(url, html)
+    except ExtractionError:
+        raise
+    except Exception as exc:
+        raise ExtractionError(f"{extractor.portal} detail parser failed: {exc}")
+
+    documents = data.pop("documents", [])
+    try:
+        publication = PublicationInput.model_validate(
+            {**data, "publication_url": url, "portal_name": extractor.portal}
+        )
+        documents = [
+            DocumentInput.model_validate(
+                {**doc, "publication_tender_number": publication.tender_number}
+            )
+            for doc in documents
+        ]
+    except ValidationError as exc:
+        raise ExtractionError(
+            f"{extractor.portal} detail page failed validation: {exc}"
+        )
+
+    if not publication.tender_number.strip() or not publication.title.strip():
+        raise ExtractionError(
+            f"{extractor.portal} detail page is missing tender number or title"
+        )
+    if publication.contracting_authority.name is None:
+        raise ExtractionError(
+            f"{extractor.portal} detail page is missing the contracting authority"
+        )
+    return DetailExtraction(publication=publication, documents=documents)
+
+
+from . import itwo, service_bund  # noqa: E402,F401  (registers the parsers)
@@ -0,0 +1,181 @@
+import hashlib
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+import lxml.html
+
+PORTAL_TZ = ZoneInfo("Europe/Berlin")
+
+_DATE_RE = re.compile(
+    r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})"
+    r"(?:\D{0,4}(?P<hour>\d{1,2}):(?P<minute>\d{2}))?"
+)
+_MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mär": 3,
+    "mae": 3,
+    "mrz": 3,
+    "apr": 4,
+    "mai": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "okt": 10,
+    "nov": 11,
+    "dez": 12,
+}
+# Optional time after a date: "10:00", "10.00 Uhr" or "10 Uhr".
+_TIME = (
+    r"(?:[^\d]{0,6}?(?<!\d)(?P<hour>[01]?\d|2[0-3])"
+    r"(?:[:.](?P<minute>[0-5]\d)(?![.\d])(?:\s*uhr)?|\s*uhr))?"
+)
+# Tried in order; the first that matches wins.
+_DATETIME_FORMATS = [
+    re.compile(
+        r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4}|\d{2})(?!\d)" + _TIME,
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"(?P<day>\d{1,2})\.\s*(?P<month_name>[a-zä]{3,9})\.?\s+(?P<year>\d{4})"
+        + _TIME,
+        re.IGNORECASE,
+    ),
+]
+_CPV_RE = re.compile(r"(\d{8}-\d)\s*[-–:]?\s*(.*)")
+_YES = {"ja", "yes", "zugelassen", "true"}
+
+
+def parse_html(html: str, base_url: str):
+    tree = lxml.html.document_fromstring(html)
+    tree.make_links_absolute(base_url, resolve_base_href=True)
+    return tree
+
+
+def text(node) -> Optional[str]:
+    if node is None:
+        return None
+    value = " ".join(node.text_content().split())
+    return value or None
+
+
+def lines(node):
+    """Text of `node` split on <br>/<li>/<p> boundaries."""
+    if node is None:
+        return []
+    for br in node.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+    for block in node.iter("li", "p", "div"):
+        block.tail = "\n" + (block.tail or "")
+    return [
+        " ".join(line.split())
+        for line in node.text_content().splitlines()
+        if line.strip()
+    ]
+
+
+def normalize_label(label: str) -> str:
+    return " ".join(label.lower().replace(":", " ").split())
+
+
+def labelled_values(tree) -> Dict[str, object]:
+    """Collect label -> value node pairs from <dl> lists and two-column tables."""
+    values = {}
+    for dt in tree.iter("dt"):
+        dd = dt.getnext()
+        if dd is not None and dd.tag == "dd":
+            values.setdefault(normalize_label(dt.text_content()), dd)
+    for row in tree.iter("tr"):
+        cells = [cell for cell in row if cell.tag in ("th", "td")]
+        if len(cells) == 2:
+            values.setdefault(normalize_label(cells[0].text_content()), cells[1])
+    return values
+
+
+def parse_german_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse the deadline formats found on German portals, e.g. "12.03.2025,
+    10:00 Uhr", "bis 12.03.25", "12. März 2025 10 Uhr", and ISO 8601 strings.
+    Times without an offset are Europe/Berlin."""
+    if not value:
+        return None
+    return _parse_datetime(" ".join(value.split()))
+
+
+# Deadlines repeat a lot across a backfill or a listing page.
+@lru_cache(maxsize=4096)
+def _parse_datetime(value: str) -> Optional[datetime]:
+    if value[:4].isdigit():
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=PORTAL_TZ)
+
+    for pattern in _DATETIME_FORMATS:
+        match = pattern.search(value)
+        if match is None:
+            continue
+        fields = match.groupdict()
+        year = int(fields["year"])
+        if year < 100:
+            year += 2000
+        if fields.get("month_name"):
+            month = _MONTHS.get(fields["month_name"].lower()[:3])
+            if month is None:
+                continue
+        else:
+            month = int(fields["month"])
+        try:
+            return datetime(
+                year,
+                month,
+                int(fields["day"]),
+                int(fields["hour"] or 0),
+                int(fields["minute"] or 0),
+                tzinfo=PORTAL_TZ,
+            )
+        except ValueError:
+            return None
+    return None
+
+
+def parse_german_date(value: Optional[str]) -> Optional[date]:
+    parsed = parse_german_datetime(value)
+    return parsed.date() if parsed else None
+
+
+def parse_period(value: Optional[str]):
+    """Split "01.05.2025 - 30.04.2027" into a (start, end) pair of dates."""
+    if not value:
+        return None, None
+    found = [parse_german_date(match.group(0)) for match in _DATE_RE.finditer(value)]
+    found += [None, None]
+    return found[0], found[1]
+
+
+def parse_flag(value: Optional[str]) -> bool:
+    return bool(value) and value.split()[0].strip(",.;").lower() in _YES
+
+
+def parse_cpv_codes(node):
+    codes = []
+    for line in lines(node):
+        match = _CPV_RE.search(line)
+        if match:
+            codes.append({"code": match[1], "description": match[2] or None})
+    return codes
+
+
+def page_fingerprint(html: str) -> str:
+    """SHA-256 of a page's visible text, ignoring scripts, styles and markup
+    churn so that only content changes produce a new hash."""
+    tree = lxml.html.document_fromstring(html)
+    for node in tree.xpath("//script|//style|//noscript|//input[@type='hidden']"):
+        node.drop_tree()
+    content = " ".join(tree.text_content().split())
+    return hashlib.sha256(content.encode()).hexdigest()
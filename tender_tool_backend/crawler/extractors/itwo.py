@@ -0,0 +1,103 @@
+from . import DETAIL, LISTING, ExtractionError, ListingEntry, register
+from .common import (
+    labelled_values,
+    lines,
+    parse_cpv_codes,
+    parse_flag,
+    parse_german_date,
+    parse_german_datetime,
+    parse_html,
+    parse_period,
+    text,
+)
+
+PORTAL = "myorder.rib.de"
+
+SERVICE_DOCUMENT_HINTS = (
+    "leistungsbeschreibung",
+    "leistungsverzeichnis",
+    "lv_",
+    "lv-",
+    ".x83",
+    ".d83",
+)
+
+
+@register(PORTAL, LISTING, r"myorder\.rib\.de/tender/(index|search)")
+def parse_listing(url, html):
+    tree = parse_html(html, url)
+    entries = []
+    for row in tree.xpath("//table[contains(@class, 'tender-list')]/tbody/tr"):
+        link = row.xpath(".//a[contains(@href, '/tender/view')]")
+        if not link:
+            continue
+        published = row.xpath("./td[contains(@class, 'published')]")
+        entries.append(
+            ListingEntry(
+                url=link[0].get("href"),
+                title=text(link[0]),
+                published_at=parse_german_datetime(
+                    text(published[0]) if published else None
+                ),
+            )
+        )
+    return entries
+
+
+@register(PORTAL, DETAIL, r"myorder\.rib\.de/tender/view")
+def parse_detail(url, html):
+    tree = parse_html(html, url)
+    values = labelled_values(tree)
+
+    def value(*labels):
+        for label in labels:
+            if label in values:
+                return text(values[label])
+        return None
+
+    title = value("bezeichnung", "titel")
+    if title is None:
+        raise ExtractionError("no 'Bezeichnung' row on detail page")
+
+    authority = lines(values.get("auftraggeber"))
+    period_start, period_end = parse_period(
+        value("ausführungsfrist", "ausführungszeitraum")
+    )
+
+    documents = []
+    for link in tree.xpath("//table[contains(@class, 'documents')]//a[@href]"):
+        filename = text(link) or link.get("href").rsplit("/", 1)[-1]
+        if any(hint in filename.lower() for hint in SERVICE_DOCUMENT_HINTS):
+            documents.append({"filename": filename, "download_link": link.get("href")})
+
+    return {
+        "tender_number": value("vergabenummer", "ausschreibungsnummer"),
+        "title": title,
+        "description": value("beschreibung", "art und umfang der leistung"),
+        "tender_procedure": value("vergabeverfahren", "verfahrensart"),
+        "execution_place": value("ort der ausführung", "erfüllungsort"),
+        "subdivision_into_lots": parse_flag(
+            value("losaufteilung", "aufteilung in lose")
+        ),
+        "side_offers_allowed": parse_flag(value("nebenangebote")),
+        "several_main_offers_allowed": parse_flag(value("mehrere hauptangebote")),
+        "dates": {
+            "period_start": period_start,
+            "period_end": period_end,
+            "application_deadline": parse_german_datetime(
+                value("angebotsfrist", "submission")
+            ),
+            "bidders_requests_deadline": parse_german_datetime(
+                value("fragen bis", "bieterfragen bis")
+            ),
+            "expiration_time": parse_german_datetime(value("bindefrist")),
+            "award_period": parse_german_date(value("zuschlag bis")),
+        },
+        "contracting_authority": {
+            "name": authority[0] if authority else None,
+            "address": ", ".join(authority[1:]) or None,
+            "contact_email": value("e-mail", "kontakt e-mail"),
+        },
+        "cpv_codes": parse_cpv_codes(values.get("cpv")),
+        "documents": documents,
+    }
@@ -0,0 +1,98 @@
+from . import DETAIL, LISTING, ExtractionError, ListingEntry, register
+from .common import (
+    labelled_values,
+    lines,
+    parse_cpv_codes,
+    parse_flag,
+    parse_german_date,
+    parse_german_datetime,
+    parse_html,
+    parse_period,
+    text,
+)
+
+PORTAL = "service.bund.de"
+
+# Only these attachments describe the service itself; forms, cover letters
+# and contract templates are left for the bidders.
+SERVICE_DOCUMENT_HINTS = ("leistungsbeschreibung", "leistungsverzeichnis", "lv_", "lv-")
+
+
+@register(PORTAL, LISTING, r"service\.bund\.de/Content/DE/Ausschreibungen/Suche/")
+def parse_listing(url, html):
+    tree = parse_html(html, url)
+    entries = []
+    for link in tree.xpath("//ul[contains(@class, 'result-list')]//li//a[@href]"):
+        item = link.xpath("ancestor::li[1]")[0]
+        published = item.xpath(".//*[contains(@class, 'published')]")
+        entries.append(
+            ListingEntry(
+                url=link.get("href"),
+                title=text(link),
+                published_at=parse_german_datetime(
+                    text(published[0]) if published else None
+                ),
+            )
+        )
+    return entries
+
+
+@register(PORTAL, DETAIL, r"service\.bund\.de/IMPORTE/Ausschreibungen/")
+def parse_detail(url, html):
+    tree = parse_html(html, url)
+    values = labelled_values(tree)
+
+    def value(*labels):
+        for label in labels:
+            if label in values:
+                return text(values[label])
+        return None
+
+    title = tree.xpath("//h1")
+    if not title:
+        raise ExtractionError("no <h1> title on detail page")
+
+    authority = lines(values.get("vergabestelle"))
+    period_start, period_end = parse_period(value("ausführungszeitraum", "laufzeit"))
+
+    documents = []
+    for link in tree.xpath("//*[contains(@class, 'documents')]//a[@href]"):
+        filename = text(link) or link.get("href").rsplit("/", 1)[-1]
+        if any(hint in filename.lower() for hint in SERVICE_DOCUMENT_HINTS):
+            documents.append({"filename": filename, "download_link": link.get("href")})
+
+    return {
+        "tender_number": value("vergabenummer", "aktenzeichen"),
+        "title": text(title[0]),
+        "description": text(
+            next(iter(tree.xpath("//*[contains(@class, 'description')]")), None)
+        ),
+        "tender_procedure": value("verfahrensart", "vergabeart"),
+        "execution_place": value("erfüllungsort", "ausführungsort"),
+        "subdivision_into_lots": parse_flag(value("aufteilung in lose")),
+        "side_offers_allowed": parse_flag(value("nebenangebote zugelassen")),
+        "several_main_offers_allowed": parse_flag(
+            value("mehrere hauptangebote zugelassen")
+        ),
+        "dates": {
+            "period_start": period_start,
+            "period_end": period_end,
+            "application_deadline": parse_german_datetime(
+                value("angebotsfrist", "teilnahmefrist")
+            ),
+            "bidders_requests_deadline": parse_german_datetime(
+                value("frist für bieterfragen")
+            ),
+            "expiration_time": parse_german_datetime(
+                value("ablauf der bindefrist", "bindefrist")
+            ),
+            "award_period": parse_german_date(value("zuschlagsfrist")),
+        },
+        "contracting_authority": {
+            "name": authority[0] if authority else None,
+            "address": ", ".join(authority[1:]) or None,
+            "contact_email": value("e-mail"),
+        },
+        "cpv_codes": parse_cpv_codes(values.get("cpv-codes")),
+        "documents": documents,
+    }
@@ -0,0 +1,266 @@
+"""Per-run, per-step timing of LLM agent runs.
+
+The orchestrator opens a run around every agent run; the agent hooks, the
+LLM client and the tool actions record steps into whichever run is current
+in their context (tool actions run in threads, which inherit the context).
+Finished runs go to the configured sinks (the database, a JSON-lines file)
+and are added to totals that can be exported in the Prometheus text format.
+
+With `enabled=False`, `run()` and `step()` return a shared null context and
+nothing is timed or stored.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .recording import redact
+
+AGENT_STEP = "agent_step"
+LLM = "llm"
+TOOL = "tool"
+
+logger = logging.getLogger(__name__)
+
+_NULL = nullcontext()
+_current_run: ContextVar[Optional["RunRecord"]] = ContextVar(
+    "current_run", default=None
+)
+
+
+@dataclass
+class StepRecord:
+    kind: str
+    name: str
+    started_at: datetime
+    duration: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    db_queries: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RunRecord:
+    portal: str
+    task: str
+    started_at: datetime
+    duration: float = 0.0
+    status: str = "ok"
+    error: Optional[str] = None
+    steps: List[StepRecord] = field(default_factory=list)
+
+    def total(self, attribute: str, kind: Optional[str] = None) -> int:
+        return sum(
+            getattr(step, attribute) or 0
+            for step in self.steps
+            if kind is None or step.kind == kind
+        )
+
+    def to_json(self) -> dict:
+        data = asdict(self)
+        data["started_at"] = self.started_at.isoformat()
+        for step in data["steps"]:
+            step["started_at"] = step["started_at"].isoformat()
+        return data
+
+
+class JsonLinesSink:
+    """Appends every finished run to `path` as one JSON object per line."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def __call__(self, run: RunRecord):
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(run.to_json()) + "\n")
+
+
+class Instrumentation:
+    def __init__(
+        self,
+        enabled: bool = True,
+        sinks: Optional[List[Callable[[RunRecord], None]]] = None,
+        query_counter: Optional[Callable] = None,
+        redact: Iterable[str] = (),
+    ):
+        """`query_counter` is a context manager factory yielding a one-item
+        list that counts the DB queries run inside it (see
+        core.crawl_runs.count_queries). Secrets in `redact`, such as portal
+        credentials in a task, are masked in the task and error of a run."""
+        self.enabled = enabled
+        self.sinks = sinks or []
+        self.query_counter = query_counter
+        self.redact = [secret for secret in redact if secret]
+        self.runs = defaultdict(int)
+        self.step_counts = defaultdict(int)
+        self.step_seconds = defaultdict(float)
+        self.tokens = defaultdict(int)
+        self.db_queries = 0
+
+    def run(self, portal: str, task: str):
+        if not self.enabled:
+            return _NULL
+        return self._run(portal, task)
+
+    @asynccontextmanager
+    async def _run(self, portal: str, task: str):
+        record = RunRecord(
+            portal=portal,
+            task=redact(task, self.redact),
+            started_at=datetime.now(timezone.utc),
+        )
+        token = _current_run.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as exc:
+            record.status = "failed"
+            record.error = redact(f"{type(exc).__name__}: {exc}", self.redact)
+            raise
+        finally:
+            record.duration = time.perf_counter() - started
+            _current_run.reset(token)
+            self._add(record)
+            for sink in self.sinks:
+                try:
+                    await asyncio.to_thread(sink, record)
+                except Exception as exc:
+                    logger.warning("%s: storing run failed (%s)", record.portal, exc)
+
+    def step(self, kind: str, name: str, count_queries: bool = False):
+        """Time a step of the current run. Yields the StepRecord so that the
+        caller can fill in token counts; a no-op outside a run."""
+        if not self.enabled or _current_run.get() is None:
+            return _NULL
+        return self._step(_current_run.get(), kind, name, count_queries)
+
+    @contextmanager
+    def _step(self, run: RunRecord, kind: str, name: str, count_queries: bool):
+        record = StepRecord(kind=kind, name=name, started_at=datetime.now(timezone.utc))
+        counter = (
+            self.query_counter()
+            if count_queries and self.query_counter is not None
+            else _NULL
+        )
+        queries = None
+        started = time.perf_counter()
+        try:
+            with counter as queries:
+                yield record
+        except BaseException as exc:
+            record.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            record.duration = time.perf_counter() - started
+            if queries is not None:
+                record.db_queries = queries[0]
+            run.steps.append(record)
+
+    def add_step(
+        self,
+        kind: str,
+        name: str,
+        duration: float,
+        db_queries: Optional[int] = None,
+    ):
+        """Record a step timed elsewhere, e.g. between two agent hooks, or
+        whose queries ran on another thread."""
+        run = _current_run.get()
+        if not self.enabled or run is None:
+            return
+        run.steps.append(
+            StepRecord(
+                kind=kind,
+                name=name,
+                started_at=datetime.fromtimestamp(time.time() - duration, timezone.utc),
+                duration=duration,
+                db_queries=db_queries,
+            )
+        )
+
+    def add_queries(self, count: int):
+        """Count DB queries made outside of any run, e.g. storing what a
+        parser extracted."""
+        if self.enabled:
+            self.db_queries += count
+
+    def _add(self, run: RunRecord):
+        self.runs[(run.portal, run.status)] += 1
+        for step in run.steps:
+            self.step_counts[step.kind] += 1
+            self.step_seconds[step.kind] += step.duration
+        self.tokens["prompt"] += run.total("prompt_tokens")
+        self.tokens["completion"] += run.total("completion_tokens")
+        self.db_queries += run.total("db_queries")
+
+    def prometheus(self) -> str:
+        """Totals since start-up in the Prometheus text exposition format."""
+        lines = [
+            "# HELP crawl_agent_runs_total Agent runs by portal and status.",
+            "# TYPE crawl_agent_runs_total counter",
+        ]
+        for (portal, status), count in sorted(self.runs.items()):
+            lines.append(
+                f'crawl_agent_runs_total{{portal="{portal}",status="{status}"}} {count}'
+            )
+        lines += [
+            "# HELP crawl_step_seconds Time spent per step kind.",
+            "# TYPE crawl_step_seconds summary",
+        ]
+        for kind in sorted(self.step_counts):
+            lines.append(
+                f'crawl_step_seconds_sum{{kind="{kind}"}} {self.step_seconds[kind]:.6f}'
+            )
+            lines.append(
+                f'crawl_step_seconds_count{{kind="{kind}"}} {self.step_counts[kind]}'
+            )
+        lines += [
+            "# HELP crawl_llm_tokens_total LLM tokens used by agent runs.",
+            "# TYPE crawl_llm_tokens_total counter",
+        ]
+        for kind in ("prompt", "completion"):
+            lines.append(f'crawl_llm_tokens_total{{type="{kind}"}} {self.tokens[kind]}')
+        lines += [
+            "# HELP crawl_db_queries_total DB queries issued storing crawl results.",
+            "# TYPE crawl_db_queries_total counter",
+            f"crawl_db_queries_total {self.db_queries}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class StartupTimes:
+    """How long a crawl took to get going: the duration of the first
+    `measure(name)` of each kind (imports, browser start) and the time from
+    `started_at` (a time.perf_counter() value) to each `mark(name)`."""
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.durations: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.setdefault(name, time.perf_counter() - started)
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, time.perf_counter() - self.started_at)
+
+    def __str__(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.durations.items()]
+        parts += [
+            f"{name} after {seconds:.2f}s" for name, seconds in self.marks.items()
+        ]
+        return "startup: " + (", ".join(parts) or "nothing timed")
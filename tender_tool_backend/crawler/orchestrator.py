@@ -0,0 +1,331 @@
+"""Concurrent multi-portal crawl orchestration.
+
+All portals are crawled at the same time. Within a portal, detail pages fan
+out under a per-portal concurrency cap and rate limit; pages that need the
+LLM agent borrow a browser from a pool that is shared by all portals.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .extractors import ExtractionError, ListingEntry, extract_detail, extract_listing
+from .extractors.common import page_fingerprint
+from .instrumentation import Instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlFailed(Exception):
+    pass
+
+
+@dataclass
+class PortalConfig:
+    name: str
+    listing_url: str
+    # Task for the agent when the listing page itself cannot be parsed.
+    listing_task: str
+    # Task template for a single detail page, formatted with `url`.
+    detail_task: str
+    max_concurrency: int = 2
+    requests_per_second: float = 1.0
+
+
+@dataclass
+class PortalStats:
+    portal: str
+    listed: int = 0
+    unchanged: int = 0
+    extracted: int = 0
+    agent_runs: int = 0
+    cached: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def pages_per_minute(self) -> float:
+        pages = self.extracted + self.agent_runs + self.cached
+        return pages * 60 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.portal}: {self.listed} listed, {self.unchanged} unchanged, "
+            f"{self.extracted} parsed, "
+            f"{self.agent_runs} via agent, {self.cached} from cache, "
+            f"{self.failed} failed "
+            f"in {self.elapsed:.1f}s ({self.pages_per_minute:.1f} pages/min)"
+        )
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class BrowserPool:
+    """A bounded pool of browser sessions, created lazily and reused.
+
+    `factory` may be a coroutine function, e.g. one that starts the browser
+    or attaches to a running one. `close(browser)` ends a session when the
+    pool closes; by default the browser's own kill() or close().
+    """
+
+    def __init__(
+        self,
+        factory: Callable,
+        size: int = 4,
+        close: Optional[Callable] = None,
+    ):
+        self.factory = factory
+        self.size = size
+        self.close_browser = close or _kill
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._created = []
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def browser(self):
+        async with self._slots:
+            if self._idle.empty():
+                browser = self.factory()
+                if asyncio.iscoroutine(browser):
+                    browser = await browser
+                self._created.append(browser)
+                self._idle.put_nowait(browser)
+            browser = self._idle.get_nowait()
+            try:
+                yield browser
+            finally:
+                self._idle.put_nowait(browser)
+
+    async def close(self):
+        for browser in self._created:
+            result = self.close_browser(browser)
+            if asyncio.iscoroutine(result):
+                await result
+        self._created.clear()
+
+
+def _kill(browser):
+    kill = getattr(browser, "kill", None) or getattr(browser, "close", None)
+    if kill is not None:
+        return kill()
+
+
+class CrawlOrchestrator:
+    def __init__(
+        self,
+        portals: List[PortalConfig],
+        pool: BrowserPool,
+        fetch: Callable[[str], Awaitable[str]],
+        run_agent: Callable[[str, object], Awaitable[Optional[list]]],
+        ingest: Callable[[object], Awaitable[None]],
+        tracker=None,
+        cache=None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.portals = portals
+        self.pool = pool
+        self.fetch = fetch
+        self.run_agent = run_agent
+        self.ingest = ingest
+        # Optional core.crawl_state.CrawlTracker for incremental crawls.
+        self.tracker = tracker
+        # Optional crawler.cache.ExtractionCache in front of the agent.
+        # `run_agent` should then return the DetailExtractions it stored.
+        self.cache = cache
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+
+    async def run(self) -> Dict[str, PortalStats]:
+        try:
+            stats = await asyncio.gather(
+                *(self.crawl_portal(portal) for portal in self.portals)
+            )
+        finally:
+            await self.pool.close()
+        if self.cache is not None:
+            logger.info("%s", self.cache.stats)
+        return {portal_stats.portal: portal_stats for portal_stats in stats}
+
+    async def crawl_portal(self, portal: PortalConfig) -> PortalStats:
+        stats = PortalStats(portal=portal.name)
+        limiter = RateLimiter(portal.requests_per_second)
+        slots = asyncio.Semaphore(portal.max_concurrency)
+
+        try:
+            entries = await self.list_portal(portal, stats, limiter)
+        except CrawlFailed:
+            entries = []
+        selected = await self.select(portal, entries, stats)
+        await asyncio.gather(
+            *(
+                self.crawl_detail(portal, entry, stats, limiter, slots)
+                for entry in selected
+            )
+        )
+        if self.tracker is not None:
+            await asyncio.to_thread(self.tracker.advance, portal.name, entries)
+
+        stats.finished_at = time.perf_counter()
+        logger.info("%s", stats)
+        return stats
+
+    async def list_portal(
+        self, portal: PortalConfig, stats: PortalStats, limiter: RateLimiter
+    ) -> List[ListingEntry]:
+        """The entries of the portal's listing page. When the page cannot be
+        parsed the agent crawls the portal instead and there are none; raises
+        CrawlFailed if that fails too."""
+        try:
+            await limiter.wait()
+            entries = extract_listing(
+                portal.listing_url, await self.fetch(portal.listing_url)
+            )
+        except Exception as exc:
+            logger.warning(
+                "%s: listing not parsed (%s), running the agent", portal.name, exc
+            )
+            if await self._run_agent(stats, portal.listing_task) is None:
+                raise CrawlFailed(f"{portal.name}: listing agent run failed")
+            return []
+        stats.listed += len(entries)
+        return entries
+
+    async def select(
+        self, portal: PortalConfig, entries: List[ListingEntry], stats: PortalStats
+    ) -> List[ListingEntry]:
+        """The entries whose detail pages need crawling."""
+        if self.tracker is None or not entries:
+            return entries
+        selected = await asyncio.to_thread(self.tracker.select, portal.name, entries)
+        stats.unchanged += len(entries) - len(selected)
+        return selected
+
+    async def crawl_detail(
+        self,
+        portal: PortalConfig,
+        entry: ListingEntry,
+        stats: PortalStats,
+        limiter: RateLimiter,
+        slots: asyncio.Semaphore,
+    ) -> bool:
+        """Returns whether the page was stored or found unchanged."""
+        async with slots:
+            content_hash = None
+            try:
+                await limiter.wait()
+                html = await self.fetch(entry.url)
+                content_hash = page_fingerprint(html)
+                if self.tracker is not None and await asyncio.to_thread(
+                    self.tracker.unchanged, entry.url, content_hash
+                ):
+                    stats.unchanged += 1
+                    return True
+                extraction = extract_detail(entry.url, html)
+            except Exception as exc:
+                if not isinstance(exc, ExtractionError):
+                    logger.warning(
+                        "%s: fetching %s failed (%s)", portal.name, entry.url, exc
+                    )
+                if content_hash is not None:
+                    replayed = await self._replay(portal, entry, content_hash, stats)
+                    if replayed is not None:
+                        return replayed
+                task = portal.detail_task.format(url=entry.url)
+                extractions = await self._run_agent(stats, task)
+                if extractions is None:
+                    return False
+                if not extractions:
+                    # Not remembered, so that the next crawl tries again.
+                    stats.failed += 1
+                    logger.warning(
+                        "%s: the agent stored nothing from %s", portal.name, entry.url
+                    )
+                    return False
+                if self.cache is not None and content_hash:
+                    await asyncio.to_thread(
+                        self.cache.set, entry.url, content_hash, extractions
+                    )
+                await self._remember(portal, entry, content_hash)
+                return True
+
+            try:
+                await self.ingest(extraction)
+            except Exception as exc:
+                stats.failed += 1
+                logger.warning(
+                    "%s: storing %s failed (%s)", portal.name, entry.url, exc
+                )
+                return False
+            stats.extracted += 1
+            await self._remember(portal, entry, content_hash)
+            return True
+
+    async def _remember(self, portal: PortalConfig, entry: ListingEntry, content_hash):
+        if self.tracker is not None and content_hash is not None:
+            await asyncio.to_thread(
+                self.tracker.remember, portal.name, entry.url, content_hash
+            )
+
+    async def _replay(
+        self,
+        portal: PortalConfig,
+        entry: ListingEntry,
+        content_hash: str,
+        stats: PortalStats,
+    ) -> Optional[bool]:
+        """Ingest what the agent extracted from this exact page before.
+        Returns None if the cache does not have it, else whether storing it
+        worked."""
+        if self.cache is None:
+            return None
+        extractions = await asyncio.to_thread(self.cache.get, entry.url, content_hash)
+        if extractions is None:
+            return None
+        try:
+            for extraction in extractions:
+                await self.ingest(extraction)
+        except Exception as exc:
+            stats.failed += 1
+            logger.warning(
+                "%s: storing cached %s failed (%s)", stats.portal, entry.url, exc
+            )
+            return False
+        stats.cached += 1
+        await self._remember(portal, entry, content_hash)
+        return True
+
+    async def _run_agent(self, stats: PortalStats, task: str) -> Optional[list]:
+        """Run the agent; None if it failed, else what it extracted and
+        stored (empty if nothing)."""
+        async with self.pool.browser() as browser:
+            try:
+                async with self.instrumentation.run(stats.portal, task):
+                    extractions = await self.run_agent(task, browser)
+            except Exception as exc:
+                stats.failed += 1
+                logger.warning("%s: agent run failed (%s)", stats.portal, exc)
+                return None
+            stats.agent_runs += 1
+            return extractions or []
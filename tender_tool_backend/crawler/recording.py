@@ -0,0 +1,186 @@
+"""Record a crawl once, replay it offline.
+
+A recording is a directory with
+  pages.jsonl  every page the crawler fetched (HTML, or the error it got),
+  agent.jsonl  per agent task, the LLM exchanges and tool calls in order,
+  har/         HAR files of the agent's browsers (record mode only).
+
+Replay serves fetches from pages.jsonl and, instead of driving a browser and
+the LLM, feeds each task's recorded tool calls back into the same tool
+actions, so listing/detail parsing, the extraction cache, ingestion and
+instrumentation all run as they did, at full speed and without network.
+
+Secrets passed as `redact` are masked in everything written, HAR files
+included once redact_har() has run over them (the browsers write those
+themselves). Tasks are keyed by a hash of their redacted text, so a replay
+finds the runs of tasks with credentials in them without knowing those.
+"""
+
+import hashlib
+import json
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+PAGES = "pages.jsonl"
+AGENT = "agent.jsonl"
+REDACTED = "***"
+
+_current_task: ContextVar[Optional[str]] = ContextVar("recorded_task", default=None)
+
+
+class RecordingMissing(LookupError):
+    pass
+
+
+class RecordedFetchError(Exception):
+    pass
+
+
+def redact(text: str, secrets: Iterable[str]) -> str:
+    """`text` with every (non-empty) secret in it replaced by REDACTED."""
+    for secret in secrets:
+        if secret and secret != REDACTED:
+            text = text.replace(secret, REDACTED)
+    return text
+
+
+def _encodings(secret: str) -> List[str]:
+    # As a secret may appear in text, a form post or a JSON string.
+    return [
+        secret,
+        urllib.parse.quote_plus(secret),
+        urllib.parse.quote(secret, safe=""),
+        json.dumps(secret)[1:-1],
+    ]
+
+
+def task_key(task: str) -> str:
+    return hashlib.sha256(task.encode()).hexdigest()[:16]
+
+
+def _jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class Recorder:
+    def __init__(self, root: Path, redact: Iterable[str] = ()):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.har_dir = self.root / "har"
+        self.redact = [secret for secret in redact if secret and secret != REDACTED]
+        self._masked = [form for secret in self.redact for form in _encodings(secret)]
+        self._lock = threading.Lock()
+        # A new recording replaces an older one in the same directory.
+        for name in (PAGES, AGENT):
+            (self.root / name).write_text("", encoding="utf-8")
+
+    def _write(self, name: str, entry: dict):
+        line = redact(json.dumps(entry, ensure_ascii=False), self._masked)
+        with self._lock, (self.root / name).open("a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+
+    def page(self, url: str, html: Optional[str] = None, error: Optional[str] = None):
+        self._write(PAGES, {"url": url, "html": html, "error": error})
+
+    @contextmanager
+    def agent_run(self, task: str):
+        """Attribute the LLM exchanges and tool calls made inside to `task`."""
+        key = task_key(redact(task, self.redact))
+        token = _current_task.set(key)
+        try:
+            yield
+        except Exception as exc:
+            self._write(AGENT, {"task": key, "type": "error", "error": str(exc)})
+            raise
+        finally:
+            _current_task.reset(token)
+
+    def llm(self, model: str, messages, completion, usage=None):
+        if _current_task.get() is None:
+            return
+        self._write(
+            AGENT,
+            {
+                "task": _current_task.get(),
+                "type": "llm",
+                "model": model,
+                "messages": _jsonable(messages),
+                "completion": _jsonable(completion),
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+            },
+        )
+
+    def tool_call(self, name: str, arguments: dict, result: Optional[str] = None):
+        if _current_task.get() is None:
+            return
+        self._write(
+            AGENT,
+            {
+                "task": _current_task.get(),
+                "type": "tool",
+                "name": name,
+                "arguments": _jsonable(arguments),
+                "result": result,
+            },
+        )
+
+    def redact_har(self):
+        """Mask the secrets in the HAR files of the browsers, which record
+        login forms as they were sent. Call once the browsers are closed."""
+        for path in self.har_dir.glob("*.har"):
+            text = path.read_text(encoding="utf-8")
+            masked = redact(text, self._masked)
+            if masked != text:
+                path.write_text(masked, encoding="utf-8")
+
+
+class Replayer:
+    def __init__(self, root: Path, redact: Iterable[str] = ()):
+        """`redact`: the secrets the recording was made with, if tasks still
+        contain them."""
+        self.root = Path(root)
+        self.redact = [secret for secret in redact if secret]
+        self.pages: Dict[str, dict] = {}
+        self.agent: Dict[str, List[dict]] = {}
+        for entry in self._read(PAGES):
+            self.pages[entry["url"]] = entry
+        for entry in self._read(AGENT):
+            self.agent.setdefault(entry["task"], []).append(entry)
+
+    def _read(self, name: str):
+        path = self.root / name
+        if not path.exists():
+            raise RecordingMissing(f"no {name} in {self.root}")
+        with path.open(encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+    def page(self, url: str) -> str:
+        entry = self.pages.get(url)
+        if entry is None:
+            raise RecordingMissing(f"{url} was not recorded")
+        if entry["error"] is not None:
+            raise RecordedFetchError(entry["error"])
+        return entry["html"]
+
+    def agent_run(self, task: str) -> List[dict]:
+        """The recorded LLM exchanges and tool calls of `task`, in order."""
+        key = task_key(redact(task, self.redact))
+        events = self.agent.get(key)
+        if events is None:
+            raise RecordingMissing(f"agent task {key} was not recorded")
+        return events
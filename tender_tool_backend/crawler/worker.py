@@ -0,0 +1,167 @@
+"""Crawling from a job queue shared by several workers (core.crawl_queue).
+
+A worker runs up to `concurrency` leased jobs at a time through the steps of
+a CrawlOrchestrator: a listing job queues detail jobs for the entries that
+need crawling, a detail job fetches, parses (or runs the agent on) and
+stores one page, a document job downloads one file. Leases are renewed
+every `heartbeat_interval`; a job whose lease went to another worker in the
+meantime is cancelled. Rate limits stay per worker, concurrency caps are
+enforced by the queue across all workers. Queue calls go through
+sync_to_async, so they share one database connection.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from asgiref.sync import sync_to_async
+
+from .extractors import ListingEntry
+from .orchestrator import CrawlFailed, CrawlOrchestrator, PortalStats, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkerStats:
+    done: int = 0
+    failed: int = 0
+    lost: int = 0
+
+    def __str__(self):
+        return (
+            f"{self.done} jobs done, {self.failed} failed, "
+            f"{self.lost} lost to other workers"
+        )
+
+
+class CrawlWorker:
+    def __init__(
+        self,
+        orchestrator: CrawlOrchestrator,
+        queue,
+        download: Optional[Callable[[int], Awaitable[None]]] = None,
+        concurrency: int = 4,
+        poll_interval: float = 5.0,
+        heartbeat_interval: float = 60.0,
+    ):
+        self.orchestrator = orchestrator
+        # A core.crawl_queue.CrawlQueue.
+        self.queue = queue
+        # Stores one document by id; raises if that fails.
+        self.download = download
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.portals = {portal.name: portal for portal in orchestrator.portals}
+        self.portal_stats = {name: PortalStats(portal=name) for name in self.portals}
+        self.limiters = {
+            name: RateLimiter(portal.requests_per_second)
+            for name, portal in self.portals.items()
+        }
+        self.slots = {
+            name: asyncio.Semaphore(portal.max_concurrency)
+            for name, portal in self.portals.items()
+        }
+        self.stats = WorkerStats()
+        self.handlers = {
+            "listing": self.crawl_listing,
+            "detail": self.crawl_detail,
+            "document": self.download_document,
+        }
+
+    async def run(self, until_idle: bool = False) -> WorkerStats:
+        """Work until cancelled, or with `until_idle` until the queue has
+        nothing due."""
+        running: Dict[asyncio.Task, object] = {}
+        last_heartbeat = time.monotonic()
+        try:
+            while True:
+                free = self.concurrency - len(running)
+                jobs = await sync_to_async(self.queue.lease)(free) if free else []
+                for job in jobs:
+                    running[asyncio.create_task(self.run_job(job))] = job
+                if not running:
+                    if until_idle:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                finished, _ = await asyncio.wait(
+                    running,
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in finished:
+                    del running[task]
+                if running and (
+                    time.monotonic() - last_heartbeat >= self.heartbeat_interval
+                ):
+                    last_heartbeat = time.monotonic()
+                    await self._heartbeat(running)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            await self.orchestrator.pool.close()
+            for stats in self.portal_stats.values():
+                if stats.listed or stats.extracted or stats.agent_runs or stats.failed:
+                    logger.info("%s", stats)
+        return self.stats
+
+    async def _heartbeat(self, running: Dict[asyncio.Task, object]):
+        held = await sync_to_async(self.queue.heartbeat)(
+            [job.pk for job in running.values()]
+        )
+        for task, job in running.items():
+            if job.pk not in held:
+                logger.warning("%s: lost the lease on %s", job.portal, job.url)
+                task.cancel()
+                self.stats.lost += 1
+
+    async def run_job(self, job):
+        try:
+            await self.handlers[job.kind](job)
+        except Exception as exc:
+            logger.warning(
+                "%s: %s job %s failed (%s)", job.portal, job.kind, job.url, exc
+            )
+            self.stats.failed += 1
+            await sync_to_async(self.queue.fail)(job, str(exc))
+        else:
+            self.stats.done += 1
+            await sync_to_async(self.queue.complete)(job)
+
+    async def crawl_listing(self, job):
+        portal, stats = self.portals[job.portal], self.portal_stats[job.portal]
+        entries = await self.orchestrator.list_portal(
+            portal, stats, self.limiters[portal.name]
+        )
+        selected = await self.orchestrator.select(portal, entries, stats)
+        await sync_to_async(self.queue.add_details)(
+            portal.name, [entry.url for entry in selected]
+        )
+        # The detail pages are queued, so the portal's high-water mark can
+        # move on now rather than once they are crawled.
+        if self.orchestrator.tracker is not None:
+            await asyncio.to_thread(
+                self.orchestrator.tracker.advance, portal.name, entries
+            )
+
+    async def crawl_detail(self, job):
+        portal = self.portals[job.portal]
+        if not await self.orchestrator.crawl_detail(
+            portal,
+            ListingEntry(url=job.url),
+            self.portal_stats[portal.name],
+            self.limiters[portal.name],
+            self.slots[portal.name],
+        ):
+            raise CrawlFailed(f"{job.url} was not stored")
+
+    async def download_document(self, job):
+        if self.download is None:
+            raise CrawlFailed("this worker does not download documents")
+        await self.download(job.document_id)
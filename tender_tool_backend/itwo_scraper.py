@@ -1,114 +1,234 @@
+# Importing this module is cheap: browser_use, the LLM clients, browsers,
+# the ingestion writer thread and recording or replay are all set up on
+# first use (see the `crawl` management command).
 import os
-import django
 
-# Must be set BEFORE any Django imports
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
-django.setup()
+if __name__ == "__main__":
+    # Run as a script: Django must be set up before the model imports below.
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
 from dotenv import load_dotenv
-from browser_use import Agent, Browser, ChatOpenAI, Tools
 import asyncio
-import requests
+import functools
+import itertools
+import logging
+import re
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import replace
+from pathlib import Path
 from typing import Optional, List
 import json
 from django.forms.models import model_to_dict
-from core.models import (
-    PublicationDates,
-    Contractor,
-    CPVCode,
-    Publication,
-    PublicationDocument,
+from core.crawl_queue import enqueue_documents
+from core.crawl_runs import count_queries, save_run
+from core.crawl_state import CrawlTracker
+from core.duplicates import index_publications
+from core.extraction_cache import DatabaseBackend
+from core.ingestion_writer import DOCUMENTS, PUBLICATIONS, IngestionWriter
+from core.matching import update_matches
+from crawler.cache import DiskBackend, ExtractionCache
+from crawler.extractors import DetailExtraction
+from crawler.instrumentation import (
+    AGENT_STEP,
+    LLM,
+    TOOL,
+    Instrumentation,
+    JsonLinesSink,
+    StartupTimes,
 )
+from crawler.orchestrator import BrowserPool, CrawlOrchestrator, PortalConfig
+from crawler.recording import REDACTED, Recorder, Replayer
 from itwo_schemas import PublicationInput, DocumentInput
 
 load_dotenv()
 
-browser = Browser()
-tools = Tools()
+# Without credentials (e.g. replaying a recording elsewhere) the tasks carry
+# the placeholder recordings mask them with, so they match the recorded runs.
+login_email_itwo = os.getenv("LOGIN_EMAIL") or REDACTED
+login_password_itwo = os.getenv("LOGIN_PASSWORD") or REDACTED
 
+# CRAWL_INSTRUMENTATION=0 turns per-run timing off. Runs are stored as
+# CrawlRun rows; CRAWL_RUNS_JSON / CRAWL_METRICS_FILE additionally write JSON
+# lines per run and Prometheus totals at the end of a crawl.
+CRAWL_RUNS_JSON = os.getenv("CRAWL_RUNS_JSON")
+CRAWL_METRICS_FILE = os.getenv("CRAWL_METRICS_FILE")
+instrumentation = Instrumentation(
+    enabled=os.getenv("CRAWL_INSTRUMENTATION", "1") != "0",
+    sinks=[save_run] + ([JsonLinesSink(CRAWL_RUNS_JSON)] if CRAWL_RUNS_JSON else []),
+    query_counter=count_queries,
+    redact=[login_email_itwo, login_password_itwo],
+)
+startup = StartupTimes()
+logger = logging.getLogger(__name__)
 
-@tools.action(description="Create and save new Publication entries in the database")
-def create_publications(publication_inputs: List[PublicationInput]) -> str:
-    created_count = 0
-
-    for input_obj in publication_inputs:
-        # --- Create Dates ---
-        dates_data = input_obj["dates"]
-        dates = PublicationDates.objects.create(**dates_data)
-
-        # --- Create or get Contractor ---
-        contractor_data = input_obj["contracting_authority"]
-        contractor, _ = Contractor.objects.get_or_create(
-            name=contractor_data.get("name"),
-            defaults={
-                "address": contractor_data.get("address"),
-                "contact_email": contractor_data.get("contact_email"),
-            },
-        )
 
-        # --- Create Publication (idempotent by tender_number) ---
-        publication, created = Publication.objects.get_or_create(
-            tender_number=input_obj["tender_number"],
-            defaults={
-                "title": input_obj["title"],
-                "description": input_obj.get("description"),
-                "tender_procedure": input_obj.get("tender_procedure"),
-                "execution_place": input_obj.get("execution_place"),
-                "subdivision_into_lots": input_obj.get("subdivision_into_lots", False),
-                "side_offers_allowed": input_obj.get("side_offers_allowed", False),
-                "several_main_offers_allowed": input_obj.get(
-                    "several_main_offers_allowed", False
-                ),
-                "dates": dates,
-                "contracting_authority": contractor,
-            },
-        )
+def _browser_use():
+    # Loading browser_use takes seconds, so only agent runs pay for it.
+    with startup.measure("browser_use import"):
+        import browser_use
+    return browser_use
+
+
+# What the agent stored during the current run_agent() call, for the
+# extraction cache, and the writer's futures for it. browser_use runs sync
+# tools via asyncio.to_thread, which carries the context over.
+captured: ContextVar[Optional[dict]] = ContextVar("captured", default=None)
+
+
+def after_flush(kind, result):
+    if kind == PUBLICATIONS and (result.created_ids or result.updated_ids):
+        index_publications(result.created_ids + result.updated_ids)
+        update_matches(result.created_ids + result.updated_ids)
+    elif kind == DOCUMENTS and result.created_ids:
+        enqueue_documents(result.created_ids)
+
+
+# The tools only validate and queue; the writer thread stores in batches so
+# the agent does not wait on the database between steps. Stored publications
+# are linked to their copies on other portals and scored against the match
+# profiles right away; new documents are queued for crawl workers to
+# download (see core.crawl_queue).
+_writer: Optional[IngestionWriter] = None
+_writer_lock = threading.Lock()
+
+
+def ingestion_writer() -> IngestionWriter:
+    """The writer, whose thread starts on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = IngestionWriter(on_flush=after_flush)
+        return _writer
+
+
+def close():
+    """Store what is still queued and stop the writer thread. When recording,
+    mask the credentials in the HAR files the closed browsers wrote."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+    if recorder is not None:
+        recorder.redact_har()
+
+
+# Plain functions behind the tool actions, so that a replay can call them.
+def _create_publications(publication_inputs: List[PublicationInput]) -> str:
+    with instrumentation.step(TOOL, "create_publications"):
+        ticket, future = ingestion_writer().submit_publications(publication_inputs)
+    if captured.get() is not None:
+        captured.get()["publications"].extend(publication_inputs)
+        captured.get()["writes"].append((PUBLICATIONS, future))
+    return f"Queued {len(publication_inputs)} publication(s) (ticket {ticket})"
 
-        if not created:
-            # If publication exists, skip to avoid duplicates
-            continue
 
-        # --- CPV Codes ---
-        for cpv in input_obj.get("cpv_codes", []):
-            cpv_obj, _ = CPVCode.objects.get_or_create(
-                code=cpv["code"], defaults={"description": cpv.get("description")}
-            )
-            publication.cpv_codes.add(cpv_obj)
+def _create_documents(document_inputs: List[DocumentInput]) -> str:
+    with instrumentation.step(TOOL, "create_documents"):
+        ticket, future = ingestion_writer().submit_documents(document_inputs)
+    if captured.get() is not None:
+        captured.get()["documents"].extend(document_inputs)
+        captured.get()["writes"].append((DOCUMENTS, future))
+    return f"Queued {len(document_inputs)} document(s) (ticket {ticket})"
 
-        # # --- Tender Documents ---
-        # for doc in input_obj.get("tender_documents", []):
-        #     doc_obj, _ = PublicationDocument.objects.get_or_create(
-        #         filename=doc["filename"], download_link=doc["download_link"]
-        #     )
-        #     publication.tender_documents.add(doc_obj)
 
-        created_count += 1
+def _check_ingestion(ticket: int) -> str:
+    try:
+        return str(ingestion_writer().result(ticket, timeout=30))
+    except KeyError as exc:
+        return str(exc)
+    except TimeoutError:
+        return f"ticket {ticket} is still queued"
 
-    return f"✅ Created {created_count} new publication(s) successfully."
+
+def _recorded(name: str, **arguments) -> str:
+    result = TOOL_FUNCTIONS[name](**arguments)
+    if recorder is not None:
+        recorder.tool_call(name, arguments, result)
+    return result
+
+
+def create_publications(publication_inputs: List[PublicationInput]) -> str:
+    return _recorded("create_publications", publication_inputs=publication_inputs)
 
 
-@tools.action(description="Create and save publication documents")
 def create_documents(document_inputs: List[DocumentInput]) -> str:
-    created_count = 0
+    return _recorded("create_documents", document_inputs=document_inputs)
 
-    for doc in document_inputs:
-        publication = Publication.objects.get(
-            tender_number=doc.publication_tender_number
-        )
 
-        document, created = PublicationDocument.objects.get_or_create(
-            filename=doc.filename,
-            download_link=doc.download_link,
-            tender=publication,
-        )
+def check_ingestion(ticket: int) -> str:
+    return _recorded("check_ingestion", ticket=ticket)
+
+
+@functools.cache
+def agent_tools():
+    tools = _browser_use().Tools()
+    tools.action(description="Create and save new Publication entries in the database")(
+        create_publications
+    )
+    tools.action(description="Create and save publication documents")(create_documents)
+    tools.action(
+        description="Wait for queued publications or documents to be saved and "
+        "report what was created, updated, skipped or failed"
+    )(check_ingestion)
+    return tools
+
+
+TOOL_FUNCTIONS = {
+    "create_publications": _create_publications,
+    "create_documents": _create_documents,
+    "check_ingestion": _check_ingestion,
+}
+TOOL_ARGUMENTS = {
+    "publication_inputs": PublicationInput,
+    "document_inputs": DocumentInput,
+}
+_TICKET = re.compile(r"\(ticket (\d+)\)")
 
-        if created:
-            created_count += 1
 
-    return f"✅ Created {created_count} publication documents"
+# Set by configure().
+recorder: Optional[Recorder] = None
+replayer: Optional[Replayer] = None
+cdp_url: Optional[str] = None
 
 
-login_email_itwo = os.getenv("LOGIN_EMAIL")
-login_password_itwo = os.getenv("LOGIN_PASSWORD")
+def configure(
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    cdp: Optional[str] = None,
+    startup_times: Optional[StartupTimes] = None,
+):
+    """Set up a crawl; each option defaults to its environment variable.
+
+    CRAWL_RECORD=<dir> records fetched pages, LLM exchanges, tool calls and
+    browser HAR files of a crawl; CRAWL_REPLAY=<dir> replays such a recording
+    without network, browser or LLM (see crawler/recording.py). Both crawl
+    every listed page: the crawl tracker and the extraction cache are off.
+    CRAWL_CDP_URL attaches to a running browser (see the `serve_browser`
+    command) instead of launching one per pool slot.
+    """
+    global recorder, replayer, cdp_url, startup
+    record = record or os.getenv("CRAWL_RECORD")
+    replay = replay or os.getenv("CRAWL_REPLAY")
+    recorder = (
+        Recorder(record, redact=[login_email_itwo, login_password_itwo])
+        if record
+        else None
+    )
+    replayer = (
+        Replayer(replay, redact=[login_email_itwo, login_password_itwo])
+        if replay
+        else None
+    )
+    cdp_url = cdp or os.getenv("CRAWL_CDP_URL") or None
+    if startup_times is not None:
+        startup = startup_times
 
 
 itwo_task = f"""Visit https://www.myorder.rib.de/tender/index and login using the email {login_email_itwo} and password {login_password_itwo}, and extract input_obj for up to 1 publication.  
@@ -119,10 +239,6 @@ When on the "Tenders" page, for each publication:
 5. Ensure all date fields (e.g., PublicationDates) are formatted according to the input models given.  
 """
 
-itwo_agent = Agent(
-    task=itwo_task, browser=browser, llm=ChatOpenAI(model="gpt-4.1-mini"), tools=tools
-)
-
 service_bund_task = f"""Visit https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/Formular.html?view=processForm&nn=4641514, and extract input_obj for up to 1 publication.  
 When on the "Tenders" page, for each publication:
 2. DO NOT EXTRACT DATA, visit the detail page first. On the Detail Page, look for the link to the more detailed HTML Page under "Bekanntmachungen" and visit that link.
@@ -131,16 +247,296 @@ When on the "Tenders" page, for each publication:
 5. Ensure all date fields (e.g., PublicationDates) are formatted according to the input models given.  
 """
 
-service_bund_agent = Agent(
-    task=itwo_task,
-    browser=browser,
-    llm=ChatOpenAI(model="gpt-4.1-mini"),
-    tools=tools,
+itwo_listing_url = "https://www.myorder.rib.de/tender/index"
+service_bund_listing_url = "https://www.service.bund.de/Content/DE/Ausschreibungen/Suche/Formular.html?view=processForm&nn=4641514"
+
+detail_task = """Visit {url} and extract input_obj for the publication on that page.
+1. Use the tools `create_publications` to store the structured input_obj.
+2. ONLY download files that describe the service that needs to be provided. For the tender documents objects use 'create_documents' to save the tender documents objects.
+3. Ensure all date fields (e.g., PublicationDates) are formatted according to the input models given.
+"""
+
+itwo_detail_task = (
+    f"If asked to log in, use the email {login_email_itwo} and password {login_password_itwo}.\n"
+    + detail_task
 )
 
+portals = [
+    PortalConfig(
+        name="myorder.rib.de",
+        listing_url=itwo_listing_url,
+        listing_task=itwo_task,
+        detail_task=itwo_detail_task,
+        max_concurrency=2,
+        requests_per_second=0.5,
+    ),
+    PortalConfig(
+        name="service.bund.de",
+        listing_url=service_bund_listing_url,
+        listing_task=service_bund_task,
+        detail_task=detail_task,
+        max_concurrency=4,
+        requests_per_second=2.0,
+    ),
+]
+
+BROWSER_POOL_SIZE = int(os.getenv("CRAWL_BROWSER_POOL_SIZE", "4"))
+# "db", "disk" or "off"
+EXTRACTION_CACHE = os.getenv("EXTRACTION_CACHE", "db")
+EXTRACTION_CACHE_DIR = Path(os.getenv("EXTRACTION_CACHE_DIR", ".extraction_cache"))
+EXTRACTION_CACHE_TTL_DAYS = float(os.getenv("EXTRACTION_CACHE_TTL_DAYS", "14"))
+LLM_MODEL = "gpt-4.1-mini"
+
+
+@functools.cache
+def _session():
+    import requests
+
+    return requests.Session()
+
+
+def fetch_page(url: str) -> str:
+    response = _session().get(url, timeout=30)
+    response.raise_for_status()
+    return response.text
+
+
+async def fetch(url: str) -> str:
+    if replayer is not None:
+        html = replayer.page(url)
+        startup.mark("first page")
+        return html
+    try:
+        html = await asyncio.to_thread(fetch_page, url)
+    except Exception as exc:
+        if recorder is not None:
+            await asyncio.to_thread(recorder.page, url, error=str(exc))
+        raise
+    startup.mark("first page")
+    if recorder is not None:
+        await asyncio.to_thread(recorder.page, url, html=html)
+    return html
+
+
+@functools.cache
+def chat_model(model: str):
+    """One LLM client per model, shared by all agent runs."""
+
+    class InstrumentedChatOpenAI(_browser_use().ChatOpenAI):
+        """Records latency and token usage of every LLM round-trip."""
+
+        async def ainvoke(self, messages, *args, **kwargs):
+            with instrumentation.step(LLM, self.model) as step:
+                result = await super().ainvoke(messages, *args, **kwargs)
+                usage = getattr(result, "usage", None)
+                if step is not None and usage is not None:
+                    step.prompt_tokens = getattr(usage, "prompt_tokens", None)
+                    step.completion_tokens = getattr(usage, "completion_tokens", None)
+            if recorder is not None:
+                recorder.llm(self.model, messages, result.completion, usage)
+            return result
+
+    return InstrumentedChatOpenAI(model=model)
+
+
+async def run_agent(task: str, browser) -> List[DetailExtraction]:
+    agent = _browser_use().Agent(
+        task=task,
+        browser=browser,
+        llm=chat_model(LLM_MODEL),
+        tools=agent_tools(),
+    )
+    stored = {"publications": [], "documents": [], "writes": []}
+    token = captured.set(stored)
+    step_started, step_count = 0.0, 0
+
+    # Agent steps cover navigation plus the LLM call and tool actions in them.
+    async def on_step_start(agent):
+        nonlocal step_started
+        step_started = time.perf_counter()
+
+    async def on_step_end(agent):
+        nonlocal step_count
+        step_count += 1
+        instrumentation.add_step(
+            AGENT_STEP, f"step {step_count}", time.perf_counter() - step_started
+        )
+
+    try:
+        with recorder.agent_run(task) if recorder is not None else nullcontext():
+            await agent.run(on_step_start=on_step_start, on_step_end=on_step_end)
+        await _record_writes(stored)
+    finally:
+        captured.reset(token)
+    startup.mark("first page")
+    return _extractions(stored)
+
+
+async def replay_agent(task: str, browser) -> List[DetailExtraction]:
+    """Stand-in for run_agent() that repeats the recorded run of `task`."""
+    stored = {"publications": [], "documents": [], "writes": []}
+    # Recorded ticket -> ticket of the replayed submission.
+    tickets = {}
+    token = captured.set(stored)
+    try:
+        for event in replayer.agent_run(task):
+            if event["type"] == "llm":
+                with instrumentation.step(LLM, event["model"]) as step:
+                    if step is not None:
+                        step.prompt_tokens = event["prompt_tokens"]
+                        step.completion_tokens = event["completion_tokens"]
+            elif event["type"] == "tool":
+                arguments = {
+                    name: (
+                        [TOOL_ARGUMENTS[name].model_validate(item) for item in value]
+                        if name in TOOL_ARGUMENTS
+                        else value
+                    )
+                    for name, value in event["arguments"].items()
+                }
+                if "ticket" in arguments:
+                    arguments["ticket"] = tickets.get(
+                        arguments["ticket"], arguments["ticket"]
+                    )
+                result = await asyncio.to_thread(
+                    TOOL_FUNCTIONS[event["name"]], **arguments
+                )
+                recorded = _TICKET.search(event["result"] or "")
+                replayed = _TICKET.search(result)
+                if recorded and replayed:
+                    tickets[int(recorded[1])] = int(replayed[1])
+            else:
+                raise RuntimeError(f"recorded agent run failed: {event['error']}")
+        await _record_writes(stored)
+    finally:
+        captured.reset(token)
+    return _extractions(stored)
+
+
+async def _record_writes(stored):
+    """Wait for what the run queued to be stored and add each write as a
+    step of the run, with its queries: the writer thread runs them outside
+    of the run. The duration is how long the run waited for it. Raises if a
+    write or one of its publications failed, which fails the run."""
+    errors = []
+    for kind, future in stored["writes"]:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(future)
+        except Exception as exc:
+            errors.append(f"storing {kind} failed ({exc})")
+            continue
+        instrumentation.add_step(
+            TOOL,
+            f"store {kind}",
+            time.perf_counter() - started,
+            db_queries=result.db_queries,
+        )
+        if kind == PUBLICATIONS and result.failed:
+            errors += result.errors
+    if errors:
+        raise RuntimeError("; ".join(errors))
+
+
+def _extractions(stored) -> List[DetailExtraction]:
+    return [
+        DetailExtraction(
+            publication=publication,
+            documents=[
+                document
+                for document in stored["documents"]
+                if document.publication_tender_number == publication.tender_number
+            ],
+        )
+        for publication in stored["publications"]
+    ]
+
+
+async def ingest(extraction):
+    writer = ingestion_writer()
+    for kind, inputs in (
+        (PUBLICATIONS, [extraction.publication]),
+        (DOCUMENTS, extraction.documents),
+    ):
+        result = await writer.asubmit(kind, inputs)
+        instrumentation.add_queries(result.db_queries)
+        logger.debug("%s", result)
+
+
+def extraction_cache() -> Optional[ExtractionCache]:
+    if EXTRACTION_CACHE == "off":
+        return None
+    backend = (
+        DiskBackend(EXTRACTION_CACHE_DIR)
+        if EXTRACTION_CACHE == "disk"
+        else DatabaseBackend()
+    )
+    return ExtractionCache(backend, ttl=EXTRACTION_CACHE_TTL_DAYS * 24 * 3600)
+
+
+_browser_ids = itertools.count(1)
+
+
+async def new_browser():
+    options = {"keep_alive": True}
+    if cdp_url:
+        options["cdp_url"] = cdp_url
+    if recorder is not None:
+        recorder.har_dir.mkdir(exist_ok=True)
+        har_path = recorder.har_dir / f"browser-{next(_browser_ids)}.har"
+        options["record_har_path"] = str(har_path)
+    browser = _browser_use().Browser(**options)
+    with startup.measure("browser start"):
+        await browser.start()
+    return browser
+
+
+async def detach_browser(browser):
+    # Leaves the attached browser running (and warm) for the next crawl.
+    await browser.stop()
+
+
+def orchestrator() -> CrawlOrchestrator:
+    if replayer is not None:
+        # No rate limits and no browsers: the recording answers instantly.
+        return CrawlOrchestrator(
+            portals=[replace(portal, requests_per_second=0) for portal in portals],
+            pool=BrowserPool(lambda: None, size=BROWSER_POOL_SIZE),
+            fetch=fetch,
+            run_agent=replay_agent,
+            ingest=ingest,
+            instrumentation=instrumentation,
+        )
+    recording = recorder is not None
+    return CrawlOrchestrator(
+        portals=portals,
+        pool=BrowserPool(
+            new_browser,
+            size=BROWSER_POOL_SIZE,
+            close=detach_browser if cdp_url else None,
+        ),
+        fetch=fetch,
+        run_agent=run_agent,
+        ingest=ingest,
+        tracker=None if recording else CrawlTracker(),
+        cache=None if recording else extraction_cache(),
+        instrumentation=instrumentation,
+    )
+
+
+def write_metrics():
+    if CRAWL_METRICS_FILE and instrumentation.enabled:
+        Path(CRAWL_METRICS_FILE).write_text(instrumentation.prometheus())
+
 
 async def main():
-    await service_bund_agent.run()
+    configure()
+    try:
+        await orchestrator().run()
+    finally:
+        await asyncio.to_thread(close)
+    write_metrics()
+    print(startup)
 
 
 if __name__ == "__main__":